@@ -0,0 +1,5 @@
+"""In-process benchmarks of PoorWSGI hot paths.
+
+Benchmarks call Application directly with synthetic WSGI environ, so no
+server is needed. Run them with ``python -m benchmarks``.
+"""
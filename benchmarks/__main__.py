@@ -0,0 +1,115 @@
+"""Run benchmarks and compare them with the baseline.
+
+.. code:: sh
+
+    ~$ python -m benchmarks                 # compare with baseline
+    ~$ python -m benchmarks -k 'routing.*'  # only routing benchmarks
+    ~$ python -m benchmarks --save          # write new baseline
+"""
+from argparse import ArgumentParser
+from fnmatch import fnmatch
+from json import dump, load
+from os import path
+from platform import python_version
+from sys import exit as sys_exit
+
+from . import bench_auth, bench_json, bench_metrics, bench_request, \
+    bench_response, bench_routing
+from .support import BENCHMARKS, measure, measure_memory
+
+# pylint: disable=unused-import
+
+BASELINE = path.join(path.dirname(__file__), 'baseline.json')
+MEMORY_SLACK = 1024     # bytes of peak memory, which are not regression
+
+
+def parse_args():
+    """Parse command line arguments."""
+    parser = ArgumentParser(prog='python -m benchmarks',
+                            description=__doc__.split('\n')[0])
+    parser.add_argument(
+        "-k", dest="pattern", default='*',
+        help="run only benchmarks which match the shell pattern")
+    parser.add_argument(
+        "--baseline", default=BASELINE,
+        help="baseline file (default: %(default)s)")
+    parser.add_argument(
+        "--save", action="store_true",
+        help="write results to the baseline file")
+    parser.add_argument(
+        "--threshold", type=float, default=0.3,
+        help="allowed slowdown of ops/sec (default: %(default)s)")
+    parser.add_argument(
+        "--memory-threshold", type=float, default=0.1,
+        help="allowed grow of peak memory (default: %(default)s)")
+    parser.add_argument(
+        "--min-time", type=float, default=0.2,
+        help="minimal time of one run in seconds (default: %(default)s)")
+    return parser.parse_args()
+
+
+def check(result: dict, base: dict, args) -> list:
+    """Return list of regressions of result against baseline."""
+    errors = []
+    if result['ops'] < base['ops'] * (1 - args.threshold):
+        errors.append("ops/sec %.0f < %.0f" % (result['ops'], base['ops']))
+    if result['peak'] > base['peak'] * (1 + args.memory_threshold) \
+            + MEMORY_SLACK:
+        errors.append("peak memory %d > %d B" % (result['peak'],
+                                                 base['peak']))
+    return errors
+
+
+def main():
+    """Run benchmarks."""
+    args = parse_args()
+    baseline = {}
+    if path.exists(args.baseline):
+        with open(args.baseline, 'r', encoding='utf-8') as baseline_file:
+            baseline = load(baseline_file)
+        if baseline.get('python') != python_version() and not args.save:
+            print("Baseline was measured with Python %s, not %s." %
+                  (baseline.get('python'), python_version()))
+
+    print("%-26s %12s %9s %10s %8s  %s" %
+          ('benchmark', 'ops/sec', 'change', 'peak KiB', 'blocks', 'status'))
+    results = {}
+    failed = 0
+    for name, setup in sorted(BENCHMARKS.items()):
+        if not fnmatch(name, args.pattern):
+            continue
+        operation = setup()
+        peak, blocks = measure_memory(operation)
+        result = results[name] = {
+            'ops': round(measure(operation, args.min_time), 1),
+            'peak': peak,
+            'blocks': round(blocks, 1)}
+
+        base = baseline.get('benchmarks', {}).get(name)
+        change, status = '', 'new'
+        if base:
+            change = "%+.1f%%" % ((result['ops'] / base['ops'] - 1) * 100)
+            errors = check(result, base, args)
+            status = '; '.join(errors) if errors else 'ok'
+            failed += bool(errors)
+        print("%-26s %12.1f %9s %10.1f %8.1f  %s" %
+              (name, result['ops'], change, peak / 1024, blocks, status))
+
+    if args.save:
+        benchmarks = baseline.get('benchmarks', {})
+        benchmarks.update(results)
+        with open(args.baseline, 'w', encoding='utf-8') as baseline_file:
+            dump({'python': python_version(), 'benchmarks': benchmarks},
+                 baseline_file, indent=2, sort_keys=True)
+            baseline_file.write('\n')
+        print("Baseline written to %s" % args.baseline)
+        return 0
+
+    if failed:
+        print("%d benchmarks regressed." % failed)
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys_exit(main())
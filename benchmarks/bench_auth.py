@@ -0,0 +1,73 @@
+"""Benchmarks of session and authorization."""
+from hashlib import sha256
+
+from poorwsgi import Application
+from poorwsgi.digest import check_digest, hexdigest
+from poorwsgi.response import JSONResponse
+from poorwsgi.session import PoorSession, get_token
+
+from .support import benchmark, call, make_env
+
+SECRET = 'benchmark secret key'
+REALM = 'User Zone'
+USER_AGENT = 'benchmark'
+
+
+@benchmark('session.load_write')
+def session():
+    app = Application('bench_session')
+    app.secret_key = SECRET
+
+    @app.route('/session')
+    def session_handler(req):
+        sess = PoorSession(app.secret_key)
+        sess.load(req.cookies)
+        sess.data['counter'] = sess.data.get('counter', 0) + 1
+        response = JSONResponse(counter=sess.data['counter'])
+        sess.header(response)
+        return response
+
+    sess = PoorSession(SECRET)
+    sess.data.update({'user': 'user', 'counter': 1, 'roles': ['a', 'b']})
+    cookie = 'SESSID=%s' % sess.write()
+    return lambda: call(app, make_env('/session',
+                                      headers={'Cookie': cookie}))
+
+
+@benchmark('auth.digest')
+def digest():
+    app = Application('bench_digest')
+    app.secret_key = SECRET
+    app.auth_type = 'Digest'
+    app.auth_map = {REALM: {'user': hexdigest('user', REALM, 'looser')}}
+
+    @app.route('/user')
+    @check_digest(REALM)
+    def user_handler(req):
+        return 'user %s' % req.user
+
+    auth = {
+        'username': 'user',
+        'realm': REALM,
+        'nonce': get_token(SECRET, USER_AGENT, timeout=app.auth_timeout),
+        'uri': '/user',
+        'algorithm': app.auth_algorithm,
+        'opaque': sha256(b'localhost').hexdigest(),
+        'qop': app.auth_qop,
+        'nc': '00000001',
+        'cnonce': 'b636b6204f836fdc'}
+    hash1 = app.auth_hash('{hash1}:{nonce}:{cnonce}'.format(
+        hash1=app.auth_map[REALM]['user'], **auth).encode()).hexdigest()
+    hash2 = app.auth_hash(b'GET:/user').hexdigest()
+    auth['response'] = app.auth_hash(
+        '{hash1}:{nonce}:{nc}:{cnonce}:{qop}:{hash2}'.format(
+            hash1=hash1, hash2=hash2, **auth).encode()).hexdigest()
+    header = 'Digest ' + ', '.join(
+        '%s="%s"' % (key, val) if key not in ('algorithm', 'qop', 'nc')
+        else '%s=%s' % (key, val) for key, val in auth.items())
+    headers = {'Authorization': header, 'User-Agent': USER_AGENT}
+
+    def operation():
+        body = call(app, make_env('/user', headers=headers))
+        assert body == b'user user', body
+    return operation
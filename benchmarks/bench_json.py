@@ -0,0 +1,54 @@
+"""Benchmarks of JSON codecs in responses and requests."""
+from poorwsgi import Application
+from poorwsgi.jsoncodec import available_codecs, current_codec, get_codec, \
+    set_codec
+from poorwsgi.response import JSONResponse
+from poorwsgi.state import METHOD_POST
+
+from .support import benchmark, call, make_env
+
+app = Application('bench_json')
+DATA = [{'id': i, 'name': 'item %d' % i, 'tags': ['a', 'b'], 'price': i / 3}
+        for i in range(200)]
+
+
+@app.route('/response')
+def response_handler(req):
+    return JSONResponse(DATA)
+
+
+@app.route('/request', method=METHOD_POST)
+def request_handler(req):
+    return str(len(req.json))
+
+
+def with_codec(name: str, operation):
+    """Return operation, which is called with codec set by name."""
+    codec = get_codec(name)
+
+    def wrapper():
+        original = current_codec()
+        set_codec(codec)
+        try:
+            operation()
+        finally:
+            set_codec(original)
+    return wrapper
+
+
+def register(name: str):
+    """Register response and request benchmarks for codec."""
+    @benchmark('json.%s.response' % name)
+    def response():
+        return with_codec(name, lambda: call(app, make_env('/response')))
+
+    @benchmark('json.%s.request' % name)
+    def request():
+        body = get_codec(name).dumps(DATA)
+        headers = {'Content-Type': 'application/json'}
+        return with_codec(name, lambda: call(
+            app, make_env('/request', 'POST', headers=headers, body=body)))
+
+
+for codec_name in available_codecs():
+    register(codec_name)
@@ -0,0 +1,26 @@
+"""Benchmarks of request metrics overhead."""
+from poorwsgi import Application
+from poorwsgi.metrics import Metrics
+
+from .support import benchmark, call, make_env
+
+
+@benchmark('metrics.record')
+def record():
+    metrics = Metrics()
+    phases = {'request': 0.0001, 'handler': 0.0002, 'emission': 0.0001}
+    return lambda: metrics.record('/test/static', 'GET', 200, 0.0004,
+                                  0, 6, phases)
+
+
+@benchmark('metrics.request')
+def request():
+    """Compare with routing.static, which is the same without metrics."""
+    app = Application('bench_metrics_request')
+    app.metrics = Metrics()
+
+    @app.route('/test/static')
+    def static(req):
+        return 'static'
+
+    return lambda: call(app, make_env('/test/static'))
@@ -0,0 +1,99 @@
+"""Benchmarks of request parsing."""
+from json import dumps
+from uuid import uuid4
+
+from poorwsgi import Application
+from poorwsgi.jsonstream import json_stream
+from poorwsgi.state import METHOD_POST
+
+from .support import benchmark, call, make_env
+
+app = Application('bench_request')
+
+
+@app.route('/args')
+def args_handler(req):
+    return str(len(req.args))
+
+
+@app.route('/cookies')
+def cookies_handler(req):
+    return str(len(req.cookies))
+
+
+@app.route('/json', method=METHOD_POST)
+def json_handler(req):
+    return str(len(req.json))
+
+
+@app.route('/json-stream', method=METHOD_POST)
+@json_stream
+def json_stream_handler(req):
+    return str(sum(1 for _ in req.iter_json_items()))
+
+
+@app.route('/form', method=METHOD_POST)
+def form_handler(req):
+    return str(len(req.form['file'].file.read()))
+
+
+@benchmark('request.query')
+def query():
+    query_string = '&'.join('arg%d=value%d' % (i, i) for i in range(20))
+    return lambda: call(app, make_env('/args', query=query_string))
+
+
+@benchmark('request.cookies')
+def cookies():
+    cookie = '; '.join('cookie%d=value%d' % (i, i) for i in range(20))
+    return lambda: call(app, make_env('/cookies',
+                                      headers={'Cookie': cookie}))
+
+
+def json_body(count: int, uri: str = '/json'):
+    """Return operation, which sends JSON list of count objects."""
+    body = dumps([{'id': i, 'name': 'item %d' % i, 'tags': ['a', 'b']}
+                  for i in range(count)]).encode()
+    headers = {'Content-Type': 'application/json'}
+    return lambda: call(app, make_env(uri, 'POST', headers=headers,
+                                      body=body))
+
+
+@benchmark('request.json_100B')
+def json_small():
+    return json_body(2)
+
+
+@benchmark('request.json_10KiB')
+def json_medium():
+    return json_body(200)
+
+
+@benchmark('request.json_1MiB')
+def json_large():
+    return json_body(20000)
+
+
+@benchmark('request.json_stream_1MiB')
+def json_stream_large():
+    return json_body(20000, '/json-stream')
+
+
+@benchmark('request.multipart_64KiB')
+def multipart():
+    boundary = uuid4().hex
+    body = b'\r\n'.join((
+        b'--' + boundary.encode(),
+        b'Content-Disposition: form-data; name="name"',
+        b'',
+        b'value',
+        b'--' + boundary.encode(),
+        b'Content-Disposition: form-data; name="file"; filename="file.bin"',
+        b'Content-Type: application/octet-stream',
+        b'',
+        b'x' * 65536,
+        b'--' + boundary.encode() + b'--',
+        b''))
+    headers = {'Content-Type': 'multipart/form-data; boundary=' + boundary}
+    return lambda: call(app, make_env('/form', 'POST', headers=headers,
+                                      body=body))
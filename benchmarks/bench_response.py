@@ -0,0 +1,36 @@
+"""Benchmarks of responses."""
+from atexit import register
+from os import remove
+from tempfile import NamedTemporaryFile
+
+from poorwsgi import Application
+from poorwsgi.response import FileResponse, JSONResponse
+
+from .support import benchmark, call, make_env
+
+
+@benchmark('response.file_64KiB')
+def file_response():
+    with NamedTemporaryFile('wb', suffix='.bin', delete=False) as tmp:
+        tmp.write(b'x' * 65536)
+    register(remove, tmp.name)
+
+    app = Application('bench_file_response')
+
+    @app.route('/file')
+    def file_handler(req):
+        return FileResponse(tmp.name)
+
+    return lambda: call(app, make_env('/file'))
+
+
+@benchmark('response.json')
+def json_response():
+    app = Application('bench_json_response')
+    data = [{'id': i, 'name': 'item %d' % i} for i in range(100)]
+
+    @app.route('/json')
+    def json_handler(req):
+        return JSONResponse(data=data)
+
+    return lambda: call(app, make_env('/json'))
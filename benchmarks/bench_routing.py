@@ -0,0 +1,48 @@
+"""Benchmarks of request dispatching."""
+from poorwsgi import Application
+
+from .support import benchmark, call, make_env
+
+
+@benchmark('routing.static')
+def static_route():
+    app = Application('bench_static_route')
+
+    @app.route('/')
+    def root(req):
+        return 'root'
+
+    @app.route('/test/static')
+    def static(req):
+        return 'static'
+
+    return lambda: call(app, make_env('/test/static'))
+
+
+def regular_routes(count: int):
+    """Return operation, which calls the last of count regular routes."""
+    app = Application('bench_regular_routes_%d' % count)
+
+    def handler(req, item_id):
+        return str(item_id)
+
+    for i in range(count):
+        app.set_route('/section%d/<item_id:int>' % i, handler)
+
+    path = '/section%d/42' % (count - 1)
+    return lambda: call(app, make_env(path))
+
+
+@benchmark('routing.regular_10')
+def regular_10():
+    return regular_routes(10)
+
+
+@benchmark('routing.regular_100')
+def regular_100():
+    return regular_routes(100)
+
+
+@benchmark('routing.regular_1000')
+def regular_1000():
+    return regular_routes(1000)
@@ -0,0 +1,103 @@
+"""Support library for benchmarks."""
+from io import BytesIO
+from timeit import Timer
+from typing import Callable, Dict, Optional
+from wsgiref.util import FileWrapper
+
+import tracemalloc
+
+# pylint: disable=unsubscriptable-object
+
+BENCHMARKS: Dict[str, Callable[[], Callable]] = {}
+
+
+def benchmark(name: str):
+    """Register benchmark setup function.
+
+    Setup function is called once, and it returns the operation, which is
+    measured.
+    """
+    def wrapper(setup):
+        BENCHMARKS[name] = setup
+        return setup
+    return wrapper
+
+
+def start_response(status, headers):
+    """WSGI start_response, which does nothing."""
+    # pylint: disable=unused-argument
+
+
+def make_env(path: str, method: str = 'GET', query: str = '',
+             headers: Optional[Dict[str, str]] = None, body: bytes = b''):
+    """Return new WSGI environ for request."""
+    env = {
+        'REQUEST_METHOD': method,
+        'PATH_INFO': path,
+        'QUERY_STRING': query,
+        'SERVER_NAME': 'localhost',
+        'SERVER_PORT': '80',
+        'SERVER_PROTOCOL': 'HTTP/1.1',
+        'REMOTE_ADDR': '127.0.0.1',
+        'wsgi.url_scheme': 'http',
+        'wsgi.input': BytesIO(body),
+        'wsgi.errors': None,
+        'wsgi.file_wrapper': FileWrapper,
+    }
+    if body:
+        env['CONTENT_LENGTH'] = str(len(body))
+    for key, val in (headers or {}).items():
+        key = key.upper().replace('-', '_')
+        if key in ('CONTENT_TYPE', 'CONTENT_LENGTH'):
+            env[key] = val
+        else:
+            env['HTTP_' + key] = val
+    return env
+
+
+def call(app, env) -> bytes:
+    """Call application like WSGI server and return response body."""
+    retval = app(env, start_response)
+    try:
+        return b''.join(retval)
+    finally:
+        if hasattr(retval, 'close'):
+            retval.close()
+
+
+def measure(operation: Callable, min_time: float = 0.2,
+            repeat: int = 3) -> float:
+    """Return operations per second, the best of repeat runs."""
+    timer = Timer(operation)
+    number, seconds = timer.autorange()
+    number = max(int(number * min_time / max(seconds, 1e-9)), 1)
+    best = min(timer.repeat(repeat, number))
+    return number / best
+
+
+def measure_memory(operation: Callable, number: int = 10):
+    """Return peak of traced memory in bytes of one operation and count of
+    memory blocks, which stay allocated after one operation.
+
+    Python does not count freed allocations, so peak of memory allocated
+    during operation is used as allocation metric.
+    """
+    operation()                 # warm up caches
+    tracemalloc.start()
+    try:
+        operation()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    tracemalloc.start()
+    try:
+        before = tracemalloc.take_snapshot()
+        for _ in range(number):
+            operation()
+        after = tracemalloc.take_snapshot()
+    finally:
+        tracemalloc.stop()
+    blocks = sum(stat.count_diff for stat in after.compare_to(before,
+                                                             'filename'))
+    return peak, blocks / number
@@ -123,6 +123,10 @@ def original_factory():
     """Original factory callback"""
 
 
+def stream_factory():
+    """Streaming callbacks without FieldStorage"""
+
+
 def html_form(req, file_callback):
     """Generate upload page for specified callback."""
     stats = ""
@@ -139,6 +143,11 @@ def html_form(req, file_callback):
                 bytes_read += len(data)
                 to_download = min(req.content_length-bytes_read, 65365)
                 data = req.read(to_download)
+        elif file_callback == stream_factory:
+            checksum = sha256()
+            bytes_read = req.stream_multipart(
+                lambda headers: None, checksum.update, lambda: None)
+            hexdigest = checksum.hexdigest()
         elif file_callback == original_factory:
             form = FieldStorage(
                     req, keep_blank_values=app.keep_blank_values,
@@ -201,6 +210,12 @@ def temporary_form(req):
     return html_form(req, temporary_factory)
 
 
+@app.route('/stream', method=state.METHOD_GET_POST)
+def stream_form(req):
+    """Return form for streaming callbacks."""
+    return html_form(req, stream_factory)
+
+
 @app.route('/no-factory', method=state.METHOD_GET_POST)
 def no_form(req):
     """Return form for no Formfield."""
@@ -225,6 +240,7 @@ def root(req):
         <ul>
           <li><a href="/blackhole">Blackhole file callback</a></li>
           <li><a href="/temporary">Temporary file callback</a></li>
+          <li><a href="/stream">Streaming callbacks</a></li>
           <li><a href="/no-factory">No Formfield</a></li>
         </ul>
         <hr>
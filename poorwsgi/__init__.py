@@ -3,7 +3,17 @@ Poor WSGI connector for Python
 
 Current Contents:
 
+* asgi: ASGI server support.
+* background: pool of worker threads for background tasks.
+* compress: compression of dynamic responses.
+* eventloop: background event loop for coroutine handlers under WSGI.
 * headers: Headers
+* fieldstorage: FieldStorage and streaming MultipartParser classes for
+  parsing request forms.
+* jsoncodec: pluggable JSON codecs, which work straight with bytes.
+* jsonstream: incremental parser of JSON array and NDJSON request bodies.
+* metrics: request metrics with Prometheus text exposition.
+* profiler: sampling profiler, which aggregates profiles of requests.
 * request: Request and FieldStorage classes, which is used for
   managing requests.
 * response: Response classes and some make responses functions for creating
@@ -11,7 +21,9 @@ Current Contents:
 * results: default result handlers of connector like directory index,
   servers errors or debug output handler.
 * session: self-contained cookie based session class
+* static: static files serving from document root with metadata cache.
 * state: constants like http status code and method types
+* timing: timing of request phases and Server-Timing header.
 * wsgi: Application callable class, which is the main point for poorwsgi web
   application.
 * digest: HTTP Digest Authorization support.
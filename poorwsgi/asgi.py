@@ -0,0 +1,193 @@
+"""ASGI support for Application.
+
+:Classes:   AsgiInput
+:Functions: environ_from_scope, read_body, send_response
+"""
+from asyncio import run_coroutine_threadsafe
+from io import BytesIO
+from sys import stderr
+from typing import Awaitable, Callable, List, Tuple
+
+# pylint: disable=unsubscriptable-object
+# pylint: disable=consider-using-f-string
+
+BLOCK_SIZE = 65536      # size of block read from file objects
+
+
+def environ_from_scope(scope: dict) -> dict:
+    """Return WSGI environ for ASGI http scope.
+
+    Path is encoded in the WSGI way, which is utf-8 bytes decoded as
+    iso-8859-1, so Request works with it in the same way. Original scope is
+    stored in ``asgi.scope`` key.
+
+    >>> env = environ_from_scope({
+    ...     'type': 'http', 'method': 'POST', 'path': '/path',
+    ...     'query_string': b'a=1', 'headers': [
+    ...         (b'content-type', b'text/plain'), (b'x-value', b'1'),
+    ...         (b'x-value', b'2')]})
+    >>> env['PATH_INFO'], env['QUERY_STRING'], env['CONTENT_TYPE']
+    ('/path', 'a=1', 'text/plain')
+    >>> env['HTTP_X_VALUE']
+    '1,2'
+    """
+    server = scope.get('server') or ('localhost', 80)
+    client = scope.get('client') or ('', 0)
+    env = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME':
+            scope.get('root_path', '').encode('utf-8').decode('iso-8859-1'),
+        'PATH_INFO': scope['path'].encode('utf-8').decode('iso-8859-1'),
+        'QUERY_STRING': scope.get('query_string', b'').decode('iso-8859-1'),
+        'SERVER_NAME': server[0],
+        'SERVER_PORT': str(server[1]),
+        'SERVER_PROTOCOL': 'HTTP/%s' % scope.get('http_version', '1.1'),
+        'REMOTE_ADDR': client[0],
+        'REMOTE_PORT': str(client[1]),
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.errors': stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': False,
+        'wsgi.run_once': False,
+        'asgi.scope': scope,
+    }
+    for raw_name, raw_value in scope.get('headers', ()):
+        name = raw_name.decode('iso-8859-1').upper().replace('-', '_')
+        value = raw_value.decode('iso-8859-1')
+        if name not in ('CONTENT_TYPE', 'CONTENT_LENGTH'):
+            name = 'HTTP_' + name
+        if name in env:
+            separator = '; ' if name == 'HTTP_COOKIE' else ','
+            env[name] += separator + value
+        else:
+            env[name] = value
+    return env
+
+
+async def read_body(receive: Callable) -> bytes:
+    """Read whole request body from ASGI receive."""
+    body = []
+    while True:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            raise ConnectionError("Client disconnected")
+        body.append(message.get('body', b''))
+        if not message.get('more_body', False):
+            return b''.join(body)
+
+
+class AsgiInput:
+    """Blocking wsgi.input, which reads request body from ASGI receive.
+
+    It is used from worker thread, while receive is called in event loop,
+    so request body is streamed to synchronous handlers.
+    """
+    def __init__(self, receive: Callable, loop):
+        self.__receive = receive
+        self.__loop = loop
+        self.__buffer = bytearray()
+        self.__more = True
+
+    def __fill(self):
+        message = run_coroutine_threadsafe(self.__receive(),
+                                           self.__loop).result()
+        if message['type'] == 'http.disconnect':
+            self.__more = False
+            raise ConnectionError("Client disconnected")
+        self.__buffer += message.get('body', b'')
+        self.__more = message.get('more_body', False)
+
+    def __take(self, size: int) -> bytes:
+        if size < 0 or size >= len(self.__buffer):
+            data = bytes(self.__buffer)
+            self.__buffer.clear()
+        else:
+            data = bytes(self.__buffer[:size])
+            del self.__buffer[:size]
+        return data
+
+    def read(self, size: int = -1) -> bytes:
+        """Read size bytes, or whole body when size is negative."""
+        if size is None:
+            size = -1
+        while self.__more and (size < 0 or len(self.__buffer) < size):
+            self.__fill()
+        return self.__take(size)
+
+    def readline(self, size: int = -1) -> bytes:
+        """Read one line, but max size bytes if size is not negative."""
+        if size is None:
+            size = -1
+        while self.__more and b'\n' not in self.__buffer and \
+                (size < 0 or len(self.__buffer) < size):
+            self.__fill()
+        end = self.__buffer.find(b'\n') + 1 or len(self.__buffer)
+        if size >= 0:
+            end = min(end, size)
+        return self.__take(end)
+
+    def __iter__(self):
+        while True:
+            line = self.readline()
+            if not line:
+                return
+            yield line
+
+
+async def send_response(send: Callable, status: str,
+                        headers: List[Tuple[str, str]], body,
+                        run: Callable[..., Awaitable]):
+    """Send response status, headers and body by ASGI send.
+
+    Body could be async iterable, in memory buffer, file like object, which
+    is read block by block, or iterable. In memory buffer, even wrapped by
+    TimedIterable, is sent in one message. Blocking calls on body are called
+    by run function, which calls them in thread pool. Body is closed at the
+    end.
+    """
+    await send({
+        'type': 'http.response.start',
+        'status': int(status.split(' ', 1)[0]),
+        'headers': [(key.lower().encode('iso-8859-1'),
+                     val.encode('iso-8859-1')) for key, val in headers]})
+    buffer = body if isinstance(body, BytesIO) else \
+        getattr(body, 'buffer', None)
+    try:
+        if hasattr(body, '__aiter__'):
+            async for chunk in body:
+                if chunk:
+                    await send({'type': 'http.response.body', 'body': chunk,
+                                'more_body': True})
+        elif isinstance(buffer, BytesIO):   # in memory buffer of Response
+            data = buffer.read()
+            if buffer is not body:
+                body.sent += len(data)
+            await send({'type': 'http.response.body', 'body': data,
+                        'more_body': False})
+            return
+        elif hasattr(body, 'read'):
+            while True:
+                chunk = await run(body.read, BLOCK_SIZE)
+                if not chunk:
+                    break
+                await send({'type': 'http.response.body', 'body': chunk,
+                            'more_body': True})
+        else:
+            iterator = iter(body)
+            while True:
+                chunk = await run(next, iterator, None)
+                if chunk is None:
+                    break
+                if chunk:
+                    await send({'type': 'http.response.body', 'body': chunk,
+                                'more_body': True})
+        await send({'type': 'http.response.body', 'body': b'',
+                    'more_body': False})
+    finally:
+        if isinstance(body, BytesIO):
+            body.close()
+        elif hasattr(body, 'aclose'):
+            await body.aclose()
+        elif hasattr(body, 'close'):
+            await run(body.close)
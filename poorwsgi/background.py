@@ -0,0 +1,176 @@
+"""Background tasks, which are called after the response is sent.
+
+:Classes:   BackgroundTasks
+"""
+from inspect import iscoroutine
+from logging import getLogger
+from os import getpid
+from queue import Full, Queue
+from threading import Lock, Thread
+from typing import Callable, List, Optional
+
+from poorwsgi.eventloop import event_loop
+
+log = getLogger("poorwsgi")
+
+# pylint: disable=unsubscriptable-object
+# pylint: disable=consider-using-f-string
+
+
+class BackgroundTasks:
+    """Bounded pool of worker threads for background tasks.
+
+    Worker threads are started with the first task, and they are started
+    again in forked process. When the queue is full, the task is dropped
+    with warning, so WSGI server is never blocked by tasks. Coroutine
+    functions are run in the background event loop. Exceptions from tasks
+    are passed to on_error function of the task, or they are logged.
+
+    >>> tasks = BackgroundTasks(workers=1)
+    >>> tasks.submit(print, ("task",))
+    >>> tasks.join()
+    task
+    >>> tasks.completed, tasks.depth
+    (1, 0)
+    """
+    # pylint: disable=too-many-instance-attributes
+    def __init__(self, workers: int = 4, queue_size: int = 1024):
+        self.workers = workers
+        self.queue_size = queue_size
+        self.__queue: Optional[Queue] = None
+        self.__pid: Optional[int] = None
+        self.__lock = Lock()
+        self.__threads: List[Thread] = []
+
+        self.max_depth = 0      # the highest queue depth
+        self.completed = 0      # count of successfully called tasks
+        self.failed = 0         # count of tasks, which raised exception
+        self.dropped = 0        # count of tasks dropped, when queue was full
+
+    @property
+    def depth(self) -> int:
+        """Count of tasks waiting in the queue."""
+        return self.__queue.qsize() if self.__queue is not None else 0
+
+    def __start(self) -> Queue:
+        with self.__lock:
+            queue = self.__queue
+            if queue is None or self.__pid != getpid():
+                queue = Queue(self.queue_size)
+                self.__threads = [
+                    Thread(target=self.__worker, args=(queue,),
+                           name="poorwsgi-background", daemon=True)
+                    for _ in range(self.workers)]
+                for thread in self.__threads:
+                    thread.start()
+                self.__queue, self.__pid = queue, getpid()
+                log.debug("Background tasks workers started")
+            return queue
+
+    def __worker(self, queue: Queue):
+        while True:
+            task = queue.get()
+            if task is None:
+                queue.task_done()
+                return
+            try:
+                self.__call(*task)
+            finally:
+                queue.task_done()
+
+    def __call(self, fun: Callable, args: tuple, kwargs: dict,
+               on_error: Optional[Callable[[Exception], None]]):
+        try:
+            retval = fun(*args, **kwargs)
+            if iscoroutine(retval):
+                event_loop.run(retval)
+            with self.__lock:
+                self.completed += 1
+        except Exception as err:  # pylint: disable=broad-except
+            with self.__lock:
+                self.failed += 1
+            if on_error is not None:
+                on_error(err)
+            else:
+                log.exception("Background task %s from %s failed",
+                              fun, getattr(fun, '__module__', None))
+
+    def submit(self, fun: Callable, args: tuple = (),
+               kwargs: Optional[dict] = None,
+               on_error: Optional[Callable[[Exception], None]] = None):
+        """Put task to the queue, or drop it, when the queue is full.
+
+        When task raises exception, on_error is called with it in the
+        except block, Application passes it to its error handlers.
+        """
+        queue = self.__queue
+        if queue is None or self.__pid != getpid():
+            queue = self.__start()
+        try:
+            queue.put_nowait((fun, args, kwargs or {}, on_error))
+        except Full:
+            log.warning("Background tasks queue is full, task %s is "
+                        "dropped", fun)
+            with self.__lock:
+                self.dropped += 1
+            return
+        self.max_depth = max(self.max_depth, queue.qsize())
+
+    def join(self):
+        """Wait for all tasks in the queue."""
+        if self.__queue is not None and self.__pid == getpid():
+            self.__queue.join()
+
+    def stop(self):
+        """Call all tasks in the queue and stop worker threads."""
+        with self.__lock:
+            queue, threads = self.__queue, self.__threads
+            if queue is None or self.__pid != getpid():
+                return
+            self.__queue, self.__threads = None, []
+        for _ in threads:
+            queue.put(None)
+        for thread in threads:
+            thread.join()
+
+    def exposition(self, prefix: str = 'poorwsgi') -> str:
+        """Return queue depth and task counters in Prometheus text format.
+
+        >>> print(BackgroundTasks().exposition(), end='')
+        ... # doctest: +NORMALIZE_WHITESPACE
+        # HELP poorwsgi_background_queue_depth Tasks waiting in the queue.
+        # TYPE poorwsgi_background_queue_depth gauge
+        poorwsgi_background_queue_depth 0
+        # HELP poorwsgi_background_queue_max_depth The highest queue depth.
+        # TYPE poorwsgi_background_queue_max_depth gauge
+        poorwsgi_background_queue_max_depth 0
+        # HELP poorwsgi_background_tasks_total Count of finished tasks.
+        # TYPE poorwsgi_background_tasks_total counter
+        poorwsgi_background_tasks_total{status="completed"} 0
+        poorwsgi_background_tasks_total{status="failed"} 0
+        # HELP poorwsgi_background_dropped_total Tasks dropped, queue was full.
+        # TYPE poorwsgi_background_dropped_total counter
+        poorwsgi_background_dropped_total 0
+        """
+        lines: List[str] = []
+        for name, help_, value in (
+                ('queue_depth', 'Tasks waiting in the queue.', self.depth),
+                ('queue_max_depth', 'The highest queue depth.',
+                 self.max_depth)):
+            lines.extend((
+                "# HELP %s_background_%s %s" % (prefix, name, help_),
+                "# TYPE %s_background_%s gauge" % (prefix, name),
+                "%s_background_%s %d" % (prefix, name, value)))
+        lines.extend((
+            "# HELP %s_background_tasks_total Count of finished tasks." %
+            prefix,
+            "# TYPE %s_background_tasks_total counter" % prefix))
+        for status in ('completed', 'failed'):
+            lines.append('%s_background_tasks_total{status="%s"} %d' %
+                         (prefix, status, getattr(self, status)))
+        lines.extend((
+            "# HELP %s_background_dropped_total Tasks dropped, queue was "
+            "full." % prefix,
+            "# TYPE %s_background_dropped_total counter" % prefix,
+            "%s_background_dropped_total %d" % (prefix, self.dropped)))
+        return '\n'.join(lines) + '\n'
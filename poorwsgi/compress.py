@@ -0,0 +1,455 @@
+"""Compression of dynamic responses.
+
+:Classes:   Codec, CodecStats, CodecRegistry, ZlibCompressor,
+            BrotliCompressor, ZstdCompressor
+:Functions: compress_response, compress_iter, is_compressible,
+            default_codecs, zstd_dictionary_codec
+"""
+from collections import namedtuple
+from logging import getLogger
+from threading import Lock
+from time import thread_time
+from typing import Callable, Dict, Iterable, Optional, Tuple
+
+import zlib
+
+try:
+    import brotli  # type: ignore
+    BROTLI = True
+except ImportError:
+    BROTLI = False
+
+try:
+    import zstandard  # type: ignore
+    ZSTD = True
+except ImportError:
+    ZSTD = False
+
+from poorwsgi.headers import negotiate_encoding
+from poorwsgi.response import BaseResponse, Response, GeneratorResponse
+from poorwsgi.state import HTTP_NO_CONTENT, HTTP_NOT_MODIFIED, \
+    HTTP_PARTIAL_CONTENT
+
+log = getLogger("poorwsgi")
+
+# pylint: disable=unsubscriptable-object
+
+# mime types, which are compressed; text/* types are compressed every time
+COMPRESS_MIME_TYPES = [
+    'application/json',
+    'application/javascript',
+    'application/xml',
+    'application/xhtml+xml',
+    'image/svg+xml']
+COMPRESS_MIN_SIZE = 1024
+
+
+class ZlibCompressor:
+    """Compressor for gzip (wbits=31) and deflate (wbits=15) codings."""
+    def __init__(self, level: int, wbits: int):
+        self.__obj = zlib.compressobj(level, zlib.DEFLATED, wbits)
+
+    def compress(self, data: bytes) -> bytes:
+        """Compress data, output could be buffered."""
+        return self.__obj.compress(data)
+
+    def flush(self) -> bytes:
+        """Return all buffered data, stream could continue."""
+        return self.__obj.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        """Return rest of data and end the stream."""
+        return self.__obj.flush()
+
+
+class BrotliCompressor:
+    """Compressor for br coding, which needs brotli module."""
+    def __init__(self, level: int):
+        self.__obj = brotli.Compressor(quality=level)
+
+    def compress(self, data: bytes) -> bytes:
+        """Compress data, output could be buffered."""
+        return self.__obj.process(data)
+
+    def flush(self) -> bytes:
+        """Return all buffered data, stream could continue."""
+        return self.__obj.flush()
+
+    def finish(self) -> bytes:
+        """Return rest of data and end the stream."""
+        return self.__obj.finish()
+
+
+class ZstdCompressor:
+    """Compressor for zstd coding, which needs zstandard module.
+
+    Argument dictionary is zstandard.ZstdCompressionDict instance.
+    """
+    def __init__(self, level: int, dictionary=None):
+        self.__obj = zstandard.ZstdCompressor(
+            level=level, dict_data=dictionary).compressobj()
+
+    def compress(self, data: bytes) -> bytes:
+        """Compress data, output could be buffered."""
+        return self.__obj.compress(data)
+
+    def flush(self) -> bytes:
+        """Return all buffered data, stream could continue."""
+        return self.__obj.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+
+    def finish(self) -> bytes:
+        """Return rest of data and end the stream."""
+        return self.__obj.flush()
+
+
+class CodecStats(namedtuple('CodecStats', ('responses', 'bytes_in',
+                                           'bytes_out', 'cpu_time'))):
+    """Statistics of one codec; cpu_time is in seconds."""
+    __slots__ = ()
+
+    @property
+    def ratio(self) -> float:
+        """Compression ratio, input size divided by output size."""
+        return self.bytes_in / self.bytes_out if self.bytes_out else 0.0
+
+
+class _MeasuredCompressor:
+    """Compressor proxy, which measures data sizes and thread CPU time."""
+    def __init__(self, codec: 'Codec', compressor):
+        self.__codec = codec
+        self.__compressor = compressor
+        self.__in = 0
+        self.__out = 0
+        self.__cpu = 0.0
+
+    def __measure(self, method: Callable, *args) -> bytes:
+        start = thread_time()
+        retval = method(*args)
+        self.__cpu += thread_time() - start
+        self.__out += len(retval)
+        return retval
+
+    def compress(self, data: bytes) -> bytes:
+        """Compress data, output could be buffered."""
+        self.__in += len(data)
+        return self.__measure(self.__compressor.compress, data)
+
+    def flush(self) -> bytes:
+        """Return all buffered data, stream could continue."""
+        return self.__measure(self.__compressor.flush)
+
+    def finish(self, record: bool = True) -> bytes:
+        """Return rest of data, end the stream and store statistics.
+
+        When record is False, statistics are stored later by record method,
+        only if compressed data are used.
+        """
+        retval = self.__measure(self.__compressor.finish)
+        if record:
+            self.record()
+        return retval
+
+    def record(self):
+        """Store statistics of compressed stream to codec."""
+        self.__codec.record(self.__in, self.__out, self.__cpu)
+
+
+class Codec:
+    """Content coding with its compressor factory and statistics.
+
+    Factory is called with level argument and must return object with
+    compress, flush and finish methods. Codec without factory is not
+    available for dynamic responses, but its suffix could be still used for
+    precompressed static files. When mime_types is set, only responses with
+    that mime types are compressed by codec. Argument min_size overrides
+    minimal size of response from Application.
+
+    >>> codec = Codec('gzip', lambda level: ZlibCompressor(level, 31))
+    >>> compressor = codec.compressor()
+    >>> data = compressor.compress(b'a' * 1000) + compressor.finish()
+    >>> zlib.decompress(data, 31) == b'a' * 1000
+    True
+    >>> stats = codec.stats()
+    >>> stats.responses, stats.bytes_in, stats.ratio > 10
+    (1, 1000, True)
+    """
+    def __init__(self, name: str, factory: Optional[Callable] = None,
+                 level: int = 6, suffix: Optional[str] = None,
+                 mime_types: Optional[Iterable[str]] = None,
+                 min_size: Optional[int] = None):
+        # pylint: disable=too-many-arguments
+        self.name = name
+        self.factory = factory
+        self.level = level
+        self.suffix = suffix
+        self.mime_types = tuple(mime_types) if mime_types else None
+        self.min_size = min_size
+        self.__lock = Lock()
+        self.__stats = CodecStats(0, 0, 0, 0.0)
+
+    def __repr__(self):
+        return "Codec(%r, level=%r)" % (self.name, self.level)
+
+    @property
+    def available(self) -> bool:
+        """True if codec could compress data."""
+        return self.factory is not None
+
+    def accept(self, mime_type: str, size: Optional[int],
+               mime_types: Iterable[str], min_size: int) -> bool:
+        """Return True if response could be compressed by codec.
+
+        Size is None for responses with unknown size, which are accepted.
+        """
+        if not self.available:
+            return False
+        if self.mime_types is not None:
+            if mime_type.split(';')[0].strip().lower() not in self.mime_types:
+                return False
+        elif not is_compressible(mime_type, mime_types):
+            return False
+        if self.min_size is not None:
+            min_size = self.min_size
+        return size is None or size >= min_size
+
+    def compressor(self):
+        """Return new compressor, which updates codec statistics."""
+        return _MeasuredCompressor(self, self.factory(self.level))
+
+    def record(self, bytes_in: int, bytes_out: int, cpu_time: float):
+        """Add one compressed response to statistics."""
+        with self.__lock:
+            stats = self.__stats
+            self.__stats = CodecStats(stats.responses + 1,
+                                      stats.bytes_in + bytes_in,
+                                      stats.bytes_out + bytes_out,
+                                      stats.cpu_time + cpu_time)
+
+    def stats(self) -> CodecStats:
+        """Return CodecStats with responses, bytes_in, bytes_out, cpu_time
+        and ratio values."""
+        return self.__stats
+
+    def reset(self):
+        """Reset statistics."""
+        with self.__lock:
+            self.__stats = CodecStats(0, 0, 0, 0.0)
+
+
+class CodecRegistry:
+    """Ordered registry of codecs.
+
+    When client accepts more codings with the same quality, the first
+    registered codec wins. Identity is not registered, it is always used
+    when no codec is acceptable.
+
+    >>> registry = default_codecs()
+    >>> 'gzip' in registry, registry['gzip'].level
+    (True, 6)
+    >>> registry.suffixes()
+    (('br', '.br'), ('zstd', '.zst'), ('gzip', '.gz'))
+    """
+    def __init__(self, codecs: Iterable[Codec] = ()):
+        self.__codecs: Dict[str, Codec] = {}
+        self.__lock = Lock()
+        for codec in codecs:
+            self.register(codec)
+
+    def register(self, codec: Codec, first: bool = False):
+        """Add or replace codec, first codec has the highest preference."""
+        with self.__lock:
+            codecs = dict(self.__codecs)
+            codecs.pop(codec.name, None)
+            if first:
+                codecs = {codec.name: codec, **codecs}
+            else:
+                codecs[codec.name] = codec
+            self.__codecs = codecs
+
+    def unregister(self, name: str):
+        """Remove codec from registry."""
+        with self.__lock:
+            codecs = dict(self.__codecs)
+            codecs.pop(name, None)
+            self.__codecs = codecs
+
+    def __getitem__(self, name: str) -> Codec:
+        return self.__codecs[name]
+
+    def __contains__(self, name: str):
+        return name in self.__codecs
+
+    def __iter__(self):
+        return iter(self.__codecs.values())
+
+    def __len__(self):
+        return len(self.__codecs)
+
+    def suffixes(self) -> Tuple[Tuple[str, str], ...]:
+        """Return pairs of coding and file suffix for precompressed files."""
+        return tuple((codec.name, codec.suffix)
+                     for codec in self.__codecs.values() if codec.suffix)
+
+    def stats(self) -> Dict[str, CodecStats]:
+        """Return statistics of all codecs."""
+        return {name: codec.stats() for name, codec in self.__codecs.items()}
+
+
+def default_codecs() -> CodecRegistry:
+    """Return new registry with br, zstd, gzip and deflate codecs.
+
+    Codecs br and zstd are available only when brotli or zstandard module
+    could be imported, but their suffixes are used for precompressed files
+    every time.
+    """
+    return CodecRegistry((
+        Codec('br', BrotliCompressor if BROTLI else None, 4, '.br'),
+        Codec('zstd', ZstdCompressor if ZSTD else None, 3, '.zst'),
+        Codec('gzip', lambda level: ZlibCompressor(level, 31), 6, '.gz'),
+        Codec('deflate', lambda level: ZlibCompressor(level, 15), 6)))
+
+
+def zstd_dictionary_codec(name: str, dictionary: bytes, level: int = 3,
+                          mime_types: Iterable[str] = ('application/json',),
+                          min_size: int = 0) -> Codec:
+    """Return zstd codec with trained dictionary.
+
+    Dictionary, for example from zstandard.train_dictionary function, must
+    be known by client too, so codec name must be own content coding like
+    ``x-zstd-api-v1``, which client sends in Accept-Encoding header. Small
+    responses are compressed too by default, because dictionaries are
+    effective just for small repetitive payloads like JSON API responses.
+    """
+    if not ZSTD:
+        raise NotImplementedError("zstd dictionary needs zstandard module")
+    dict_data = zstandard.ZstdCompressionDict(dictionary)
+    dict_data.precompute_compress(level=level)
+    return Codec(name, lambda level_: ZstdCompressor(level_, dict_data),
+                 level, mime_types=mime_types, min_size=min_size)
+
+
+# default registry, when compress_response is called without codecs
+CODECS = default_codecs()
+
+
+def is_compressible(mime_type: str, mime_types: Iterable[str]) -> bool:
+    """Return True if mime type is text or it is in mime_types.
+
+    >>> is_compressible('text/csv; charset=utf-8', ())
+    True
+    >>> is_compressible('application/ld+json', ('application/json',))
+    True
+    >>> is_compressible('image/png', COMPRESS_MIME_TYPES)
+    False
+    """
+    mime_type = mime_type.split(';')[0].strip().lower()
+    if mime_type.startswith('text/') or mime_type in mime_types:
+        return True
+    return mime_type.endswith('+json') or mime_type.endswith('+xml')
+
+
+def compress_iter(iterable: Iterable[bytes], compressor):
+    """Compress iterable of bytes chunk by chunk.
+
+    Each chunk is flushed, so client could decompress data as soon as they
+    are generated, which is important for streaming responses.
+
+    >>> data = b''.join(compress_iter(iter((b'abc', b'def')),
+    ...                               ZlibCompressor(6, 31)))
+    >>> zlib.decompress(data, 31)
+    b'abcdef'
+    """
+    try:
+        for chunk in iterable:
+            if chunk:
+                yield compressor.compress(chunk) + compressor.flush()
+        yield compressor.finish()
+    finally:
+        close = getattr(iterable, 'close', None)
+        if close is not None:
+            close()
+
+
+def add_vary(response: BaseResponse):
+    """Add Accept-Encoding to Vary header of response."""
+    vary = response.headers.get('Vary')
+    if vary is None:
+        response.add_header('Vary', 'Accept-Encoding')
+    elif 'accept-encoding' not in vary.lower() and vary.strip() != '*':
+        response.headers['Vary'] = vary + ', Accept-Encoding'
+
+
+def compress_response(req, response: BaseResponse, default: bool = False,
+                      min_size: int = COMPRESS_MIN_SIZE,
+                      mime_types: Optional[Iterable[str]] = None,
+                      codecs: Optional[CodecRegistry] = None
+                      ) -> BaseResponse:
+    """Return compressed response, if client accept it.
+
+    Only Response and GeneratorResponse instances, and so JSONResponse,
+    TextResponse and other subclasses, could be compressed. Response
+    attribute ``compress`` enables (True) or disables (False) compression
+    for one response, when it is None, default argument is used.
+
+    Response is not compressed when it has Content-Encoding header or
+    ``Cache-Control: no-transform``. Codecs from registry, which accept
+    content type and size of response, are negotiated with Accept-Encoding
+    request header. GeneratorResponse is compressed incrementally, each chunk
+    is flushed. Strong ETag is changed to weak, because compressed body is
+    not the same byte sequence.
+    """
+    # pylint: disable=too-many-return-statements
+    enabled = response.compress if response.compress is not None \
+        else default
+    if not enabled or not isinstance(response, (Response, GeneratorResponse)):
+        return response
+    if response.status_code < 200 or response.status_code in (
+            HTTP_NO_CONTENT, HTTP_NOT_MODIFIED, HTTP_PARTIAL_CONTENT):
+        return response
+    if isinstance(response, GeneratorResponse) and \
+            hasattr(response.__end_of_response__(), '__aiter__'):
+        return response     # asynchronous generators are not compressed
+
+    headers = response.headers
+    if 'Content-Encoding' in headers or \
+            'no-transform' in headers.get('Cache-Control', ''):
+        return response
+    if mime_types is None:
+        mime_types = COMPRESS_MIME_TYPES
+    if codecs is None:
+        codecs = CODECS
+    mime_type = headers.get('Content-Type', response.content_type)
+    size = response.content_length if isinstance(response, Response) \
+        else None
+    available = {codec.name: codec for codec in codecs
+                 if codec.accept(mime_type, size, mime_types, min_size)}
+    if not available:
+        return response
+
+    add_vary(response)
+    coding = negotiate_encoding(req.accept_encoding, available)
+    if coding is None:
+        return response
+
+    compressor = available[coding].compressor()
+    if isinstance(response, Response):
+        data = response.data
+        data = compressor.compress(data) + compressor.finish(record=False)
+        if len(data) >= response.content_length:
+            return response     # compression does not help
+        compressor.record()
+        retval: BaseResponse = Response(data, response.content_type, headers,
+                                        response.status_code)
+    else:
+        retval = GeneratorResponse(
+            compress_iter(response.__end_of_response__(), compressor),
+            response.content_type, headers, response.status_code)
+
+    if 'Content-Length' in headers:
+        del headers['Content-Length']
+    headers.add('Content-Encoding', coding)
+    etag = headers.get('ETag')
+    if etag and not etag.startswith('W/'):
+        headers['ETag'] = 'W/' + etag
+    log.debug("Response compressed by %s", coding)
+    return retval
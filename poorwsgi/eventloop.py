@@ -0,0 +1,81 @@
+"""Background event loop for coroutine handlers under WSGI.
+
+:Classes:   EventLoopThread
+"""
+from asyncio import new_event_loop, run_coroutine_threadsafe, \
+    set_event_loop
+from logging import getLogger
+from os import getpid
+from threading import Lock, Thread, get_ident
+from typing import Any, Coroutine, Optional
+
+log = getLogger("poorwsgi")
+
+# pylint: disable=unsubscriptable-object
+
+
+class EventLoopThread:
+    """Long-lived event loop running in daemon thread.
+
+    Loop is started with the first coroutine, and it is started again in
+    forked process, so each worker of preforking server has its own loop.
+    Coroutines from all requests of the worker are run in the same loop, so
+    connection pools of async clients survive across requests.
+
+    >>> async def answer():
+    ...     return 42
+    >>> EventLoopThread().run(answer())
+    42
+    """
+    def __init__(self):
+        self.__lock = Lock()
+        self.__loop = None
+        self.__thread: Optional[Thread] = None
+        self.__pid = None
+
+    @property
+    def loop(self):
+        """Return running event loop, start it if it is needed."""
+        if self.__loop is None or self.__pid != getpid():
+            with self.__lock:
+                if self.__loop is None or self.__pid != getpid():
+                    self.__start()
+        return self.__loop
+
+    def __start(self):
+        loop = new_event_loop()
+        thread = Thread(target=self.__run_forever, args=(loop,),
+                        name="poorwsgi-loop", daemon=True)
+        thread.start()
+        self.__loop, self.__thread, self.__pid = loop, thread, getpid()
+        log.debug("Event loop thread started")
+
+    @staticmethod
+    def __run_forever(loop):
+        set_event_loop(loop)
+        loop.run_forever()
+
+    def run(self, coroutine: Coroutine, timeout: Optional[float] = None
+            ) -> Any:
+        """Run coroutine in event loop and wait for its result."""
+        loop = self.loop
+        if self.__thread is not None and self.__thread.ident == get_ident():
+            coroutine.close()
+            raise RuntimeError("Coroutine can't wait for event loop thread "
+                               "from the same thread.")
+        return run_coroutine_threadsafe(coroutine, loop).result(timeout)
+
+    def stop(self):
+        """Stop event loop and wait for its thread."""
+        with self.__lock:
+            if self.__loop is None or self.__pid != getpid():
+                return
+            loop, thread = self.__loop, self.__thread
+            loop.call_soon_threadsafe(loop.stop)
+            thread.join()
+            loop.close()
+            self.__loop = self.__thread = None
+
+
+# event loop of this worker process
+event_loop = EventLoopThread()
@@ -0,0 +1,493 @@
+"""Streaming parser of request body forms.
+
+:Classes:   MultipartParser, FieldStorage
+"""
+from io import BytesIO
+from tempfile import TemporaryFile
+from typing import Any, Callable, Optional, List, Dict
+from urllib.parse import parse_qsl
+
+import re
+
+from poorwsgi.headers import Headers, parse_header
+
+# pylint: disable=unsubscriptable-object
+
+# the same limit which cgi module use for files in memory
+MEMFILE_MAX = 1000
+# maximum size of part headers
+MAX_HEADER_SIZE = 65536
+
+RE_BOUNDARY = re.compile(rb'^[ -~]{0,200}[!-~]$')
+
+PREAMBLE, BOUNDARY, HEADERS, BODY, END = range(5)
+
+
+def take(buffer: bytearray, size: int) -> bytes:
+    """Remove size bytes from begin of buffer and return them."""
+    with memoryview(buffer) as view:
+        data = view[:size].tobytes()
+    del buffer[:size]
+    return data
+
+
+class MultipartParser:
+    """Push parser of ``multipart/form-data`` body.
+
+    Data are fed to parser in blocks of any size, and parser calls callbacks
+    for each part. Only part headers and small tail of data, which could be
+    the begin of boundary, are buffered, so memory usage don't depend on
+    size of request body.
+
+    on_part_begin(headers) : callable
+        Called with Headers object when part headers are parsed.
+    on_part_data(data) : callable
+        Called with bytes of part body, could be called more times.
+    on_part_end() : callable
+        Called, when part is complete.
+
+    >>> parts = []
+    >>> parser = MultipartParser(
+    ...     b'xyz', lambda headers: parts.append([headers['X-Name']]),
+    ...     lambda data: parts[-1].append(data), lambda: None)
+    >>> parser.feed(b'--xyz\\r\\nX-Name: a\\r\\n\\r\\nfirst\\r\\n--x')
+    >>> parser.feed(b'yz\\r\\nX-Name: b\\r\\n\\r\\nsecond\\r\\n--xyz--\\r\\n')
+    >>> parser.finished
+    True
+    >>> [(name, b''.join(data)) for name, *data in parts]
+    [('a', b'first'), ('b', b'second')]
+    """
+    # pylint: disable=too-many-instance-attributes
+    def __init__(self, boundary: bytes,
+                 on_part_begin: Callable, on_part_data: Callable,
+                 on_part_end: Callable, encoding: str = 'utf-8',
+                 errors: str = 'replace',
+                 max_header_size: int = MAX_HEADER_SIZE):
+        # pylint: disable=too-many-arguments
+        if not RE_BOUNDARY.match(boundary):
+            raise ValueError("Invalid boundary in multipart form: %r"
+                             % boundary)
+        self.__delimiter = b'\r\n--' + boundary
+        # CRLF before first boundary is part of delimiter
+        self.__buffer = bytearray(b'\r\n')
+        self.__state = PREAMBLE
+        self.__on_part_begin = on_part_begin
+        self.__on_part_data = on_part_data
+        self.__on_part_end = on_part_end
+        self.__encoding = encoding
+        self.__errors = errors
+        self.__max_header_size = max_header_size
+
+    @property
+    def finished(self):
+        """True if close delimiter was found."""
+        return self.__state == END
+
+    def feed(self, data: bytes):
+        """Process block of data, data after close delimiter are ignored."""
+        if self.__state == END:
+            return
+        self.__buffer += data
+        while self.__step():
+            pass
+
+    def close(self):
+        """Flush not finished part, which is ended by end of input."""
+        if self.__state == BODY:
+            if self.__buffer:
+                self.__on_part_data(take(self.__buffer, len(self.__buffer)))
+            self.__on_part_end()
+        self.__buffer.clear()
+
+    def __step(self) -> bool:
+        """Do one parsing step, return False when more data is needed."""
+        # pylint: disable=too-many-return-statements
+        buffer = self.__buffer
+        if self.__state == BODY:
+            pos = buffer.find(self.__delimiter)
+            if pos < 0:
+                # tail of buffer could be begin of delimiter
+                size = len(buffer) - len(self.__delimiter) + 1
+                if size > 0:
+                    self.__on_part_data(take(buffer, size))
+                return False
+            if pos:
+                self.__on_part_data(take(buffer, pos))
+            del buffer[:len(self.__delimiter)]
+            self.__on_part_end()
+            self.__state = BOUNDARY
+            return True
+
+        if self.__state == PREAMBLE:
+            pos = buffer.find(self.__delimiter)
+            if pos < 0:
+                del buffer[:max(len(buffer) - len(self.__delimiter) + 1, 0)]
+                return False
+            del buffer[:pos + len(self.__delimiter)]
+            self.__state = BOUNDARY
+            return True
+
+        if self.__state == BOUNDARY:
+            if buffer[:2] == b'--':
+                buffer.clear()
+                self.__state = END
+                return False
+            pos = buffer.find(b'\r\n')
+            if pos < 0:
+                if len(buffer) > self.__max_header_size:
+                    raise ValueError("Invalid boundary in multipart form")
+                return False
+            if buffer[:pos].strip(b' \t'):
+                raise ValueError("Invalid boundary in multipart form")
+            del buffer[:pos + 2]
+            self.__state = HEADERS
+            return True
+
+        # HEADERS
+        if buffer[:2] == b'\r\n':       # part without headers
+            del buffer[:2]
+            raw = b''
+        else:
+            pos = buffer.find(b'\r\n\r\n')
+            if pos < 0:
+                if len(buffer) > self.__max_header_size:
+                    raise ValueError("Multipart headers are too big")
+                return False
+            raw = take(buffer, pos)
+            del buffer[:4]
+        self.__on_part_begin(self.__parse_headers(raw))
+        self.__state = BODY
+        return True
+
+    def __parse_headers(self, raw: bytes) -> Headers:
+        """Create Headers object from raw part headers."""
+        headers: List = []
+        for line in raw.decode(self.__encoding, self.__errors).split('\r\n'):
+            if line[:1] in (' ', '\t') and headers:     # obsolete folding
+                headers[-1] = (headers[-1][0],
+                               headers[-1][1] + ' ' + line.strip())
+                continue
+            name, sep, value = line.partition(':')
+            if not sep:
+                raise ValueError("Invalid multipart header: %r" % line)
+            headers.append((name.strip(), value.strip()))
+        return Headers(headers, False)
+
+
+class FieldStorage:
+    """Parsed form from request body.
+
+    Both ``multipart/form-data`` and ``application/x-www-form-urlencoded``
+    forms are supported. Request body is read block by block, and file parts
+    are written directly to files, which are created by file_callback, or to
+    temporary files.
+
+    Form has getvalue, getfirst and getlist methods, which can call function
+    on values and dictionary like access.
+
+    There are some usable variables, which you can use, if you want to test
+    what variable it is:
+
+    :name:      variable name, the same name from input attribute.
+    :type:      mime-type of variable. All variables have internal
+                mime-type, if that is no file, mime-type is text/plain.
+    :filename:  if variable is file, filename is its name from form.
+    :file:      file type instance, from you can read variable. This instance
+                could be TemporaryFile as default for files, BytesIO for
+                small files or instance of your own file type class,
+                create from file_callback.
+    :list:      if variable is list of variables, this contains instances of
+                FieldStorage.
+    """
+    # pylint: disable=too-many-instance-attributes
+    block_size = 65536
+
+    def __init__(self, req=None, headers=None, outerboundary=b'',
+                 environ=None, keep_blank_values=0, strict_parsing=0,
+                 limit=None, encoding='utf-8', errors='replace',
+                 max_num_fields=None, separator='&', file_callback=None):
+        """Constructor of FieldStorage.
+
+        Some of input parameters (outerboundary and limit) are kept only for
+        compatibility with previous implementation based on cgi module. You
+        need add only:
+
+        req : Request
+            Input request.
+        keep_blank_values : int (0)
+            If you want to parse blank values as right empty values.
+        strict_parsing : int (0)
+            If you want to raise exception on parsing error.
+        file_callback : callback
+            Callback for creating instance of uploading files.
+        """
+        # pylint: disable=too-many-arguments,too-many-locals
+        # pylint: disable=unused-argument
+        self.name: Optional[str] = None
+        self.filename: Optional[str] = None
+        self.type: Optional[str] = None
+        self.type_options: Dict[str, str] = {}
+        self.disposition: Optional[str] = None
+        self.disposition_options: Dict[str, str] = {}
+        self.headers = headers
+        self.file = None
+        self.list: Optional[List['FieldStorage']] = None
+        self.length = -1
+        self.bytes_read = 0
+        self.encoding = encoding
+        self.errors = errors
+        self.keep_blank_values = keep_blank_values
+        self.strict_parsing = strict_parsing
+        self.max_num_fields = max_num_fields
+        self.separator = separator
+
+        self.__file_callback = file_callback
+        self.__value: Any = None
+        self.__chunks: List[bytes] = []
+        self.__index: Dict[Optional[str], List['FieldStorage']] = {}
+
+        if hasattr(req, 'environ') and hasattr(req, 'input'):
+            if req.environ.get('wsgi.input', None) is None:
+                raise ValueError('No wsgi input File in request environment.')
+            environ = req.environ
+            self.headers = req.headers
+            req = req.input
+        if environ is None:
+            environ = {}
+
+        if req is None or not hasattr(req, 'read'):
+            return              # empty form
+
+        ctype = environ.get('CONTENT_TYPE')
+        if ctype is None and self.headers is not None:
+            ctype = self.headers.get('Content-Type')
+        self.type, self.type_options = parse_header(
+            ctype or 'application/x-www-form-urlencoded')
+
+        length = environ.get('CONTENT_LENGTH')
+        if length is None and self.headers is not None:
+            length = self.headers.get('Content-Length')
+        self.length = int(length or -1)
+
+        if self.type == 'multipart/form-data':
+            self.__read_multi(req)
+        elif self.type == 'application/x-www-form-urlencoded':
+            self.__read_urlencoded(req)
+        else:
+            self.__read_single(req)
+
+    def __read_blocks(self, file):
+        """Yield blocks of data from input file to the length."""
+        todo = self.length
+        while todo:
+            size = self.block_size if todo < 0 else min(todo, self.block_size)
+            data = file.read(size)
+            if not data:
+                return
+            self.bytes_read += len(data)
+            if todo > 0:
+                todo -= len(data)
+            yield data
+
+    def __append(self, fields: List['FieldStorage'], item: 'FieldStorage'):
+        """Add item to fields, and to index by names."""
+        if self.max_num_fields is not None and \
+                len(fields) >= self.max_num_fields:
+            raise ValueError('Max number of fields exceeded')
+        fields.append(item)
+        self.__index.setdefault(item.name, []).append(item)
+
+    def __read_multi(self, file):
+        """Parse multipart/form-data form."""
+        boundary = self.type_options.get('boundary', '')
+        fields: List[FieldStorage] = []
+        parts: List[FieldStorage] = []
+
+        def on_part_begin(headers: Headers):
+            part = FieldStorage(encoding=self.encoding, errors=self.errors,
+                                file_callback=self.__file_callback)
+            part.headers = headers
+            part.disposition, part.disposition_options = parse_header(
+                headers.get('Content-Disposition', ''))
+            part.name = part.disposition_options.get('name')
+            part.filename = part.disposition_options.get('filename')
+            part.type, part.type_options = parse_header(
+                headers.get('Content-Type', 'text/plain'))
+            if part.filename is not None:
+                part.file = part.make_file() if self.__file_callback \
+                    else BytesIO()
+            self.__append(fields, part)
+            parts.append(part)
+
+        def on_part_data(data: bytes):
+            parts[-1].write_data(data)
+
+        def on_part_end():
+            parts.pop().finish_data()
+
+        parser = MultipartParser(
+            boundary.encode('ascii', 'replace'), on_part_begin,
+            on_part_data, on_part_end, self.encoding, self.errors)
+        for data in self.__read_blocks(file):
+            parser.feed(data)
+            if parser.finished:
+                break
+        parser.close()
+        self.list = fields
+        if self.strict_parsing and not parser.finished:
+            raise ValueError("Unexpected end of multipart form")
+
+    def __read_urlencoded(self, file):
+        """Parse application/x-www-form-urlencoded form."""
+        query = b''.join(self.__read_blocks(file))
+        fields: List[FieldStorage] = []
+        for key, val in parse_qsl(
+                query.decode(self.encoding, self.errors),
+                self.keep_blank_values, self.strict_parsing,
+                encoding=self.encoding, errors=self.errors,
+                max_num_fields=self.max_num_fields,
+                separator=self.separator):
+            item = FieldStorage(encoding=self.encoding, errors=self.errors)
+            item.name = key
+            item.value = val
+            self.__append(fields, item)
+        self.list = fields
+
+    def __read_single(self, file):
+        """Store other body types to file."""
+        self.file = BytesIO()
+        for data in self.__read_blocks(file):
+            self.write_data(data)
+        self.finish_data()
+
+    def write_data(self, data: bytes):
+        """Write part data to file or to internal buffer, used by parser."""
+        if self.file is None:
+            self.__chunks.append(data)
+            return
+        if isinstance(self.file, BytesIO) and \
+                self.file.tell() + len(data) > MEMFILE_MAX:
+            file = self.make_file()
+            file.write(self.file.getvalue())
+            self.file = file
+        self.file.write(data)
+
+    def finish_data(self):
+        """Finish part, files are seek to begin, used by parser."""
+        if self.file is None:
+            self.__value = b''.join(self.__chunks).decode(self.encoding,
+                                                         self.errors)
+            self.__chunks.clear()
+        else:
+            self.file.seek(0)
+
+    def make_file(self):
+        """Return readable and writable file for file part.
+
+        If file_callback was set, it is called with filename, otherwise
+        temporary file is returned.
+        """
+        if self.__file_callback:
+            return self.__file_callback(self.filename)
+        return TemporaryFile("wb+")  # pylint: disable=consider-using-with
+
+    @property
+    def value(self):
+        """Value of variable, bytes from files, or list of variables."""
+        if self.file is not None:
+            self.file.seek(0)
+            value = self.file.read()
+            self.file.seek(0)
+            return value
+        if self.list is not None:
+            return self.list
+        return self.__value
+
+    @value.setter
+    def value(self, value: Any):
+        self.__value = value
+
+    def __repr__(self):
+        return "FieldStorage(%r, %r, %r)" % (self.name, self.filename,
+                                             self.list or self.__value)
+
+    def getvalue(self, key: str, default: Any = None):
+        """Return value or list of values for key or default."""
+        if key not in self:
+            return default
+        value = self[key]
+        if isinstance(value, list):
+            return [item.value for item in value]
+        return value.value
+
+    def get(self, key: str, default: Any = None):
+        """Compatibility methods with dict, alias for getvalue."""
+        return self.getvalue(key, default)
+
+    def getfirst(self, key: str, default: Any = None, fce: Callable = str):
+        """Returns first variable value for key or default, if key not exist.
+
+        Arguments:
+            key : str
+                key name
+            default : None
+                default value if key not found
+            fce : convertor (str)
+                Function or class which processed value.
+        """
+        if key in self:
+            val = self.__index[key][0].value
+        else:
+            val = default
+        if val is None:
+            return None
+        return fce(val)
+
+    def getlist(self, key: str, default: Optional[List] = None,
+                fce: Callable = str):
+        """Returns list of variable values for key or empty list.
+
+        Arguments:
+            key : str
+                key name
+            default : list
+                List of values when key was not sent.
+            fce : convertor (str)
+                Function or class which processed value.
+        """
+        if key in self:
+            val = [item.value for item in self.__index[key]]
+        else:
+            val = default or []
+        for item in val:
+            yield fce(item)
+
+    def __getitem__(self, key: str):
+        """Dictionary like [] operator."""
+        items = self.__index.get(key)
+        if not items:
+            raise KeyError(key)
+        if len(items) == 1:
+            return items[0]
+        return items
+
+    def __contains__(self, key: str):
+        """Dictionary like in operator."""
+        return key in self.__index
+
+    def __bool__(self):
+        """Bool operator."""
+        return bool(self.list)
+
+    def __len__(self):
+        """Return count of variables names."""
+        return len(self.__index)
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def keys(self):
+        """Dictionary like keys() method."""
+        if self.list is None:
+            return tuple()
+        return list(self.__index)
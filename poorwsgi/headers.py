@@ -1,13 +1,14 @@
 """Classes, which is used for managing headers.
 
 :Classes:   Headers
-:Functions: parse_negotiation, render_negotiation
+:Functions: parse_negotiation, render_negotiation, negotiate_encoding,
+            parse_header, parse_range
 """
 from collections.abc import Mapping
 from wsgiref.headers import _formatparam  # type: ignore
 
 from datetime import datetime, timezone
-from typing import Union, List, Tuple, Optional
+from typing import Union, List, Tuple, Optional, Dict, Iterable
 
 # pylint: disable=consider-using-f-string
 
@@ -38,6 +39,80 @@ def parse_negotiation(value: str):
     return values
 
 
+def _parse_params(value: str):
+    """Yield parameters separated by semicolon, quoted strings are kept."""
+    while value[:1] == ';':
+        value = value[1:]
+        end = value.find(';')
+        while end > 0 and (value.count('"', 0, end) -
+                           value.count('\\"', 0, end)) % 2:
+            end = value.find(';', end + 1)
+        if end < 0:
+            end = len(value)
+        yield value[:end].strip()
+        value = value[end:]
+
+
+def parse_header(line: str):
+    """Parse header like Content-Type to main value and parameters.
+
+    This is replacement of cgi.parse_header function.
+
+    >>> parse_header('text/html; charset=utf-8')
+    ('text/html', {'charset': 'utf-8'})
+    >>> parse_header('form-data; name="file"; filename="a;b.txt"')
+    ('form-data', {'name': 'file', 'filename': 'a;b.txt'})
+    """
+    params = _parse_params(';' + line)
+    key = next(params)
+    pdict = {}
+    for param in params:
+        pos = param.find('=')
+        if pos >= 0:
+            name = param[:pos].strip().lower()
+            value = param[pos+1:].strip()
+            if len(value) >= 2 and value[0] == value[-1] == '"':
+                value = value[1:-1]
+                value = value.replace('\\\\', '\\').replace('\\"', '"')
+            pdict[name] = value
+    return key, pdict
+
+
+def parse_range(value: str):
+    """Parse Range header value to tuple of (start, end) pairs.
+
+    Only bytes unit is supported. Missing start or end is None. When value
+    is not valid, None is returned, and Range header must be ignored.
+
+    >>> parse_range('bytes=0-499, -500, 9500-')
+    ((0, 499), (None, 500), (9500, None))
+    >>> parse_range('bytes=500-100') is None
+    True
+    >>> parse_range('items=1-2') is None
+    True
+    """
+    units, sep, ranges = value.partition('=')
+    if not sep or units.strip().lower() != 'bytes':
+        return None
+    rval = []
+    for item in ranges.split(','):
+        item = item.strip()
+        if not item:
+            continue        # empty list elements are allowed
+        start, sep, end = (it.strip() for it in item.partition('-'))
+        if not sep or not (start or end):
+            return None
+        if not all(it.isdigit() and it.isascii() for it in (start, end)
+                   if it):
+            return None
+        first = int(start) if start else None
+        last = int(end) if end else None
+        if first is not None and last is not None and last < first:
+            return None
+        rval.append((first, last))
+    return tuple(rval) or None
+
+
 def render_negotiation(negotation: List[Tuple]):
     """Render negotiation header value from tuples.
 
@@ -55,6 +130,40 @@ def render_negotiation(negotation: List[Tuple]):
     return ', '.join(values)
 
 
+def negotiate_encoding(accept_encoding: Iterable[Tuple[str, float]],
+                       available: Iterable[str]) -> Optional[str]:
+    """Return the best content coding from available codings.
+
+    Argument accept_encoding is sequence of (coding, quality) pairs, just
+    like Request.accept_encoding. When more codings have the same quality,
+    the first from available wins. None is returned, when no coding is
+    acceptable, or when client prefers identity.
+
+    >>> negotiate_encoding((('gzip', 1.0), ('br', 1.0)), ('br', 'gzip'))
+    'br'
+    >>> negotiate_encoding((('gzip', 0.5), ('*', 1.0)), ('gzip',))
+    'gzip'
+    >>> negotiate_encoding((('br', 0.5), ('identity', 1.0)), ('br',))
+    >>> negotiate_encoding((('*', 0.0),), ('br', 'gzip'))
+    """
+    qualities = {}
+    for coding, quality in accept_encoding:
+        coding = coding.lower()
+        if coding == 'x-gzip':
+            coding = 'gzip'
+        qualities[coding] = quality
+    wildcard = qualities.get('*', 0.0)
+
+    best, best_quality = None, 0.0
+    for coding in available:
+        quality = qualities.get(coding, wildcard)
+        if quality > best_quality:
+            best, best_quality = coding, quality
+    if best and qualities.get('identity', 0.0) > best_quality:
+        return None
+    return best
+
+
 def datetime_to_http(value: datetime):
     """Return HTTP Date from timestamp.
 
@@ -118,6 +227,9 @@ class Headers(Mapping):
     When more same named header is set in HTTP request, server join it's value
     to one.
 
+    Headers are stored in ordered list, and in index by lower names too, so
+    headers lookup don't depend on count of headers.
+
     Empty header is not allowed.
 
     >>> headers = Headers({'X-Powered-By': 'Test'})
@@ -165,6 +277,20 @@ class Headers(Mapping):
             raise TypeError("headers must be tuple, list or set "
                             "of str pairs, or dict "
                             "(got {0})".format(type(headers)))
+        self.__reindex()
+
+    def __reindex(self):
+        """Rebuild index of lower header names."""
+        self.__index: Dict[str, List[str]] = {}
+        for key, val in self.__headers:
+            self.__index.setdefault(key.lower(), []).append(val)
+
+    @staticmethod
+    def __key(name: str) -> str:
+        """Return index key of header name."""
+        if isinstance(name, str) and name.isascii():
+            return name.lower()     # iso-8859-1 conversion is not needed
+        return Headers.iso88591(name).lower()
 
     def __len__(self):
         """Return len of header items."""
@@ -172,15 +298,21 @@ class Headers(Mapping):
 
     def __getitem__(self, name: str):
         """Return header item identified by lower name."""
-        name = Headers.iso88591(name.lower())
-        for k, val in self.__headers:
-            if k.lower() == name:
-                return val
-        raise KeyError("{0!r} is not registered".format(name))
+        name = Headers.__key(name)
+        values = self.__index.get(name)
+        if values is None:
+            raise KeyError("{0!r} is not registered".format(name))
+        return values[0]
+
+    def __contains__(self, name):
+        """Return True if header identified by lower name exists."""
+        return Headers.__key(name) in self.__index
 
     def __delitem__(self, name: str):
         """Delete item identied by lower name."""
-        name = Headers.iso88591(name.lower())
+        name = Headers.__key(name)
+        if self.__index.pop(name, None) is None:
+            return
         self.__headers = list(kv for kv in self.__headers
                               if kv[0].lower() != name)
 
@@ -195,6 +327,13 @@ class Headers(Mapping):
     def __repr__(self):
         return "Headers(%r)" % repr(tuple(self.__headers))
 
+    def get(self, key: str, default=None):
+        """Return header value identified by lower name, or default."""
+        values = self.__index.get(Headers.__key(key))
+        if values is None:
+            return default
+        return values[0]
+
     def names(self):
         """Return tuple of headers names."""
         return tuple(k for k, v in self.__headers)
@@ -216,8 +355,7 @@ class Headers(Mapping):
         >>> headers.get_all('X-Test')
         ()
         """
-        name = Headers.iso88591(name.lower())
-        return tuple(kv[1] for kv in self.__headers if kv[0].lower() == name)
+        return tuple(self.__index.get(Headers.__key(name), ()))
 
     def items(self):
         """Return tuple of headers pairs."""
@@ -285,7 +423,10 @@ class Headers(Mapping):
                                               Headers.iso88591(val)))
         if not parts:
             raise ValueError("Header value must be set.")
-        self.__headers.append((Headers.iso88591(name), "; ".join(parts)))
+        name = Headers.iso88591(name)
+        value = "; ".join(parts)
+        self.__headers.append((name, value))
+        self.__index.setdefault(name.lower(), []).append(value)
 
     @staticmethod
     def iso88591(value: str) -> str:
@@ -0,0 +1,152 @@
+"""Pluggable JSON codecs, which serialize to and parse from bytes.
+
+:Classes:   JSONCodec, StdlibCodec, OrjsonCodec, UjsonCodec, SimplejsonCodec
+:Functions: available_codecs, get_codec, set_codec, current_codec, dumps,
+            loads
+"""
+import json
+from typing import Any, Dict, List, Type, Union
+
+try:
+    import orjson
+except ImportError:
+    orjson = None  # type: ignore
+
+try:
+    import ujson
+except ImportError:
+    ujson = None  # type: ignore
+
+try:
+    import simplejson
+except ImportError:
+    simplejson = None  # type: ignore
+
+# pylint: disable=unsubscriptable-object
+# pylint: disable=consider-using-f-string
+
+
+class JSONCodec:
+    """Base class of JSON codecs.
+
+    Codec serializes objects to UTF-8 bytes, and parses bytes or str.
+    """
+    name = ''
+    module: Any = None
+
+    def __init__(self):
+        if self.module is None:
+            raise NotImplementedError(
+                "JSON codec %s needs %s module" % (self.name, self.name))
+
+    def dumps(self, obj: Any) -> bytes:
+        """Serialize obj to JSON bytes."""
+        raise NotImplementedError()
+
+    def loads(self, data: Union[bytes, str]) -> Any:
+        """Parse JSON document from bytes or str."""
+        return self.module.loads(data)
+
+    def __repr__(self):
+        return "<%s>" % self.__class__.__name__
+
+
+class StdlibCodec(JSONCodec):
+    """Codec with standard json module.
+
+    >>> StdlibCodec().dumps({'key': [1, 2]})
+    b'{"key": [1, 2]}'
+    """
+    name = 'json'
+    module = json
+
+    def dumps(self, obj: Any) -> bytes:
+        return json.dumps(obj).encode('utf-8')
+
+
+class OrjsonCodec(JSONCodec):
+    """Codec with orjson module, which serializes straight to bytes.
+
+    Output is compact, and not str keys of dictionaries are allowed like
+    in standard json module.
+    """
+    name = 'orjson'
+    module = orjson
+
+    def dumps(self, obj: Any) -> bytes:
+        # pylint: disable=no-member
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS)
+
+
+class UjsonCodec(JSONCodec):
+    """Codec with ujson module."""
+    name = 'ujson'
+    module = ujson
+
+    def dumps(self, obj: Any) -> bytes:
+        return ujson.dumps(obj, ensure_ascii=False).encode('utf-8')
+
+
+class SimplejsonCodec(JSONCodec):
+    """Codec with simplejson module."""
+    name = 'simplejson'
+    module = simplejson
+
+    def dumps(self, obj: Any) -> bytes:
+        return simplejson.dumps(obj).encode('utf-8')
+
+
+# codecs from the fastest one
+CODECS: Dict[str, Type[JSONCodec]] = {
+    'orjson': OrjsonCodec,
+    'ujson': UjsonCodec,
+    'simplejson': SimplejsonCodec,
+    'json': StdlibCodec}
+
+_codec: JSONCodec = StdlibCodec()
+
+
+def available_codecs() -> List[str]:
+    """Return names of codecs, which modules are installed.
+
+    >>> 'json' in available_codecs()
+    True
+    """
+    return [name for name, cls in CODECS.items() if cls.module is not None]
+
+
+def get_codec(name: str) -> JSONCodec:
+    """Return new codec by name.
+
+    Name ``auto`` means the fastest of installed codecs.
+
+    >>> get_codec('json')
+    <StdlibCodec>
+    """
+    if name == 'auto':
+        name = available_codecs()[0]
+    if name not in CODECS:
+        raise ValueError("Unknown JSON codec %s" % name)
+    return CODECS[name]()
+
+
+def set_codec(codec: Union[JSONCodec, str]):
+    """Set codec, which is used by dumps and loads functions."""
+    # pylint: disable=global-statement
+    global _codec
+    _codec = get_codec(codec) if isinstance(codec, str) else codec
+
+
+def current_codec() -> JSONCodec:
+    """Return codec, which is used by dumps and loads functions."""
+    return _codec
+
+
+def dumps(obj: Any) -> bytes:
+    """Serialize obj to JSON bytes with current codec."""
+    return _codec.dumps(obj)
+
+
+def loads(data: Union[bytes, str]) -> Any:
+    """Parse JSON document from bytes or str with current codec."""
+    return _codec.loads(data)
@@ -0,0 +1,175 @@
+"""Incremental parsing of JSON array and NDJSON request bodies.
+
+:Classes:   TextReader
+:Functions: json_stream, skip_whitespace, iter_array, iter_ndjson
+"""
+import re
+from codecs import getincrementaldecoder
+from json import JSONDecoder, JSONDecodeError
+from typing import Any, Callable, Iterable, Iterator, Optional
+
+from poorwsgi.jsoncodec import loads as json_loads
+
+# pylint: disable=unsubscriptable-object
+# pylint: disable=consider-using-f-string
+
+NDJSON_MIME_TYPES = ('application/x-ndjson', 'application/ndjson',
+                     'application/jsonl', 'application/x-jsonlines')
+MAX_ITEM_SIZE = 16777216    # 16 MiB of one item
+
+DELIMITERS = ' \t\n\r,]}'
+re_whitespace = re.compile(r'[ \t\n\r]*')
+re_delimiter = re.compile(r'[ \t\n\r]*([,\]])[ \t\n\r]*')
+decoder = JSONDecoder()
+
+
+def json_stream(fun: Callable) -> Callable:
+    """Mark handler, which reads JSON body by Request.iter_json_items.
+
+    Body of such route is not parsed to Request.json by auto_json.
+
+    .. code:: python
+
+        @app.route('/bulk', method=state.METHOD_POST)
+        @json_stream
+        def bulk(req):
+            count = 0
+            for item in req.iter_json_items():
+                count += 1
+            return str(count)
+    """
+    fun.json_stream = True  # type: ignore
+    return fun
+
+
+def skip_whitespace(text: str, pos: int) -> int:
+    """Return position of the first non whitespace char from pos."""
+    match = re_whitespace.match(text, pos)
+    return match.end() if match else pos
+
+
+class TextReader:
+    """Decoded text from bytes blocks, which is read when it is needed."""
+    def __init__(self, blocks: Iterable[bytes], charset: str,
+                 max_item_size: int):
+        self.__blocks = iter(blocks)
+        self.__decoder = getincrementaldecoder(charset)()
+        self.__max_item_size = max_item_size
+        self.text = ''
+        self.pos = 0
+        self.eof = False
+
+    def more(self) -> bool:
+        """Read next block, return False at the end of blocks."""
+        if self.eof:
+            return False
+        block = next(self.__blocks, None)
+        if block is None:
+            self.eof = True
+            data = self.__decoder.decode(b'', final=True)
+        else:
+            data = self.__decoder.decode(block)
+        self.text = self.text[self.pos:] + data
+        self.pos = 0
+        return True
+
+    def next_char(self) -> str:
+        """Skip whitespace and return next char, empty string at the end."""
+        while True:
+            self.pos = skip_whitespace(self.text, self.pos)
+            if self.pos < len(self.text):
+                return self.text[self.pos]
+            if not self.more():
+                return ''
+
+    def decode(self) -> Any:
+        """Decode the next JSON value, read more blocks if it is needed.
+
+        Number at the end of text could continue in the next block, so
+        number is returned only when it is followed by delimiter.
+        """
+        self.next_char()
+        while True:
+            try:
+                obj, end = decoder.raw_decode(self.text, self.pos)
+                if self.eof or (end < len(self.text) and (
+                        self.text[end] in DELIMITERS
+                        or not isinstance(obj, (int, float))
+                        or isinstance(obj, bool))):
+                    self.pos = end
+                    return obj
+            except JSONDecodeError:
+                if self.eof:
+                    raise
+            if len(self.text) - self.pos > self.__max_item_size:
+                raise ValueError("JSON item is bigger than %d bytes" %
+                                 self.__max_item_size)
+            self.more()
+
+
+def iter_array(blocks: Iterable[bytes], charset: str = 'utf-8',
+               max_item_size: int = MAX_ITEM_SIZE) -> Iterator[Any]:
+    """Yield items of top-level JSON array from bytes blocks.
+
+    Only the current item and one block are in memory, so memory usage
+    doesn't depend on the size of array. ValueError is raised, when data
+    are not valid JSON array, or when item is bigger than max_item_size.
+
+    >>> list(iter_array((b'[{"a": 1}, 2', b'3, "x"', b']')))
+    [{'a': 1}, 23, 'x']
+    """
+    reader = TextReader(blocks, charset, max_item_size)
+    if reader.next_char() != '[':
+        raise ValueError("JSON body is not array")
+    reader.pos += 1
+    if reader.next_char() == ']':
+        reader.pos += 1
+    else:
+        scan_once = decoder.scan_once   # type: ignore
+        match = re_delimiter.match
+        while True:
+            try:    # fast path, item and delimiter are in the text
+                obj, end = scan_once(reader.text, reader.pos)
+                found = match(reader.text, end)
+            except (StopIteration, JSONDecodeError):
+                found = None
+            if found:
+                reader.pos = found.end()
+                char = found.group(1)
+            else:   # item or delimiter continues in the next block
+                obj = reader.decode()
+                char = reader.next_char()
+                if char not in (',', ']'):
+                    raise ValueError("Expecting ',' delimiter in JSON array")
+                reader.pos = skip_whitespace(reader.text, reader.pos + 1)
+            yield obj
+            if char == ']':
+                break
+    if reader.next_char():
+        raise ValueError("Extra data after JSON array")
+
+
+def iter_ndjson(blocks: Iterable[bytes],
+                loads: Optional[Callable[[bytes], Any]] = None,
+                max_item_size: int = MAX_ITEM_SIZE) -> Iterator[Any]:
+    """Yield values of newline delimited JSON from bytes blocks.
+
+    Lines are parsed by loads function, which is current JSON codec by
+    default. Empty lines are skipped.
+
+    >>> list(iter_ndjson((b'{"a": 1}\\n2', b'3\\n\\n"x"\\n')))
+    [{'a': 1}, 23, 'x']
+    """
+    loads = loads or json_loads
+    rest = b''
+    for block in blocks:
+        lines = (rest + block).split(b'\n')
+        rest = lines.pop()
+        if len(rest) > max_item_size:
+            raise ValueError("JSON item is bigger than %d bytes" %
+                             max_item_size)
+        for line in lines:
+            if line.strip():
+                yield loads(line)
+    if rest.strip():
+        yield loads(rest)
@@ -0,0 +1,195 @@
+"""Request metrics with Prometheus text exposition.
+
+:Classes:   Metrics
+:Functions: escape_label
+"""
+from bisect import bisect_left
+from threading import Lock, local
+from typing import Dict, List, Optional, Tuple
+
+from poorwsgi.response import TextResponse
+
+# pylint: disable=unsubscriptable-object
+# pylint: disable=consider-using-f-string
+
+# default latency histogram buckets in seconds
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0,
+           2.5, 5.0, 10.0)
+EXPOSITION_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# indexes of values in record list
+COUNT, SUM, BYTES_IN, BYTES_OUT, STATUS = range(5)
+BUCKET = STATUS + 5     # status classes from 1xx to 5xx
+
+
+def escape_label(value: str) -> str:
+    """Escape label value for text exposition format.
+
+    >>> print(escape_label('/path/"x"'))
+    /path/\\"x\\"
+    """
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace(
+        '\n', '\\n')
+
+
+class Metrics:
+    """Request count, status classes, latency histogram and transferred
+    bytes for each uri_rule and method.
+
+    Each thread records to its own dictionary, so no lock is needed when
+    request is recorded. Dictionaries from all threads are summed only when
+    metrics are read. Each record is list of counters: count, sum of
+    durations, bytes in, bytes out, five status classes and histogram
+    buckets. Durations of request phases from Timing are summed too.
+
+    >>> metrics = Metrics(buckets=(0.1, 1.0))
+    >>> metrics.record('/', 'GET', 200, 0.05, 0, 11)
+    >>> metrics.record('/', 'GET', 404, 0.5)
+    >>> metrics.values()[('/', 'GET')]
+    [2, 0.55, 0, 11, 0, 1, 0, 1, 0, 1, 1, 0]
+    """
+    def __init__(self, buckets: Tuple[float, ...] = BUCKETS,
+                 prefix: str = 'poorwsgi'):
+        self.buckets = tuple(sorted(buckets))
+        self.prefix = prefix
+        self.__local = local()
+        self.__shards: List[Dict] = []
+        self.__lock = Lock()     # only for adding new thread dictionary
+
+    def __shard(self) -> Dict:
+        try:
+            return self.__local.shard
+        except AttributeError:
+            shard: Dict = {}
+            self.__local.shard = shard
+            with self.__lock:
+                self.__shards.append(shard)
+            return shard
+
+    def record(self, rule: Optional[str], method: str, status_code: int,
+               duration: float, bytes_in: int = 0, bytes_out: int = 0,
+               phases: Optional[Dict[str, float]] = None):
+        """Record one request, durations are in seconds."""
+        # pylint: disable=too-many-arguments
+        try:
+            shard = self.__local.shard
+        except AttributeError:
+            shard = self.__shard()
+        rule = rule or ''
+        key = (rule, method)
+        values = shard.get(key)
+        if values is None:
+            values = shard[key] = [0, 0.0, 0, 0] + \
+                [0] * (6 + len(self.buckets))
+        values[COUNT] += 1
+        values[SUM] += duration
+        values[BYTES_IN] += bytes_in
+        values[BYTES_OUT] += bytes_out
+        values[STATUS + min(max(status_code // 100, 1), 5) - 1] += 1
+        values[BUCKET + bisect_left(self.buckets, duration)] += 1
+        if phases:
+            for phase, value in phases.items():
+                phase_key = (rule, method, phase)
+                summary = shard.get(phase_key)
+                if summary is None:
+                    shard[phase_key] = [value]
+                else:
+                    summary[0] += value
+
+    def __summary(self, size: int) -> dict:
+        """Sum counters with key of size from all threads."""
+        with self.__lock:
+            shards = list(self.__shards)
+        retval: dict = {}
+        for shard in shards:
+            for key, values in shard.copy().items():
+                if len(key) != size:
+                    continue
+                summary = retval.get(key)
+                if summary is None:
+                    retval[key] = list(values)
+                else:
+                    for i, value in enumerate(values):
+                        summary[i] += value
+        return retval
+
+    def values(self) -> Dict[Tuple[str, str], list]:
+        """Return summed counters from all threads."""
+        return self.__summary(2)
+
+    def phases(self) -> Dict[Tuple[str, str, str], float]:
+        """Return summed durations of request phases from all threads."""
+        return {key: val[0] for key, val in self.__summary(3).items()}
+
+    def exposition(self) -> str:
+        """Return metrics in Prometheus text exposition format."""
+        # pylint: disable=too-many-locals
+        prefix = self.prefix
+        values = sorted(self.values().items())
+        lines = [
+            "# HELP %s_requests_total Count of requests." % prefix,
+            "# TYPE %s_requests_total counter" % prefix]
+        for (rule, method), vals in values:
+            labels = 'rule="%s",method="%s"' % (escape_label(rule), method)
+            for i in range(5):
+                if vals[STATUS+i]:
+                    lines.append('%s_requests_total{%s,status="%dxx"} %d' %
+                                 (prefix, labels, i+1, vals[STATUS+i]))
+
+        lines.extend((
+            "# HELP %s_request_duration_seconds Request duration." % prefix,
+            "# TYPE %s_request_duration_seconds histogram" % prefix))
+        for (rule, method), vals in values:
+            labels = 'rule="%s",method="%s"' % (escape_label(rule), method)
+            total = 0
+            for i, bucket in enumerate(self.buckets):
+                total += vals[BUCKET+i]
+                lines.append(
+                    '%s_request_duration_seconds_bucket{%s,le="%s"} %d' %
+                    (prefix, labels, repr(float(bucket)), total))
+            lines.append(
+                '%s_request_duration_seconds_bucket{%s,le="+Inf"} %d' %
+                (prefix, labels, vals[COUNT]))
+            lines.append('%s_request_duration_seconds_sum{%s} %s' %
+                         (prefix, labels, repr(vals[SUM])))
+            lines.append('%s_request_duration_seconds_count{%s} %d' %
+                         (prefix, labels, vals[COUNT]))
+
+        for name, index, help_ in (
+                ('request_bytes_total', BYTES_IN, 'Received body bytes.'),
+                ('response_bytes_total', BYTES_OUT, 'Sent body bytes.')):
+            lines.append("# HELP %s_%s %s" % (prefix, name, help_))
+            lines.append("# TYPE %s_%s counter" % (prefix, name))
+            for (rule, method), vals in values:
+                lines.append('%s_%s{rule="%s",method="%s"} %d' %
+                             (prefix, name, escape_label(rule), method,
+                              vals[index]))
+
+        phases = sorted(self.phases().items())
+        if phases:
+            lines.extend((
+                "# HELP %s_request_phase_seconds_total Time spent in request "
+                "phases." % prefix,
+                "# TYPE %s_request_phase_seconds_total counter" % prefix))
+        for (rule, method, phase), value in phases:
+            lines.append(
+                '%s_request_phase_seconds_total{rule="%s",method="%s",'
+                'phase="%s"} %s' % (prefix, escape_label(rule), method, phase,
+                                    repr(value)))
+        return '\n'.join(lines) + '\n'
+
+    def handler(self, req):
+        """Request handler, which returns text exposition.
+
+        State of application's background tasks pool is appended.
+
+        .. code:: python
+
+            app.metrics = Metrics()
+            app.set_route('/metrics', app.metrics.handler)
+        """
+        text = self.exposition()
+        text += req.app.background_tasks.exposition(self.prefix)
+        response = TextResponse(text)
+        response.content_type = EXPOSITION_CONTENT_TYPE
+        return response
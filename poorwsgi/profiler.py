@@ -0,0 +1,251 @@
+"""Sampling profiler, which aggregates profiles of requests.
+
+:Classes:   SamplingProfiler
+:Functions: collapsed_stacks, profile_awaitable
+"""
+from cProfile import Profile
+from io import StringIO
+from logging import getLogger
+from os import path, makedirs
+from random import random
+from threading import Lock, Thread
+from time import monotonic, strftime
+from types import coroutine
+from typing import Any, Awaitable, Dict, List, Optional
+
+import marshal
+import pstats
+import re
+
+log = getLogger("poorwsgi")
+
+# pylint: disable=unsubscriptable-object
+
+RE_UNSAFE = re.compile(r'[^\w.-]+')
+
+
+def _label(func: tuple) -> str:
+    """Return label of pstats function tuple (file, line, name)."""
+    filename, line, name = func
+    if filename == '~':     # built-in functions
+        return name
+    return "%s:%d:%s" % (path.basename(filename), line, name)
+
+
+def collapsed_stacks(stats: pstats.Stats, root: str = '') -> List[str]:
+    """Return lines of collapsed stacks for flame graph tools.
+
+    cProfile does not store whole stacks, only callers of each function.
+    So stack of each function is approximated by path through its most
+    expensive callers, and its own time in microseconds is used as the
+    value. Stack starts with root frame, when it is set.
+    """
+    # pylint: disable=too-many-locals
+    raw = stats.stats   # type: ignore
+    lines = []
+    for func, (_, _, tottime, _, callers) in raw.items():
+        value = int(tottime * 1000000)
+        if not value:
+            continue
+        stack = [_label(func)]
+        seen = {func}
+        while callers:
+            caller = max(callers.items(), key=lambda it: it[1][3])[0]
+            if caller in seen:
+                break
+            seen.add(caller)
+            stack.append(_label(caller))
+            callers = raw.get(caller, (0, 0, 0, 0, {}))[4]
+        if root:
+            stack.append(root)
+        lines.append("%s %d" % (';'.join(reversed(stack)), value))
+    return lines
+
+
+def _enable(profile: Profile):
+    """Enable profile, if no other profiler is active in the meantime."""
+    try:
+        profile.enable()
+    except ValueError:
+        log.debug("Profile could not be enabled again")
+
+
+@coroutine
+def profile_awaitable(profile: Profile, awaitable: Awaitable) -> Any:
+    """Await awaitable, which is profiled only while its code runs.
+
+    Profile is disabled while awaitable waits, so other tasks of the event
+    loop are not counted to the profile. Profile must be enabled before,
+    and it is enabled again after the awaitable is done.
+    """
+    iterator = awaitable.__await__()
+    send, value = iterator.send, None
+    while True:
+        try:
+            future = send(value)
+        except StopIteration as stop:
+            return stop.value
+        profile.disable()
+        try:
+            value = yield future
+            send = iterator.send
+        except BaseException as err:  # pylint: disable=broad-except
+            send, value = iterator.throw, err
+        finally:
+            _enable(profile)
+
+
+class SamplingProfiler:
+    """Profiler for a sample of requests, which aggregates profiles.
+
+    One of each ``every`` requests is profiled, or each request with
+    ``fraction`` probability when it is set. Profiles are aggregated to
+    pstats.Stats for each uri_rule, so requests to the same handler are
+    counted together. When ``interval`` is set, aggregated profiles are
+    written to ``dump`` directory (if it is set) and reset every interval
+    seconds, so each file holds profiles of one time window. Files are
+    written by background thread, not by the thread of the request.
+
+    .. code:: python
+
+        app.sampling_profiler = SamplingProfiler(every=100, interval=300,
+                                                 dump='log/profiles')
+    """
+    def __init__(self, every: int = 100, fraction: Optional[float] = None,
+                 interval: Optional[float] = None,
+                 dump: Optional[str] = None):
+        if every < 1:
+            raise ValueError("every must be positive number")
+        self.every = every
+        self.fraction = fraction
+        self.interval = interval
+        self.dump = dump
+        self.__lock = Lock()
+        self.__counter = 0
+        self.__requests = 0
+        self.__stats: Dict[str, pstats.Stats] = {}
+        self.__samples: Dict[str, int] = {}
+        self.__flushed = monotonic()
+
+    def sample(self) -> bool:
+        """Return True, if next request would be profiled."""
+        if self.fraction is not None:
+            return random() < self.fraction
+        with self.__lock:
+            self.__counter += 1
+            if self.__counter >= self.every:
+                self.__counter = 0
+                return True
+        return False
+
+    def start(self) -> Optional[Profile]:
+        """Return enabled Profile, when this request is sampled."""
+        with self.__lock:
+            self.__requests += 1
+        if not self.sample():
+            return None
+        profile = Profile()
+        try:
+            profile.enable()
+        except ValueError:      # other profiler is active
+            log.debug("Request could not be profiled")
+            return None
+        return profile
+
+    def stop(self, profile: Profile, key: Optional[str]):
+        """Disable profile and add it to stats of key."""
+        profile.disable()
+        key = key or '(unknown)'
+        with self.__lock:
+            stats = self.__stats.get(key)
+            if stats is None:
+                self.__stats[key] = pstats.Stats(profile)
+            else:
+                stats.add(profile)
+            self.__samples[key] = self.__samples.get(key, 0) + 1
+            flushed = None
+            if self.interval is not None and \
+                    monotonic() - self.__flushed >= self.interval:
+                flushed = self.__reset()
+        if flushed and self.dump:
+            Thread(target=self.__write_background, args=(flushed,),
+                   name="poorwsgi-profiler", daemon=True).start()
+
+    def __reset(self) -> Dict[str, pstats.Stats]:
+        """Reset aggregated profiles and return them, lock must be held."""
+        stats, self.__stats = self.__stats, {}
+        self.__samples = {}
+        self.__flushed = monotonic()
+        return stats
+
+    def __write_background(self, stats: Dict[str, pstats.Stats]):
+        try:
+            self.__write(stats)
+        except Exception:  # pylint: disable=broad-except
+            log.exception("Profiles could not be written to %s", self.dump)
+
+    def __write(self, stats: Dict[str, pstats.Stats]) -> List[str]:
+        if not self.dump or not stats:
+            return []
+        makedirs(self.dump, exist_ok=True)
+        prefix = strftime("%Y%m%d-%H%M%S")
+        files = []
+        for key, value in stats.items():
+            filename = path.join(self.dump, "%s%s.profile" % (
+                prefix, RE_UNSAFE.sub('_', key)))
+            value.dump_stats(filename)
+            files.append(filename)
+        log.info("Profiles of %d rules written to %s", len(files), self.dump)
+        return files
+
+    def flush(self) -> List[str]:
+        """Write aggregated profiles to dump directory and reset them.
+
+        Returns list of written files.
+        """
+        with self.__lock:
+            stats = self.__reset()
+        return self.__write(stats)
+
+    def keys(self) -> List[str]:
+        """Return uri rules, which have some profile."""
+        with self.__lock:
+            return list(self.__stats)
+
+    def info(self) -> dict:
+        """Return count of requests and samples for each uri rule."""
+        with self.__lock:
+            return {'requests': self.__requests,
+                    'samples': dict(self.__samples)}
+
+    def stats(self, key: Optional[str] = None) -> Optional[pstats.Stats]:
+        """Return copy of aggregated stats for uri rule or for all rules."""
+        with self.__lock:
+            if key is None:
+                values = list(self.__stats.values())
+            else:
+                values = [self.__stats[key]] if key in self.__stats else []
+            if not values:
+                return None
+            retval = pstats.Stats(stream=StringIO())
+            retval.add(*values)
+        return retval
+
+    def dumps(self, key: Optional[str] = None) -> bytes:
+        """Return aggregated stats in the format of pstats dump file."""
+        stats = self.stats(key)
+        if stats is None:
+            return b''
+        return marshal.dumps(stats.stats)   # type: ignore
+
+    def collapsed(self, key: Optional[str] = None) -> str:
+        """Return collapsed stacks for flame graph tools.
+
+        Stacks are built under the lock, because stop changes stats in place.
+        """
+        lines = []
+        with self.__lock:
+            for rule, stats in self.__stats.items():
+                if key is None or rule == key:
+                    lines.extend(collapsed_stacks(stats, rule))
+        return '\n'.join(lines) + '\n' if lines else ''
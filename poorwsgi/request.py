@@ -5,13 +5,10 @@
 """
 # pylint: disable=too-many-lines
 
-# pylint: disable=deprecated-module
-from cgi import FieldStorage as CgiFieldStorage, parse_header
-from json import loads as json_loads
 from io import BytesIO
 from time import time
-from tempfile import TemporaryFile
-from typing import Union, Callable, Any, Iterable, List, Tuple, Optional
+from typing import Union, Callable, Any, Iterable, Iterator, List, Tuple, \
+    Optional
 
 import os
 import re
@@ -22,8 +19,14 @@ from urllib.parse import parse_qs, unquote
 from http.cookies import SimpleCookie
 
 from poorwsgi.state import methods, HTTP_BAD_REQUEST
-from poorwsgi.headers import Headers, parse_negotiation
+from poorwsgi.headers import Headers, parse_negotiation, parse_header, \
+    parse_range
+from poorwsgi.fieldstorage import FieldStorage, MultipartParser
 from poorwsgi.response import HTTPException
+from poorwsgi.jsoncodec import loads as json_loads
+from poorwsgi.jsonstream import NDJSON_MIME_TYPES, MAX_ITEM_SIZE, \
+    iter_array, iter_ndjson
+from poorwsgi.timing import Timing
 
 log = getLogger("poorwsgi")
 
@@ -66,6 +69,8 @@ class SimpleRequest:
 
         self.__start_time = environ['REQUEST_STARTTIME']
         self.__end_time = time()
+        self.__timing = environ.get('poorwsgi.timing') or Timing()
+        self.__background_tasks: List[Tuple[Callable, tuple, dict]] = []
 
     @property
     def debug(self):
@@ -319,6 +324,18 @@ class SimpleRequest:
             return var.lower() == 'on'
         return self.__app.document_index
 
+    @property
+    def precompressed(self):
+        """Value of poor_Precompressed variable.
+
+        Variable is used to serve precompressed files, when
+        poor_DocumentRoot is set.
+        """
+        var = self.__poor_environ.get('poor_Precompressed')
+        if var:
+            return var.lower() == 'on'
+        return self.__app.precompressed
+
     @property
     def document_root(self):
         """Returns DocumentRoot setting."""
@@ -336,6 +353,33 @@ class SimpleRequest:
         """Return timestamp when Request was created (end of __init__)."""
         return self.__end_time
 
+    @property
+    def timing(self) -> Timing:
+        """Timing object with monotonic timestamps of request phases."""
+        return self.__timing
+
+    @property
+    def background_tasks(self) -> Tuple[Tuple[Callable, tuple, dict], ...]:
+        """Tasks, which are called after the response is sent."""
+        return tuple(self.__background_tasks)
+
+    def add_background_task(self, fun: Callable, *args, **kwargs):
+        """Add task, which is called after the response is sent.
+
+        Task is called with args and kwargs in Application's background
+        tasks pool, when the response body is sent and closed by WSGI
+        server, so it doesn't add to response latency. Coroutine functions
+        could be used too.
+
+        .. code:: python
+
+            @app.route('/order', method=state.METHOD_POST)
+            def order(req):
+                req.add_background_task(send_mail, req.json['email'])
+                return JSONResponse(status_code=202)
+        """
+        self.__background_tasks.append((fun, args, kwargs))
+
     def get_options(self):
         """Returns dictionary with application variables from environment.
 
@@ -388,17 +432,75 @@ class Request(SimpleRequest):
 
         It's input parameters are the same, which Application object gets from
         WSGI server plus file callback for auto request body parsing.
+
+        When Application.lazy_request is set, headers, arguments, cookies and
+        request body are parsed with first access of the right property.
         """
-        # pylint: disable=too-many-branches, too-many-statements
         super().__init__(environ, app)
 
         if environ.get('PATH_INFO') is None:
             raise ConnectionError(
                 "PATH_INFO not set, probably bad HTTP protocol used.")
 
+        # reference to environ, environ property returns its copy
+        self.__environ = environ
+
         # A table object containing headers sent by the client.
+        self.__headers = None
+        self.__mime_type = ''
+        self.__charset = 'utf-8'
+        self.__content_length = -1
+
+        # will be set with first property call
+        self.__accept = None
+        self.__accept_charset = None
+        self.__accept_encoding = None
+        self.__accept_language = None
+        self.__authorization = None
+        self.__range = None
+
+        self.__file = environ.get("wsgi.input")
+        self.__file_loaded = False
+        self._errors = environ.get("wsgi.errors")
+
+        self.__cached_size = app.cached_size
+        self.__cached_input = None
+        self.__read_timeout = app.read_timeout
+
+        # path args are set via wsgi.handler_from_table
+        self.__path_args = None
+
+        # args, form, json and cookies are set by __load_* methods
+        self.__args = None
+        self.__form = None
+        self.__json = None
+        self.__body_loaded = False
+        self.__cookies = None
+
+        # variables for user use
+        self.__user = None
+        self.__api = None
+
+        if not app.lazy_request:
+            self.__load_headers()
+            self.timing.mark('headers')
+            self.__load_file()
+            self.__load_args()
+            self.__load_body()
+            self.__load_cookies()
+            self.timing.mark('body')
+        else:
+            self.timing.mark('request')
+
+        # ugly hack
+        # pylint: disable=invalid-name
+        self._SimpleRequest__end_time = time()
+    # enddef
+
+    def __load_headers(self):
+        """Create headers object from environment."""
         tmp = []
-        for key, val in environ.items():
+        for key, val in self.__environ.items():
             if key[:5] == 'HTTP_':
                 key = '-'.join(map(lambda x: x.capitalize(),
                                    key[5:].split('_')))
@@ -415,88 +517,82 @@ class Request(SimpleRequest):
         self.__charset = pdict.get('charset', 'utf-8')
 
         self.__content_length = int(self.__headers.get("Content-Length") or -1)
-        # will be set with first property call
-        self.__accept = None
-        self.__accept_charset = None
-        self.__accept_encoding = None
-        self.__accept_language = None
-        self.__authorization = None
 
-        self.__file = environ.get("wsgi.input")
-        self._errors = environ.get("wsgi.errors")
-
-        if app.auto_data and \
-                0 <= self.__content_length <= app.data_size:
+    def __load_file(self):
+        """Read small request body to memory if auto_data is set."""
+        self.__file_loaded = True
+        if self.app.auto_data and \
+                0 <= self.content_length <= self.app.data_size:
             self.__file = BytesIO(self.__file.read(self.__content_length))
             self.__file.seek(0)
 
-        self.__cached_size = app.cached_size
-        self.__cached_input = None
-        self.__read_timeout = app.read_timeout
-
-        # path args are set via wsgi.handler_from_table
-        self.__path_args = None
-
-        # args
+    def __load_args(self):
+        """Parse request arguments if auto_args is set."""
+        app = self.app
         if app.auto_args:
             self.__args = Args(self, app.keep_blank_values,
                                app.strict_parsing)
         else:
             self.__args = EmptyForm()
 
+    def __load_body(self):
+        """Parse request body to json or form if it is allowed."""
+        app = self.app
+        self.__body_loaded = True
+        self.__form = EmptyForm()
+        self.__json = EmptyForm()
+        is_body = self.is_body_request or self.server_protocol == "HTTP/0.9"
         # test auto json parsing
-        if app.auto_json and \
-                (self.is_body_request or self.server_protocol == "HTTP/0.9") \
-                and self.__mime_type in app.json_mime_types:
-            self.__json = parse_json_request(self.read(), self.__charset)
-            self.__form = EmptyForm()
+        if app.auto_json and is_body \
+                and self.mime_type in app.json_mime_types:
+            # handler is known from routing before the request is created
+            handler = self.uri_handler or \
+                self.__environ.get('poorwsgi.handler')
+            if not getattr(handler, 'json_stream', False):
+                self.__json = parse_json_request(self.read(), self.__charset)
         # test auto form parsing
-        elif app.auto_form and \
-                (self.is_body_request or self.server_protocol == "HTTP/0.9") \
-                and self.__mime_type in app.form_mime_types:
+        elif app.auto_form and is_body \
+                and self.mime_type in app.form_mime_types:
             self.__form = FieldStorage(
                 self, keep_blank_values=app.keep_blank_values,
                 strict_parsing=app.strict_parsing,
                 file_callback=app.file_callback)
-            self.__json = EmptyForm()
-        else:
-            self.__form = EmptyForm()
-            self.__json = EmptyForm()
 
-        if app.auto_cookies and 'Cookie' in self.__headers:
+    def __load_cookies(self):
+        """Parse cookies from Cookie header if auto_cookies is set."""
+        if self.app.auto_cookies and 'Cookie' in self.headers:
             self.__cookies = SimpleCookie()
-            self.__cookies.load(self.__headers['Cookie'])
+            self.__cookies.load(self.headers['Cookie'])
         else:
             self.__cookies = tuple()
 
-        # variables for user use
-        self.__user = None
-        self.__api = None
-
-        # ugly hack
-        # pylint: disable=invalid-name
-        self._SimpleRequest__end_time = time()
-    # enddef
-
     # -------------------------- Properties --------------------------- #
     @property
     def mime_type(self) -> str:
         """Request ``Content-Type`` header or empty string if not set."""
+        if self.__headers is None:
+            self.__load_headers()
         return self.__mime_type
 
     @property
     def charset(self) -> str:
         """Request ``Content-Type`` charset header string, utf-8 if not set."""
+        if self.__headers is None:
+            self.__load_headers()
         return self.__charset
 
     @property
     def content_length(self) -> int:
         """Request ``Content-Length`` header value, -1 if not set."""
+        if self.__headers is None:
+            self.__load_headers()
         return self.__content_length
 
     @property
     def headers(self):
         """Reference to input headers object."""
+        if self.__headers is None:
+            self.__load_headers()
         return self.__headers
 
     @property
@@ -504,7 +600,7 @@ class Request(SimpleRequest):
         """Tuple of client supported mime types from Accept header."""
         if self.__accept is None:
             self.__accept = tuple(parse_negotiation(
-                self.__headers.get("Accept", '')))
+                self.headers.get("Accept", '')))
         return self.__accept
 
     @property
@@ -512,7 +608,7 @@ class Request(SimpleRequest):
         """Tuple of client supported charset from Accept-Charset header."""
         if self.__accept_charset is None:
             self.__accept_charset = tuple(parse_negotiation(
-                self.__headers.get("Accept-Charset", '')))
+                self.headers.get("Accept-Charset", '')))
         return self.__accept_charset
 
     @property
@@ -520,7 +616,7 @@ class Request(SimpleRequest):
         """Tuple of client supported charset from Accept-Encoding header."""
         if self.__accept_encoding is None:
             self.__accept_encoding = tuple(parse_negotiation(
-                self.__headers.get("Accept-Encoding", '')))
+                self.headers.get("Accept-Encoding", '')))
         return self.__accept_encoding
 
     @property
@@ -528,7 +624,7 @@ class Request(SimpleRequest):
         """List of client supported languages from Accept-Language header."""
         if self.__accept_language is None:
             self.__accept_language = tuple(parse_negotiation(
-                self.__headers.get("Accept-Language", '')))
+                self.headers.get("Accept-Language", '')))
         return self.__accept_language
 
     @property
@@ -552,11 +648,23 @@ class Request(SimpleRequest):
         """
         return "application/json" in dict(self.accept)
 
+    @property
+    def range(self) -> tuple:
+        """Tuple of (start, end) pairs from Range header.
+
+        Start or end could be None for suffix or open ranges. Empty tuple is
+        returned if Range header is not set or if it is not valid bytes
+        range.
+        """
+        if self.__range is None:
+            self.__range = parse_range(self.headers.get('Range', '')) or ()
+        return self.__range
+
     @property
     def authorization(self) -> dict:
         """Return Authorization header parsed to dictionary."""
         if self.__authorization is None:
-            auth = self.__headers.get('Authorization', '').strip()
+            auth = self.headers.get('Authorization', '').strip()
             self.__authorization = dict(
                 (key, Headers.utf8(val.strip('"'))) for key, val in
                 RE_AUTHORIZATION.findall(auth))
@@ -570,17 +678,17 @@ class Request(SimpleRequest):
     def is_xhr(self) -> bool:
         """If ``X-Requested-With`` header is set with ``XMLHttpRequest`` value.
         """
-        return self.__headers.get('X-Requested-With') == 'XMLHttpRequest'
+        return self.headers.get('X-Requested-With') == 'XMLHttpRequest'
 
     @property
     def is_body_request(self) -> bool:
         """True if has set Content-Length more than zero."""
-        return self.__content_length > 0
+        return self.content_length > 0
 
     @property
     def is_chunked(self) -> bool:
         """True if has set Transfer-Encoding is chunked."""
-        return self.__headers.get('Transfer-Encoding') == 'chunked'
+        return self.headers.get('Transfer-Encoding') == 'chunked'
 
     @property
     def is_chunked_request(self):
@@ -611,11 +719,13 @@ class Request(SimpleRequest):
 
         This property could be **set only once**.
         """
+        if self.__args is None:
+            self.__load_args()
         return self.__args
 
     @args.setter
     def args(self, value: 'Args'):
-        if isinstance(self.__args, EmptyForm):
+        if isinstance(self.args, EmptyForm):
             self.__args = value
 
     @property
@@ -629,11 +739,13 @@ class Request(SimpleRequest):
 
         This property could be **set only once**.
         """
+        if not self.__body_loaded:
+            self.__load_body()
         return self.__form
 
     @form.setter
     def form(self, value: 'FieldStorage'):
-        if isinstance(self.__form, EmptyForm):
+        if isinstance(self.form, EmptyForm):
             self.__form = value
 
     @property
@@ -646,8 +758,11 @@ class Request(SimpleRequest):
         is EmptyForm.
 
         When request data is present, that will by parsed with
-        parse_json_request function.
+        parse_json_request function. Body of route handler marked by
+        poorwsgi.jsonstream.json_stream is not parsed.
         """
+        if not self.__body_loaded:
+            self.__load_body()
         return self.__json
 
     @property
@@ -657,6 +772,8 @@ class Request(SimpleRequest):
         This property was set if Application.auto_cookies is set to true,
         which is default. Otherwise cookies was empty tuple.
         """
+        if self.__cookies is None:
+            self.__load_cookies()
         return self.__cookies
 
     @property
@@ -667,6 +784,8 @@ class Request(SimpleRequest):
         request are lower then input_cache configuration value. Other requests
         like big file data uploads increase memory and time system requests.
         """
+        if not self.__file_loaded:
+            self.__load_file()
         if isinstance(self.__file, BytesIO):
             try:
                 self.__file.seek(0)
@@ -677,6 +796,8 @@ class Request(SimpleRequest):
     @property
     def input(self):
         """Return input file, for internal use in FieldStorage"""
+        if not self.__file_loaded:
+            self.__load_file()
         if self.__cached_input:
             return self.__cached_input
         if not self.__cached_size or isinstance(self.__file, BytesIO):
@@ -718,6 +839,8 @@ class Request(SimpleRequest):
         if not self.is_body_request and self.server_protocol != "HTTP/0.9":
             log.error("No Content-Length found, read was failed!")
             return b''
+        if not self.__file_loaded:
+            self.__load_file()
         if -1 < length < self.__content_length:
             self.read = self.__read
             return self.read(length)
@@ -733,12 +856,128 @@ class Request(SimpleRequest):
         uWSGI has extra API
         https://uwsgi-docs.readthedocs.io/en/latest/Chunked.html
         """
+        if not self.__file_loaded:
+            self.__load_file()
         size = int(self.__file.readline(), base=16)
         try:
             return self.__file.read(size)
         finally:
             self.__file.readline()  # skip new line after chunk
 
+    def stream_multipart(self, on_part_begin: Callable,
+                         on_part_data: Callable, on_part_end: Callable,
+                         block_size: int = 65536) -> int:
+        """Stream multipart request body to callbacks.
+
+        Request body is read block by block and each part is passed to
+        callbacks, so memory usage don't depend on size of uploaded files.
+        Body could not be parsed to form before, so switch off auto_form,
+        or use lazy_request and don't touch form property.
+
+        on_part_begin(headers) : callable
+            Called with part Headers. Content-Disposition could be parsed
+            with poorwsgi.headers.parse_header function.
+        on_part_data(data) : callable
+            Called with bytes of part body, could be called more times.
+        on_part_end() : callable
+            Called, when part is complete.
+
+        Returns count of read bytes. When request is not multipart request,
+        or when body is not complete, HTTPException with HTTP_BAD_REQUEST
+        is raised, and on_part_end is not called for not complete part.
+
+        .. code:: python
+
+            @app.route('/upload', method=state.METHOD_POST)
+            def upload(req):
+                checksum = sha256()
+                req.stream_multipart(lambda headers: None, checksum.update,
+                                     lambda: None)
+                return checksum.hexdigest()
+        """
+        # pylint: disable=too-many-arguments
+        ctype, pdict = parse_header(self.headers.get('Content-Type', ''))
+        if ctype != 'multipart/form-data':
+            raise HTTPException(HTTP_BAD_REQUEST,
+                                error="Not multipart/form-data request")
+        bytes_read = 0
+        try:
+            parser = MultipartParser(
+                pdict.get('boundary', '').encode('ascii', 'replace'),
+                on_part_begin, on_part_data, on_part_end)
+            for data in self.__iter_body(block_size):
+                bytes_read += len(data)
+                parser.feed(data)
+                if parser.finished:
+                    break
+        except ValueError as err:
+            log.error("Invalid multipart request: %s", str(err))
+            raise HTTPException(HTTP_BAD_REQUEST, error=err) from err
+        if not parser.finished:
+            log.error("Multipart request body is not complete")
+            raise HTTPException(HTTP_BAD_REQUEST,
+                                error="Multipart body is not complete")
+        return bytes_read
+
+    def __iter_body(self, block_size: int) -> Iterator[bytes]:
+        """Yield request body block by block, or chunk by chunk."""
+        if self.is_chunked:
+            data = self.read_chunk()
+            while data:
+                yield data
+                data = self.read_chunk()
+            return
+        file = self.input
+        todo = self.content_length
+        while todo > 0:
+            data = file.read(min(todo, block_size))
+            if not data:
+                return
+            todo -= len(data)
+            yield data
+
+    def iter_json_items(self, block_size: int = 65536,
+                        max_item_size: int = MAX_ITEM_SIZE) -> Iterator[Any]:
+        """Yield items of JSON array or NDJSON request body.
+
+        Body is read block by block and parsed item by item, so only the
+        current item is in memory. Body with NDJSON mime type like
+        ``application/x-ndjson`` is parsed line by line, other body must be
+        top-level JSON array. Route handler should be marked by
+        poorwsgi.jsonstream.json_stream, so body is not parsed to json
+        property by auto_json before. When it was parsed to JsonList, its
+        items are returned.
+
+        When body is not valid, or when item is bigger than max_item_size,
+        HTTPException with HTTP_BAD_REQUEST is raised. Items before are
+        yielded yet.
+
+        .. code:: python
+
+            @app.route('/bulk', method=state.METHOD_POST)
+            @json_stream
+            def bulk(req):
+                for item in req.iter_json_items():
+                    store(item)
+                return NoContentResponse()
+        """
+        if self.__body_loaded and not isinstance(self.__json, EmptyForm):
+            if not isinstance(self.__json, JsonList):
+                raise HTTPException(HTTP_BAD_REQUEST,
+                                    error="JSON body is not array")
+            yield from self.__json
+            return
+        try:
+            if self.mime_type in NDJSON_MIME_TYPES:
+                yield from iter_ndjson(self.__iter_body(block_size),
+                                       max_item_size=max_item_size)
+            else:
+                yield from iter_array(self.__iter_body(block_size),
+                                      self.__charset, max_item_size)
+        except ValueError as err:
+            log.error("Invalid request json: %s", str(err))
+            raise HTTPException(HTTP_BAD_REQUEST, error=err) from err
+
     def __del__(self):
         log.debug("Request: Hasta la vista, baby.")
 
@@ -926,10 +1165,16 @@ def parse_json_request(raw: bytes, charset: str = "utf-8"):
     * Other based types from json.loads function like str, int, float, bool
       or None.
     * None when parsing of JSON fails. That is logged with WARNING log level.
+
+    Data are parsed by current JSON codec from poorwsgi.jsoncodec module.
+    UTF-8 data are parsed straight from bytes.
     """
     # pylint: disable=inconsistent-return-statements
     try:
-        data = json_loads(raw.decode(charset))
+        if charset.lower() not in ('utf-8', 'utf8'):
+            data = json_loads(raw.decode(charset))
+        else:
+            data = json_loads(raw)
         if isinstance(data, dict):
             return JsonDict(data.items())
         if isinstance(data, list):
@@ -944,245 +1189,132 @@ class CachedInput:
     """
     Wrapper around wsgi.input file, which reads data block by block.
 
+    Data are read to preallocated buffer, which is reused for all blocks.
+    Read cursor moves in the buffer and memoryview slices are used, so there
+    is no copying of buffer rest on each read call.
+
     timeout : float
         how long to wait for new bytes in seconds
+
+    >>> data = CachedInput(BytesIO(b'first\\r\\nsecond\\r\\nrest'), 19, 8)
+    >>> data.readline(), data.read(3), data.readline(), data.read()
+    (b'first\\r\\n', b'sec', b'ond\\r\\n', b'rest')
     """
     def __init__(self, file, size, block_size=32768,
                  timeout: Optional[float] = 10.):
         self.__file = file
-        self.__buffer = b''
+        self.__readinto = getattr(file, 'readinto', None)
+        self.__buffer = bytearray(block_size)
+        self.__view = memoryview(self.__buffer)
+        self.__start = 0    # read cursor
+        self.__end = 0      # end of valid data in buffer
         self.__todo = size
         self.__timeout = timeout
         self.block_size = block_size
 
+    def __fill(self) -> int:
+        """Read next data from file to buffer, return count of new bytes."""
+        if self.__start == self.__end:
+            self.__start = self.__end = 0
+        elif self.__end == len(self.__buffer):
+            if self.__start:        # move rest to begin of buffer
+                rest = self.__end - self.__start
+                self.__view[:rest] = self.__view[self.__start:self.__end]
+                self.__start, self.__end = 0, rest
+            else:                   # line is longer than buffer
+                self.__view.release()
+                self.__buffer.extend(bytes(self.block_size))
+                self.__view = memoryview(self.__buffer)
+
+        size = min(self.__todo, len(self.__buffer) - self.__end)
+        if size <= 0:
+            return 0
+        count = self.__read_to(self.__view[self.__end:self.__end + size])
+        self.__end += count
+        return count
+
+    def __read_to(self, view: memoryview) -> int:
+        """Read data from file directly to view."""
+        if self.__readinto:
+            count = self.__readinto(view) or 0
+        else:
+            data = self.__file.read(len(view))
+            count = len(data)
+            view[:count] = data
+        self.__todo -= count
+        return count
+
+    def __take(self, size: int) -> bytes:
+        """Return size bytes from buffer and move read cursor."""
+        data = self.__view[self.__start:self.__start + size].tobytes()
+        self.__start += size
+        return data
+
     def read(self, size=-1):
         """Compatible file read which works with internal buffer."""
         if size < 0:
             size = self.block_size
 
-        b_size = len(self.__buffer)
-        size = min(self.__todo, size)
+        available = self.__end - self.__start
+        if available >= size:
+            return self.__take(size)
 
-        if self.__buffer:
-            if b_size >= size:
-                retval = self.__buffer[:size]
-                self.__buffer = self.__buffer[size:]
+        size = min(self.__todo, size - available)
+        if available:
+            retval = self.__take(available)
+            if size <= 0:
                 return retval
-            size = size - b_size
-            self.__todo -= size
-            retval = self.__buffer + self.__file.read(size)
-            self.__buffer = b''
-            return retval
+            data = self.__file.read(size)
+            self.__todo -= len(data)
+            return retval + data
+
+        data = self.__file.read(size)
+        self.__todo -= len(data)
+        return data
+
+    def readinto(self, buffer) -> int:
+        """Read data to prealocated buffer like bytearray.
 
-        size = min(self.__todo, size)
-        self.__todo -= size
-        return self.__file.read(size)
+        Data from internal buffer are copied first, rest is read directly
+        from file to buffer.
+        """
+        with memoryview(buffer) as view:
+            view = view.cast('B')
+            available = min(self.__end - self.__start, len(view))
+            view[:available] = self.__view[self.__start:
+                                           self.__start + available]
+            self.__start += available
+            size = min(self.__todo, len(view) - available)
+            if size <= 0:
+                return available
+            return available + self.__read_to(
+                view[available:available + size])
 
     def readline(self, size=-1):
         """Compatible file read which works with internal buffer."""
         if size < 0:
             size = self.block_size
 
-        if not self.__buffer:
-            size = min(self.__todo, size)
-            self.__todo -= size
-            self.__buffer = self.__file.read(size)
-
-        line = b''
-        l_size = 0
+        times_out_at = 0.0     # used only when timeout is set
         if self.__timeout is not None:
             times_out_at = time() + self.__timeout
-            seen_data = False
 
-        while l_size < size:
-            max_size = size-l_size
-            pos = self.__buffer.find(b'\r\n', 0, max_size)
+        checked = 0     # size of line part, where end-of-line was not found
+        while True:
+            limit = min(self.__end, self.__start + size)
+            pos = self.__buffer.find(
+                b'\r\n', self.__start + max(checked - 1, 0), limit)
             if pos >= 0:
-                line += self.__buffer[:pos + 2]
-                self.__buffer = self.__buffer[pos + 2:]
-                return line
-
-            if self.__timeout is not None:
-                if self.__buffer:
-                    seen_data = True
-                elif seen_data:
-                    seen_data = False
+                return self.__take(pos + 2 - self.__start)
+            checked = limit - self.__start
+            if checked >= size or not self.__todo:
+                # no end-of-line found
+                return self.__take(checked)
+
+            if self.__fill():
+                if self.__timeout is not None:
                     times_out_at = time() + self.__timeout
-                elif time() > times_out_at:
-                    raise TimeoutError("Timed out while receiving data")
-
-            line += self.__buffer[:max_size]
-            self.__buffer = self.__buffer[max_size:]
-            l_size = len(line)
-
-            if l_size < size:
-                n_size = min(self.__todo, max_size)
-                self.__todo -= n_size
-                self.__buffer = self.__file.read(n_size)
-
-        # no end-of-line found
-        return line
-
-
-class FieldStorage(CgiFieldStorage):
-    """Class based of cgi.FieldStorage.
-
-    Instead of FieldStorage from cgi module, can have better getfirst
-    and getlist methods which can call function on values and can set
-    file_callback.
-
-    Constructor post special environment to base class, which do POST emulation
-    for any request, because base cgi.FieldStorage know only GET, HEAD and POST
-    methods an read from all variables, which we don't want.
-
-    There are some usable variables, which you can use, if you want to test
-    what variable it is:
-
-    :name:      variable name, the same name from input attribute.
-    :type:      mime-type of variable. All variables have internal
-                mime-type, if that is no file, mime-type is text/plain.
-    :filename:  if variable is file, filename is its name from form.
-    :file:      file type instance, from you can read variable. This instance
-                could be TemporaryFile as default for files, StringIO for
-                normal variables or instance of your own file type class,
-                create from file_callback.
-    :lists:     if variable is list of variables, this contains instances of
-                FieldStorage.
-    """
-    def __init__(self, req, headers=None, outerboundary=b'', environ=None,
-                 keep_blank_values=0, strict_parsing=0, limit=None,
-                 encoding='utf-8', errors='replace', max_num_fields=None,
-                 separator='&', file_callback=None):
-        """Constructor of FieldStorage.
-
-        Many of input parameters are need only for next internal use, because
-        FieldStorage parse variables recursive. You need add only:
-
-        req : Request
-            Input request.
-        keep_blank_values : int (0)
-            If you want to parse blank values as right empty values.
-        strict_parsing : int (0)
-            If you want to raise exception on parsing error.
-        file_callback : callback
-            Callback for creating instance of uploading files.
-        """
-        # pylint: disable=too-many-arguments
-        # pylint: disable=too-many-function-args
-
-        if isinstance(req, Request):
-            if req.environ.get('wsgi.input', None) is None:
-                raise ValueError('No wsgi input File in request environment.')
-
-            environ = {'REQUEST_METHOD': 'POST'}
-            if 'CONTENT_TYPE' in req.environ:
-                environ['CONTENT_TYPE'] = req.environ['CONTENT_TYPE']
-            if 'CONTENT_LENGTH' in req.environ:
-                environ['CONTENT_LENGTH'] = req.environ['CONTENT_LENGTH']
-            if file_callback:
-                environ['wsgi.file_callback'] = file_callback
-
-            headers = req.headers
-            req = req.input
-        if environ is None:
-            environ = {}
-
-        self.environ = environ
-        # pylint: disable=bad-option-value,unused-private-member
-        self.__file = None
-        try:
-            # new interface from some 3.6 to 3.9
-            super().__init__(req, headers, outerboundary, environ,
-                             keep_blank_values, strict_parsing, limit,
-                             encoding, errors, max_num_fields, separator)
-        except TypeError:
-            # old interface from some 3.6 to some 3.9
-            try:
-                super().__init__(req, headers, outerboundary, environ,
-                                 keep_blank_values, strict_parsing, limit,
-                                 encoding, errors, max_num_fields)
-            except TypeError:
-                # really old interface from some 3.6 to some 3.7
-                super().__init__(req, headers, outerboundary, environ,
-                                 keep_blank_values, strict_parsing, limit,
-                                 encoding, errors)
-
-    def make_file(self):
-        """Return readable and writable temporary file."""
-        if self._binary_file and 'wsgi.file_callback' in self.environ:
-            return self.environ['wsgi.file_callback'](self.filename)
-        return TemporaryFile("wb+")  # pylint: disable=consider-using-with
-
-    def read_lines(self):
-        """Internal: read lines until EOF or outerboundary."""
-        if self._binary_file and 'wsgi.file_callback' in self.environ:
-            self.file = self.make_file()
-            if self.outerboundary:
-                self.read_lines_to_outerboundary()
-            else:
-                self.read_lines_to_eof()
-        else:
-            super().read_lines()
-
-    def get(self, key: str, default: Any = None):
-        """Compatibility methods with dict, alias for getvalue."""
-        return self.getvalue(key, default)
-
-    def getfirst(self, key: str, default: Any = None, fce: Callable = str):
-        """Returns first variable value for key or default, if key not exist.
-
-        Arguments:
-            key : str
-                key name
-            default : None
-                default value if key not found
-            fce : convertor (str)
-                Function or class which processed value.
-        """
-        # pylint: disable=arguments-differ
-        val = CgiFieldStorage.getfirst(self, key, default)
-        if val is None:
-            return None
-        return fce(val)
-
-    def getlist(self, key: str, default: Optional[List] = None,
-                fce: Callable = str):
-        """Returns list of variable values for key or empty list.
-
-        Arguments:
-            key : str
-                key name
-            default : list
-                List of values when key was not sent.
-            fce : convertor (str)
-                Function or class which processed value.
-        """
-        # pylint: disable=arguments-differ
-        if key in self:
-            val = CgiFieldStorage.getlist(self, key)
-        else:
-            val = default or []
-        for item in val:
-            yield fce(item)
-
-    def __getitem__(self, key: str):
-        """Dictionary like [] operator."""
-        if self.list is None:
-            raise KeyError(key)
-        return super().__getitem__(key)
-
-    def __contains__(self, key: str):
-        """Dictionary like in operator."""
-        if self.list is None:
-            return False
-        return super().__contains__(key)
-
-    def __bool__(self):
-        """Bool operator."""
-        return bool(self.list)
-
-    def keys(self):
-        """Dictionary like keys() method."""
-        if self.list is None:
-            return tuple()
-        return super().keys()
+            elif self.__timeout is None:
+                return self.__take(checked)     # no waiting for new data
+            elif time() > times_out_at:
+                raise TimeoutError("Timed out while receiving data")
@@ -3,18 +3,18 @@ Poor WSGI Response classes.
 
 :Exceptions:    HTTPException
 :Classes:       Response, JSONResponse, FileResponse, GeneratorResponse,
-                StrGeneratorResponse, EmptyResponse, RedirectResponse
-:Functions:     make_response, redirect, abort
+                StrGeneratorResponse, EmptyResponse, RedirectResponse,
+                RangeFile, ByteRanges
+:Functions:     make_response, make_conditional, file_etag, redirect, abort
 """
 from http.client import responses
 from io import BytesIO, IOBase, BufferedIOBase, TextIOBase
-from os import access, R_OK, fstat
-from os.path import getctime
+from os import access, R_OK, fstat, urandom, stat_result
 from logging import getLogger
 from json import dumps
 from inspect import stack
 from datetime import datetime
-from typing import Union, Callable, Iterable, BinaryIO, Optional
+from typing import Union, Callable, Iterable, BinaryIO, Optional, Tuple
 
 import mimetypes
 
@@ -25,10 +25,13 @@ except ImportError:
     JSON_GENERATOR = False
 
 from poorwsgi.state import DECLINED, HTTP_OK, HTTP_NO_CONTENT, \
+    METHOD_GET, METHOD_HEAD, \
     HTTP_MOVED_PERMANENTLY, HTTP_MOVED_TEMPORARILY, HTTP_I_AM_A_TEAPOT, \
-    HTTP_NOT_MODIFIED, deprecated
+    HTTP_NOT_MODIFIED, HTTP_PARTIAL_CONTENT, HTTP_RANGE_NOT_SATISFIABLE, \
+    deprecated
 from poorwsgi.headers import Headers, HeadersList, \
-    time_to_http, datetime_to_http
+    time_to_http, datetime_to_http, http_to_time
+from poorwsgi.jsoncodec import dumps as json_dumps
 
 log = getLogger('poorwsgi')
 # not in http.client.responses
@@ -43,6 +46,13 @@ NOT_MODIFIED_DENY = {
 NOT_MODIFIED_ONE_OF_REQUIRED = {
     'Content-Location', 'Date', 'ETag', 'Vary'
     }
+# headers, which are copied from original response to Not Modified response
+NOT_MODIFIED_COPY = (
+    'ETag', 'Last-Modified', 'Cache-Control', 'Content-Location', 'Expires',
+    'Vary')
+# more ranges in one request are ignored and whole content is returned
+MAX_RANGES = 16
+RANGE_BLOCK_SIZE = 65536
 
 
 class IBytesIO(BytesIO):
@@ -57,6 +67,63 @@ class IBytesIO(BytesIO):
         return iter(self.read_kilo, b'')
 
 
+class RangeFile:
+    """File object proxy, which returns only part of file.
+
+    File is seek to offset, and only length bytes could be read. Method
+    fileno returns the original file descriptor, so wsgi.file_wrapper could
+    use sendfile from current file position and Content-Length.
+    """
+    def __init__(self, file_obj: Union[IOBase, BinaryIO], offset: int,
+                 length: int):
+        file_obj.seek(offset)
+        self.__file = file_obj
+        self.__todo = length
+
+    def read(self, size: int = -1):
+        """Read at most size bytes, but not over the range."""
+        if size < 0 or size > self.__todo:
+            size = self.__todo
+        if not size:
+            return b''
+        data = self.__file.read(size)
+        self.__todo -= len(data)
+        return data
+
+    def fileno(self):
+        """Return file descriptor of original file."""
+        return self.__file.fileno()
+
+    def close(self):
+        """Close original file."""
+        self.__file.close()
+
+    def __iter__(self):
+        return iter(lambda: self.read(RANGE_BLOCK_SIZE), b'')
+
+
+class ByteRanges:
+    """Iterable ``multipart/byteranges`` body from more file ranges."""
+    def __init__(self, file_obj: Union[IOBase, BinaryIO], offset: int,
+                 ranges: list, boundary: bytes):
+        self.__file = file_obj
+        self.__offset = offset
+        self.__ranges = ranges
+        self.__boundary = boundary
+
+    def __iter__(self):
+        for head, start, end in self.__ranges:
+            yield b'--' + self.__boundary + b'\r\n' + head
+            yield from RangeFile(self.__file, self.__offset + start,
+                                 end - start + 1)
+            yield b'\r\n'
+        yield b'--' + self.__boundary + b'--\r\n'
+
+    def close(self):
+        """Close original file."""
+        self.__file.close()
+
+
 class BaseResponse:
     """Base class for response."""
 
@@ -86,6 +153,10 @@ class BaseResponse:
         self.__reason = responses[self.__status_code]
         self.__done = False
 
+        # Compression of response. None means Application.compress value,
+        # True or False enables or disables it for this response.
+        self.compress: Optional[bool] = None
+
     @property
     def status_code(self):
         """Http status code, which is **state.HTTP_OK (200)** by default.
@@ -236,7 +307,8 @@ class Response(BaseResponse):
 class JSONResponse(Response):
     """Simple application/json response.
 
-    ** kwargs from constructor are serialized to json structure.
+    ** kwargs from constructor are serialized to json structure by current
+    JSON codec from poorwsgi.jsoncodec module straight to bytes.
     """
     def __init__(self, data_=None, charset: str = "utf-8",
                  headers: Optional[Union[Headers, HeadersList]] = None,
@@ -249,7 +321,12 @@ class JSONResponse(Response):
             raise RuntimeError("Only one of data and kwargs is allowed.")
         if kwargs and data_ is None:
             data_ = kwargs
-        super().__init__(dumps(data_), content_type, headers, status_code)
+        if charset and charset.lower() not in ('utf-8', 'utf8'):
+            # ASCII escaped output could be encoded to any charset
+            data = dumps(data_).encode(charset)
+        else:
+            data = json_dumps(data_)
+        super().__init__(data, content_type, headers, status_code)
 
 
 class TextResponse(Response):
@@ -289,19 +366,25 @@ class FileObjResponse(BaseResponse):
                          headers=headers,
                          status_code=status_code)
         self.__file = file_obj
+        self.__pos = 0
+        self.__ranges: Optional[list] = None
+        self.__boundary = b''
         if file_obj.seekable():
             self.__pos = file_obj.tell()
         try:
             self.__content_length = \
                     fstat(file_obj.fileno()).st_size - self.__pos
         except OSError:
-            if isinstance(file_obj, BytesIO):
+            if isinstance(file_obj, BytesIO):    # getvalue doesn't copy
                 self.__content_length = \
-                        file_obj.getbuffer().nbytes - self.__pos
+                        len(file_obj.getvalue()) - self.__pos
             else:
                 self.__content_length = 0
                 print(type(file_obj))
                 log.debug('File object has unknown size.')
+        if file_obj.seekable() and self.__content_length > 0 and \
+                'Accept-Ranges' not in self.headers:
+            self.add_header('Accept-Ranges', 'bytes')
 
     # must be redefined, because self.__buffer is private attribute
     @property
@@ -324,6 +407,91 @@ class FileObjResponse(BaseResponse):
         """
         return self.__content_length
 
+    def make_partial(self, ranges: Iterable[Tuple[Optional[int],
+                                                  Optional[int]]],
+                     if_range: str = ''):
+        """Make partial response from ranges, like from Request.range.
+
+        When one range is satisfiable, response has Partial Content status,
+        and only that part of file is returned. More ranges are returned
+        as ``multipart/byteranges`` content. When no range is satisfiable,
+        response has Range Not Satisfiable status and empty content.
+
+        When if_range is set, which is value of If-Range request header,
+        it is compared with ETag or Last-Modified response header, and
+        whole file is returned if it not match. Only responses with OK
+        status code, seekable file and known size are processed.
+
+        .. code:: python
+
+            res = FileResponse(path)
+            res.make_partial(req.range, req.headers.get('If-Range', ''))
+        """
+        size = self.__content_length
+        if self.status_code != HTTP_OK or not ranges or size <= 0 or \
+                not self.__file.seekable():
+            return
+        if if_range and (if_range.startswith('W/') or if_range not in (
+                self.headers.get('ETag'), self.headers.get('Last-Modified'))):
+            return      # representation was changed, or weak entity tag
+
+        satisfiable = []
+        for start, end in ranges:
+            if start is None:               # suffix range
+                if not end:
+                    continue
+                start, end = max(size - end, 0), size - 1
+            elif start >= size:
+                continue
+            elif end is None or end >= size:
+                end = size - 1
+            satisfiable.append((start, end))
+
+        if not satisfiable:
+            self.status_code = HTTP_RANGE_NOT_SATISFIABLE
+            self.headers['Content-Range'] = "bytes */%d" % size
+            self.__content_length = 0
+            self.__ranges = []
+            return
+        if len(satisfiable) > MAX_RANGES:
+            log.info("Too many ranges in request, whole file is returned.")
+            return
+
+        self.status_code = HTTP_PARTIAL_CONTENT
+        if len(satisfiable) == 1:
+            start, end = satisfiable[0]
+            self.headers['Content-Range'] = "bytes %d-%d/%d" % (
+                start, end, size)
+            self.__content_length = end - start + 1
+            self.__ranges = satisfiable
+        else:
+            self.__make_byteranges(satisfiable, size)
+        if 'Content-Length' in self.headers:
+            self.headers['Content-Length'] = str(self.__content_length)
+
+    def __make_byteranges(self, ranges: list, size: int):
+        """Prepare multipart/byteranges content."""
+        boundary = urandom(12).hex().encode()
+        content_type = self.headers.get('Content-Type', self.content_type)
+        self.__ranges = []
+        length = len(b'--' + boundary + b'--\r\n')
+        for start, end in ranges:
+            head = ("Content-Type: %s\r\nContent-Range: bytes %d-%d/%d"
+                    "\r\n\r\n" % (content_type, start, end, size)).encode()
+            self.__ranges.append((head, start, end))
+            length += len(b'--' + boundary + b'\r\n' + head) + \
+                end - start + 1 + 2
+        self.__content_length = length
+        self.__boundary = boundary
+        if 'Content-Type' in self.headers:
+            del self.headers['Content-Type']
+        self.content_type = "multipart/byteranges; boundary=%s" % \
+            boundary.decode()
+
+    def close(self):
+        """Close file object, when response is not returned."""
+        self.__file.close()
+
     # must be redefined, because self.__buffer is private attribute
     def __end_of_response__(self):
         """Method **for internal use only!**.
@@ -331,6 +499,16 @@ class FileObjResponse(BaseResponse):
         This method was called from Application object at the end of request
         for returning right value to wsgi server.
         """
+        if self.__ranges is not None:
+            if not self.__ranges:       # range not satisfiable
+                self.__file.close()
+                return b''
+            if len(self.__ranges) == 1:
+                start, end = self.__ranges[0]
+                return RangeFile(self.__file, self.__pos + start,
+                                 end - start + 1)
+            return ByteRanges(self.__file, self.__pos, self.__ranges,
+                              self.__boundary)
         if self.__file.seekable():
             self.__file.seek(self.__pos)
         return self.__file
@@ -345,7 +523,9 @@ class FileResponse(FileObjResponse):
     WSGI server closes file, which is returned by this response. So just
     like Response, instance of FileResponse can be used only once!
 
-    This object adds Last-Modified header, if is not set.
+    This object adds Last-Modified header and strong ETag header computed
+    from file inode, size and modification time, if they are not set, so
+    ETag could be used in If-Range header.
     """
     def __init__(self, path: str, content_type: Optional[str] = None,
                  headers: Optional[Union[Headers, HeadersList]] = None,
@@ -357,13 +537,17 @@ class FileResponse(FileObjResponse):
             (content_type, encoding) = mimetypes.guess_type(path)
 
         # pylint: disable=consider-using-with
-        super().__init__(open(path, 'rb', buffering=0),
+        file_obj = open(path, 'rb', buffering=0)
+        stat = fstat(file_obj.fileno())
+        super().__init__(file_obj,
                          content_type=content_type,
                          headers=headers,
                          status_code=status_code)
 
         if 'Last-Modified' not in self.headers:
-            self.add_header('Last-Modified', time_to_http(getctime(path)))
+            self.add_header('Last-Modified', time_to_http(stat.st_mtime))
+        if 'ETag' not in self.headers:
+            self.add_header('ETag', file_etag(stat))
 
 
 class GeneratorResponse(BaseResponse):
@@ -530,6 +714,10 @@ class NotModifiedResponse(NoContentResponse):
         if vary:
             self.add_header('Vary', vary)
 
+    def __start_response__(self, start_response: Callable):
+        # NoContentResponse don't send headers, but they are needed here
+        BaseResponse.__start_response__(self, start_response)
+
 
 class ResponseError(RuntimeError):
     """Exception for bad response values."""
@@ -605,6 +793,80 @@ def make_response(data: Union[str, bytes],
         "Returned data must by: <bytes|str>, <str>, <Headers|None>, <int>")
 
 
+def file_etag(stat: stat_result):
+    """Return entity tag from file inode, size and modification time.
+
+    It is strong entity tag, because modification time in nanoseconds is
+    changed with each write of file.
+
+    >>> from os import stat
+    >>> file_etag(stat(__file__))  # doctest: +ELLIPSIS
+    '"...-...-..."'
+    """
+    return '"%x-%x-%x"' % (stat.st_ino, stat.st_size, stat.st_mtime_ns)
+
+
+def strip_weak(etag: str):
+    """Return opaque part of entity tag for weak comparison."""
+    etag = etag.strip()
+    return etag[2:] if etag.startswith('W/') else etag
+
+
+def make_conditional(req, response: BaseResponse):
+    """Return Not Modified response, if request conditions allow it.
+
+    If-None-Match request header is compared with ETag response header by
+    weak comparison. When request don't have If-None-Match header,
+    If-Modified-Since is compared with Last-Modified response header. When
+    response was not modified, NotModifiedResponse with validator headers is
+    returned and original response is closed, otherwise original response
+    is returned.
+
+    Only GET and HEAD requests with OK responses are processed. Application
+    do this automatically for FileResponse and static files from
+    document_root, but it could be used for any response with ETag or
+    Last-Modified header.
+
+    .. code:: python
+
+        @app.route('/data')
+        def data(req):
+            response = JSONResponse(data=get_data(),
+                                    headers={'ETag': '"%s"' % data_version()})
+            return make_conditional(req, response)
+    """
+    if response.status_code != HTTP_OK or \
+            not req.method_number & (METHOD_GET | METHOD_HEAD):
+        return response
+
+    headers = response.headers
+    if_none_match = req.headers.get('If-None-Match')
+    if if_none_match is not None:
+        etag = headers.get('ETag')
+        if etag is None:
+            return response
+        if if_none_match.strip() != '*' and strip_weak(etag) not in (
+                strip_weak(it) for it in if_none_match.split(',')):
+            return response
+    else:
+        if_modified_since = req.headers.get('If-Modified-Since')
+        last_modified = headers.get('Last-Modified')
+        if if_modified_since is None or last_modified is None:
+            return response
+        try:
+            if http_to_time(last_modified) > http_to_time(if_modified_since):
+                return response
+        except ValueError:
+            return response     # invalid date is ignored
+
+    if hasattr(response, 'close'):
+        response.close()
+    return NotModifiedResponse(
+        headers=[(key, headers[key]) for key in NOT_MODIFIED_COPY
+                 if key in headers],
+        date=time_to_http())
+
+
 def redirect(location: str,
              status_code: Union[int, bool] = HTTP_MOVED_TEMPORARILY,
              message: Union[str, bytes] = b'',
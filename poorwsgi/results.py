@@ -2,23 +2,25 @@
 
 :Functions: not_modified, internal_server_error, bad_request, forbidden,
             not_found, method_not_allowed, not_implemented, directory_index,
-            debug_info
+            debug_info, profile_info
 """
 
 from traceback import format_exception
 from time import strftime, gmtime
-from os.path import isfile, isdir, getsize, getctime
+from os.path import isdir
+from urllib.parse import quote
 from operator import itemgetter
 from sys import version, exc_info
 from inspect import cleandoc
 from logging import getLogger
 from hashlib import sha256
-from typing import Dict, Callable
+from typing import Dict, Callable, Optional, Sequence
+from io import StringIO
 
 import os
-import mimetypes
 
-from poorwsgi.response import Response, NotModifiedResponse, HTTPException
+from poorwsgi.response import Response, TextResponse, NotModifiedResponse, \
+    HTTPException
 from poorwsgi.state import METHOD_ALL, methods, sorted_methods, \
     HTTP_NOT_MODIFIED, HTTP_BAD_REQUEST, HTTP_UNAUTHORIZED, HTTP_FORBIDDEN, \
     HTTP_NOT_FOUND, HTTP_METHOD_NOT_ALLOWED, HTTP_INTERNAL_SERVER_ERROR, \
@@ -26,6 +28,7 @@ from poorwsgi.state import METHOD_ALL, methods, sorted_methods, \
     __version__, __date__
 from poorwsgi.session import get_token
 from poorwsgi.headers import time_to_http
+from poorwsgi.static import DirectoryCache, DirEntry
 
 HTML_ESCAPE_TABLE = {'&': "&amp;",
                      '"': "&quot;",
@@ -383,8 +386,25 @@ def not_implemented(req, code=None, error=None):
 # enddef
 
 
-def directory_index(req, path):
-    """Returns directory index as html page."""
+# sort keys of directory index, default is name
+INDEX_SORT_KEYS = {
+    'name': lambda it: it.name,
+    'mtime': lambda it: it.mtime,
+    'size': lambda it: (it.is_dir, it.size),
+}
+
+
+def directory_index(req, path, cache: Optional[DirectoryCache] = None):
+    """Returns directory index as html page.
+
+    Directory entries are read by cache, which is DirectoryCache of
+    Application, when it is called from document index.
+    Listing could be sorted by ``sort`` argument (name, mtime or size) and
+    ``order`` argument (asc or desc). When Application.document_index_size
+    is set, only that count of entries is returned on ``page``.
+    """
+    # pylint: disable=too-many-locals,too-many-branches
+    # pylint: disable=too-many-statements
     if not isdir(path):
         log.error(
             "Only directory_index can be send with directory_index handler. "
@@ -392,16 +412,35 @@ def directory_index(req, path):
             path)
         raise HTTPException(HTTP_INTERNAL_SERVER_ERROR)
 
-    last_modified = time_to_http(getctime(path))
-
-    index = os.listdir(path)
-    if req.document_root != path[:-1]:
-        index.append("..")  # parent directory
-
-    index.sort()
-
-    diruri = req.uri.rstrip('/')
-    content = (
+    mtime, listing = (cache or DirectoryCache()).get(path)
+    entries: Sequence[DirEntry] = listing
+    last_modified = time_to_http(mtime)
+
+    sort = req.args.getfirst('sort', 'name')
+    if sort not in INDEX_SORT_KEYS:
+        sort = 'name'
+    desc = req.args.getfirst('order') == 'desc'
+    if sort != 'name' or desc:
+        entries = sorted(entries, key=INDEX_SORT_KEYS[sort], reverse=desc)
+
+    page_size = req.app.document_index_size
+    page, pages = 1, 1
+    if page_size:
+        pages = max(1, (len(entries) + page_size - 1) // page_size)
+        try:
+            page = min(max(1, int(req.args.getfirst('page', '1'))), pages)
+        except ValueError:
+            page = 1
+        entries = entries[(page-1)*page_size:page*page_size]
+
+    diruri = html_escape(quote(req.path.rstrip('/')))
+    title = html_escape(req.path.rstrip('/'))
+
+    def sort_link(key, label):
+        order = 'desc' if key == sort and not desc else 'asc'
+        return '<a href="?sort=%s&amp;order=%s">%s</a>' % (key, order, label)
+
+    content = [
         "<!DOCTYPE html>\n"
         "<html>\n"
         " <head>\n"
@@ -419,65 +458,60 @@ def directory_index(req, path):
         "  <h1>Index of %s</h1>\n"
         "  <hr>\n"
         "  <table>\n"
-        "   <tr><th>Name</th><th>Last Modified</th>"
-        "<th class=\"size\">Size</th><th>Type</th></tr>\n" % (diruri, diruri))
-
-    for item in index:
-        # dot files
-        if item[0] == "." and item[1] != ".":
-            continue
-        # bakup files (~)
-        if item[-1] == "~":
-            continue
-
-        fpath = "%s/%s" % (path, item)
-        if not os.access(fpath, os.R_OK):
-            continue
-
-        fname = item + ('/' if isdir(fpath) else '')
-        ftype = ""
-
-        if isfile(fpath):
-            # pylint: disable=unused-variable
-            (ftype, encoding) = mimetypes.guess_type(fpath)
-            if not ftype:
-                ftype = 'application/octet-stream'
-            size = "%.1f%s" % hbytes(getsize(fpath))
-        elif isdir(fpath):
-            ftype = "Directory"
-            size = "-"
+        "   <tr><th>%s</th><th>%s</th><th class=\"size\">%s</th>"
+        "<th>Type</th></tr>\n" % (
+            title, title, sort_link('name', 'Name'),
+            sort_link('mtime', 'Last Modified'), sort_link('size', 'Size'))]
+
+    if req.document_root != path[:-1] and page == 1:
+        content.append(
+            "   <tr><td><a href=\"%s/../\">../</a></td><td>-</td>"
+            "<td class=\"size\">-</td><td>Directory</td></tr>\n" % diruri)
+
+    for entry in entries:
+        if entry.is_dir:
+            fname, size, ftype = entry.name + '/', '-', 'Directory'
+        elif entry.is_file:
+            fname, ftype = entry.name, entry.mime_type
+            size = "%.1f%s" % hbytes(entry.size)
         else:
-            size = ftype = '-'
-
-        content += (
-            "   <tr><td><a href=\"%s\">%s</a></td><td>%s</td>"
+            fname, size, ftype = entry.name, '-', '-'
+        content.append(
+            "   <tr><td><a href=\"%s/%s\">%s</a></td><td>%s</td>"
             "<td class=\"size\">%s</td><td>%s</td></tr>\n" %
-            (diruri + '/' + fname,
-             fname,
-             strftime("%d-%b-%Y %H:%M", gmtime(getctime(fpath))),
-             size,
-             ftype))
-
-    content += (
-        "  </table>\n"
-        "  <hr>\n")
+            (diruri, html_escape(quote(fname)), html_escape(fname),
+             strftime("%d-%b-%Y %H:%M", gmtime(entry.mtime)), size, ftype))
+
+    content.append("  </table>\n")
+    if pages > 1:
+        links = []
+        args = "sort=%s&amp;order=%s" % (sort, 'desc' if desc else 'asc')
+        if page > 1:
+            links.append('<a href="?%s&amp;page=%d">&lt; Previous</a>' %
+                         (args, page-1))
+        links.append("Page %d of %d" % (page, pages))
+        if page < pages:
+            links.append('<a href="?%s&amp;page=%d">Next &gt;</a>' %
+                         (args, page+1))
+        content.append("  <p>%s</p>\n" % ' | '.join(links))
+    content.append("  <hr>\n")
 
     if req.debug:
-        content += (
+        content.append(
             "  <small><i>%s / Poor WSGI for Python, "
             "webmaster: %s </i></small>\n" %
             (req.server_software, req.server_admin)
         )
     else:
-        content += ("  <small><i>webmaster: %s </i></small>\n" %
-                    req.server_admin)
+        content.append("  <small><i>webmaster: %s </i></small>\n" %
+                       req.server_admin)
 
-    content += (
+    content.append(
         "  </body>\n"
         "</html>")
 
-    return (content, "text/html; character=utf-8",
-            ('Last-Modified', last_modified))
+    return (''.join(content), "text/html; charset=utf-8",
+            (('Last-Modified', last_modified),))
 
 
 def debug_info(req, app):
@@ -514,6 +548,14 @@ def debug_info(req, app):
                             '/debug-info',
                             'ALL',
                             debug_info.__module__+'.'+debug_info.__name__))
+    if req.debug and app.sampling_profiler is not None:
+        dhandlers_html += ('   <tr><td colspan="2"><a href="%s">%s</a></td>'
+                           '<td>%s</td><td>%s</td></tr>\n' %
+                           ('/debug-info/profile',
+                            '/debug-info/profile',
+                            'ALL',
+                            profile_info.__module__+'.' +
+                            profile_info.__name__))
 
     dhandlers_html += "\n".join(
         ('   <tr><td colspan="2">_default_handler_</td>'
@@ -702,6 +744,40 @@ def debug_info(req, app):
 # enddef
 
 
+def profile_info(req, app):
+    """Return aggregated profile from Application.sampling_profiler.
+
+    When Application.debug is enable, this handler is used for
+    /debug-info/profile. Query argument ``format`` could be ``text``
+    (default), ``pstats`` for pstats dump file, or ``collapsed`` for
+    collapsed stacks, which could be used by flame graph tools. Argument
+    ``rule`` selects only one uri_rule.
+    """
+    profiler = app.sampling_profiler
+    if profiler is None:
+        raise HTTPException(HTTP_NOT_FOUND)
+    rule = req.args.getfirst('rule')
+    format_ = req.args.getfirst('format', 'text')
+
+    if format_ == 'pstats':
+        return Response(profiler.dumps(rule), "application/octet-stream",
+                        (('Content-Disposition',
+                          'attachment; filename="poorwsgi.profile"'),))
+    if format_ == 'collapsed':
+        return TextResponse(profiler.collapsed(rule))
+
+    info = profiler.info()
+    output = StringIO()
+    output.write("Requests: %d\n" % info['requests'])
+    for key, count in sorted(info['samples'].items()):
+        output.write("Samples of %s: %d\n" % (key, count))
+    stats = profiler.stats(rule)
+    if stats is not None:
+        stats.stream = output   # type: ignore
+        stats.sort_stats('cumulative').print_stats(50)
+    return TextResponse(output.getvalue())
+
+
 def __fill_default_shandlers(code: int, handler: Callable):
     default_states[code] = {}
     for val in methods.values():
@@ -719,4 +795,4 @@ __fill_default_shandlers(HTTP_NOT_IMPLEMENTED, not_implemented)
 
 __all__ = ['not_modified', 'internal_server_error', 'bad_request', 'forbidden',
            'not_found', 'method_not_allowed', 'not_implemented',
-           'directory_index', 'debug_info']
+           'directory_index', 'debug_info', 'profile_info']
@@ -0,0 +1,377 @@
+"""Internal routing structures, which are used for faster route lookup.
+
+:Classes:   RegexMatcher, SegmentTree, RegularRouter, RouteCache
+:Functions: anonymize, compare_segments
+"""
+from collections import OrderedDict, namedtuple
+from logging import getLogger
+from threading import Lock
+from typing import Iterable, Optional, Tuple, List, Set, Union, Dict
+
+import re
+
+log = getLogger("poorwsgi")
+
+# pylint: disable=unsubscriptable-object
+# pylint: disable=consider-using-f-string
+
+# named group, which must be anonymized in combined regular expression
+RE_NAMED_GROUP = re.compile(r'(?<!\\)((?:\\\\)*)\(\?P<\w+>')
+# group references, which could not be used in combined regular expression
+RE_GROUP_REFERENCE = re.compile(
+    r'\(\?P=\w+\)|\(\?\(|(?<!\\)(?:\\\\)*\\[1-9]')
+
+
+# route segment could be literal string or regular expression
+Segment = Union[str, re.Pattern]
+Segments = Tuple[Segment, ...]
+
+CacheInfo = namedtuple('CacheInfo', ('hits', 'misses', 'maxsize', 'currsize'))
+
+# paths segments, which are tested against two different parametric
+# segments; they contain shared value of each pair of default filters
+SAMPLES = ('0', '-1', '1.5', 'a', 'F', '_',
+           '00000000-0000-0000-0000-000000000000')
+# results of compare_segments from the weakest one
+COMPARE_RESULTS = ('conflict', 'ambiguous', 'possibly ambiguous')
+
+
+def anonymize(pattern: re.Pattern) -> Optional[str]:
+    """Return pattern source, which could be part of combined expression.
+
+    Named groups are transformed to non-capturing groups, so more patterns
+    with the same group names could be joined to one alternation. None is
+    returned, when pattern could not be combined, for example when it uses
+    group references or global flags.
+
+    >>> anonymize(re.compile(r'/user/(?P<name>[^/]+)$'))
+    '/user/(?:[^/]+)$'
+    >>> anonymize(re.compile(r'/(\\w+)/\\1$')) is None
+    True
+    """
+    if pattern.flags & ~re.U:
+        return None
+    if RE_GROUP_REFERENCE.search(pattern.pattern):
+        return None
+    source = RE_NAMED_GROUP.sub(r'\1(?:', pattern.pattern)
+    try:
+        anonymous = re.compile("(?:%s)" % source, re.U)
+    except re.error:
+        return None
+    if anonymous.groups != pattern.groups - len(pattern.groupindex):
+        return None
+    return source
+
+
+class RegexMatcher:
+    """Single pass matcher for ordered list of regular expressions.
+
+    All patterns, which could be combined, are joined to one alternation
+    expression. Regular expression engine tries alternatives in the same
+    ordering, so the first registered pattern which match still wins.
+    Patterns, which could not be combined, are tested alone at their
+    position.
+
+    >>> matcher = RegexMatcher((re.compile(r'/user/(?P<id>\\d+)$'),
+    ...                         re.compile(r'/user/(?P<name>\\w+)$')))
+    >>> pattern, match = matcher.match('/user/ondra')
+    >>> pattern.pattern, match.groupdict()
+    ('/user/(?P<name>\\\\w+)$', {'name': 'ondra'})
+    >>> matcher.match('/group/1')
+    (None, None)
+    """
+    def __init__(self, patterns: Iterable[re.Pattern]):
+        # list of (combined expression, patterns) pairs, where combined
+        # expression is None, when only one pattern could not be combined
+        self.__chunks: List[Tuple[Optional[re.Pattern], list]] = []
+
+        sources: List[str] = []
+        chunk: List[re.Pattern] = []
+        for pattern in patterns:
+            source = anonymize(pattern)
+            if source is None:
+                self.__add_chunk(sources, chunk)
+                self.__chunks.append((None, [pattern]))
+                sources, chunk = [], []
+                continue
+            sources.append("(?P<_%d>(?:%s))" % (len(chunk), source))
+            chunk.append(pattern)
+        self.__add_chunk(sources, chunk)
+
+    def __add_chunk(self, sources: List[str], chunk: List[re.Pattern]):
+        if not chunk:
+            return
+        if len(chunk) == 1:     # combined expression is not needed
+            self.__chunks.append((None, chunk))
+            return
+        self.__chunks.append((re.compile('|'.join(sources), re.U), chunk))
+
+    def __len__(self):
+        """Return count of internal expressions tested on each match."""
+        return len(self.__chunks)
+
+    def match(self, path: str):
+        """Return tuple of first matched pattern and its match object.
+
+        If no pattern match, (None, None) is returned.
+        """
+        for combined, chunk in self.__chunks:
+            if combined is None:
+                match = chunk[0].match(path)
+                if match:
+                    return chunk[0], match
+                continue
+            match = combined.match(path)
+            if match and match.lastgroup:   # each alternative is named
+                pattern = chunk[int(match.lastgroup[1:])]
+                return pattern, pattern.match(path)
+        return None, None
+
+
+def _compare_params(one: re.Pattern, two: re.Pattern,
+                    known: Set[str]) -> Optional[str]:
+    """Compare two parametric segments, like compare_segments."""
+    if one.pattern == two.pattern:
+        return 'conflict'
+    if any(one.fullmatch(it) and two.fullmatch(it) for it in SAMPLES):
+        return 'ambiguous'
+    if one.pattern in known and two.pattern in known:
+        return None
+    return 'possibly ambiguous'
+
+
+def compare_segments(first: Segments, second: Segments,
+                     known: Iterable[str] = ()) -> Optional[str]:
+    """Compare two route segments definitions.
+
+    Returns ``conflict`` when both definitions match the same paths,
+    ``ambiguous`` when the same path could match both of them, or None
+    when definitions are disjoint. Two different parametric segments are
+    tested with SAMPLES. When no sample matches both of them, they are
+    disjoint only when both patterns are in known, which are patterns of
+    default filters. Otherwise ``possibly ambiguous`` is returned.
+
+    >>> digits = re.compile(r'(?:-?\\d+)')
+    >>> uuid = re.compile(r'(?:[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-'
+    ...                   r'[0-9a-f]{4}-[0-9a-f]{12})')
+    >>> compare_segments(('', 'user', digits), ('', 'user', digits))
+    'conflict'
+    >>> compare_segments(('', 'user', digits), ('', 'user', 'list'))
+    >>> compare_segments(('', 'user', digits), ('', 'user', '42'))
+    'ambiguous'
+    >>> compare_segments(('', digits), ('', uuid))
+    'possibly ambiguous'
+    >>> compare_segments(('', digits), ('', uuid),
+    ...                  (digits.pattern, uuid.pattern))
+    """
+    if len(first) != len(second):
+        return None
+    patterns = set(known)
+    rval = 'conflict'
+    for one, two in zip(first, second):
+        if isinstance(one, str):
+            if isinstance(two, str):
+                if one != two:
+                    return None
+                continue
+            literal, regex = one, two
+        elif isinstance(two, str):
+            literal, regex = two, one
+        else:
+            result = _compare_params(one, two, patterns)
+            if result is None:
+                return None
+            rval = max(rval, result, key=COMPARE_RESULTS.index)
+            continue
+        if not regex.fullmatch(literal):
+            return None
+        rval = max(rval, 'ambiguous', key=COMPARE_RESULTS.index)
+    return rval
+
+
+class _Node:
+    """Node of SegmentTree."""
+    # pylint: disable=too-few-public-methods
+    __slots__ = ('literals', 'params', 'leaf', 'min_seq')
+
+    def __init__(self):
+        self.literals: Dict[str, _Node] = {}
+        # {regex source: (regex, node)}, dictionary keeps the ordering
+        self.params: Dict[str, Tuple[re.Pattern, _Node]] = {}
+        # the first registered (seq, pattern) pair which ends in this node
+        self.leaf: Optional[Tuple[int, re.Pattern]] = None
+        # minimal sequence number in the whole subtree
+        self.min_seq = float('inf')
+
+
+class SegmentTree:
+    """Tree of route segments.
+
+    Literal segments are stored in dictionary, so they are found in
+    constant time. Regular expression are tested only for parametric
+    segments, which could be in that tree position. Lookup time depends on
+    path depth, not on count of routes. Each route has its sequence number,
+    and route with the lowest sequence number is returned if more routes
+    match the path.
+
+    >>> tree = SegmentTree()
+    >>> route = re.compile(r'/user/(?P<id>-?\\d+)$')
+    >>> tree.insert(('', 'user', re.compile(r'(?:-?\\d+)')), 0, route)
+    >>> tree.find('/user/42') == (0, route)
+    True
+    >>> tree.find('/user/ondra')
+    (None, None)
+    """
+    def __init__(self):
+        self.__root = _Node()
+
+    def __bool__(self):
+        return self.__root.leaf is not None or bool(
+            self.__root.literals or self.__root.params)
+
+    def insert(self, segments: Segments, seq: int, pattern: re.Pattern):
+        """Add route pattern defined by segments with sequence number."""
+        node = self.__root
+        node.min_seq = min(node.min_seq, seq)
+        for segment in segments:
+            if isinstance(segment, str):
+                node = node.literals.setdefault(segment, _Node())
+            else:
+                if segment.pattern not in node.params:
+                    node.params[segment.pattern] = (segment, _Node())
+                node = node.params[segment.pattern][1]
+            node.min_seq = min(node.min_seq, seq)
+        if node.leaf is None or seq < node.leaf[0]:
+            node.leaf = (seq, pattern)
+
+    def find(self, path: str):
+        """Return tuple of sequence number and pattern of the first route.
+
+        If no route match, (None, None) is returned.
+        """
+        parts = path.split('/')
+        size = len(parts)
+        best: List = [float('inf'), None]
+
+        def walk(node: _Node, index: int):
+            if node.min_seq >= best[0]:
+                return                  # there is better route yet
+            if index == size:
+                if node.leaf is not None and node.leaf[0] < best[0]:
+                    best[0], best[1] = node.leaf
+                return
+            part = parts[index]
+            child = node.literals.get(part)
+            if child is not None:
+                walk(child, index+1)
+            for regex, child in node.params.values():
+                if regex.fullmatch(part):
+                    walk(child, index+1)
+
+        walk(self.__root, 0)
+        if best[1] is None:
+            return None, None
+        return best[0], best[1]
+
+
+class RegularRouter:
+    """Router for ordered regular expression routes.
+
+    Routes, which are defined by segments, are stored in SegmentTree. Other
+    routes are matched with RegexMatcher. The first registered route which
+    match the path wins, just like in simple sequential searching.
+    """
+    # pylint: disable=too-few-public-methods
+    def __init__(self,
+                 routes: Iterable[Tuple[re.Pattern, Optional[Segments]]]):
+        self.__tree = SegmentTree()
+        self.__order: Dict[re.Pattern, int] = {}
+        others = []
+        for seq, (pattern, segments) in enumerate(routes):
+            if segments is None:
+                self.__order[pattern] = seq
+                others.append(pattern)
+            else:
+                self.__tree.insert(segments, seq, pattern)
+        self.__matcher = RegexMatcher(others)
+
+    def match(self, path: str):
+        """Return tuple of first matched pattern and its match object.
+
+        If no pattern match, (None, None) is returned.
+        """
+        seq, tree_pattern = -1, None
+        if self.__tree:
+            seq, tree_pattern = self.__tree.find(path)
+        pattern, match = self.__matcher.match(path) if self.__matcher \
+            else (None, None)
+        if tree_pattern is not None and \
+                (pattern is None or seq < self.__order[pattern]):
+            return tree_pattern, tree_pattern.match(path)
+        return pattern, match
+
+
+class RouteCache:
+    """Thread safe bounded LRU cache for resolved routes.
+
+    If maxsize is zero, cache is disabled, so nothing is stored.
+
+    >>> cache = RouteCache(1)
+    >>> cache.set(('/a', 2), 'a')
+    >>> cache.get(('/a', 2)), cache.get(('/b', 2))
+    ('a', None)
+    >>> cache.set(('/b', 2), 'b')
+    >>> cache.get(('/a', 2)), cache.get(('/b', 2))
+    (None, 'b')
+    >>> cache.info()
+    CacheInfo(hits=2, misses=2, maxsize=1, currsize=1)
+    """
+    def __init__(self, maxsize: int = 0):
+        self.__maxsize = maxsize
+        self.__data: OrderedDict = OrderedDict()
+        self.__lock = Lock()
+        self.__hits = 0
+        self.__misses = 0
+
+    @property
+    def maxsize(self):
+        """Maximum count of cached routes."""
+        return self.__maxsize
+
+    @maxsize.setter
+    def maxsize(self, value: int):
+        with self.__lock:
+            self.__maxsize = value
+            while len(self.__data) > value:
+                self.__data.popitem(last=False)
+
+    def get(self, key):
+        """Return cached value and mark it as recently used, or None."""
+        with self.__lock:
+            value = self.__data.get(key)
+            if value is None:
+                self.__misses += 1
+                return None
+            self.__data.move_to_end(key)
+            self.__hits += 1
+            return value
+
+    def set(self, key, value):
+        """Store value, the least recently used value could be dropped."""
+        if not self.__maxsize:
+            return
+        with self.__lock:
+            self.__data[key] = value
+            self.__data.move_to_end(key)
+            if len(self.__data) > self.__maxsize:
+                self.__data.popitem(last=False)
+
+    def clear(self):
+        """Drop all cached values, counters are kept."""
+        with self.__lock:
+            self.__data.clear()
+
+    def info(self):
+        """Return CacheInfo with hits, misses, maxsize and currsize."""
+        return CacheInfo(self.__hits, self.__misses, self.__maxsize,
+                         len(self.__data))
@@ -4,7 +4,6 @@
 :Functions: hidden, get_token, check_token
 """
 from hashlib import sha512, sha256
-from json import dumps, loads
 from base64 import b64decode, b64encode
 from logging import getLogger
 from time import time
@@ -15,6 +14,7 @@ import bz2
 from http.cookies import SimpleCookie
 
 from poorwsgi.headers import Headers
+from poorwsgi.jsoncodec import dumps, loads
 from poorwsgi.request import Request
 from poorwsgi.response import Response
 
@@ -245,9 +245,9 @@ class PoorSession:
 
         if raw:
             try:
-                self.data = loads(hidden(self.__cps.decompress
-                                         (b64decode(raw.encode())),
-                                         self.__secret_key))
+                self.data = loads(bytes(hidden(self.__cps.decompress
+                                               (b64decode(raw.encode())),
+                                               self.__secret_key)))
             except Exception as err:
                 log.info(repr(err))
                 raise SessionError("Bad session data.") from err
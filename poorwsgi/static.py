@@ -0,0 +1,448 @@
+"""Support for serving static files from document root.
+
+:Classes:   FileInfo, DirEntry, Asset, StatCache, DirectoryCache,
+            AssetStore, StaticFileResponse, AssetResponse
+:Functions: file_info, scan_directory, select_precompressed,
+            precompressed_response
+"""
+from collections import OrderedDict, namedtuple
+from io import BytesIO
+from logging import getLogger
+from os import access, stat, scandir, R_OK
+from os.path import join
+from stat import S_ISREG, S_ISDIR
+from threading import Lock
+from time import monotonic, time
+from typing import Callable, Iterable, Optional, Tuple, Union
+
+import mimetypes
+
+from poorwsgi.headers import Headers, HeadersList, time_to_http, \
+    negotiate_encoding
+from poorwsgi.response import FileObjResponse, FileResponse, file_etag
+from poorwsgi.routing import CacheInfo
+from poorwsgi.state import HTTP_OK
+
+log = getLogger("poorwsgi")
+
+# pylint: disable=unsubscriptable-object
+
+FileInfo = namedtuple('FileInfo', (
+    'path', 'exists', 'is_file', 'is_dir', 'readable', 'size', 'mtime',
+    'mime_type', 'etag', 'last_modified'))
+FileInfo.__doc__ = """Metadata of file, which are needed for serving it."""
+
+DirEntry = namedtuple('DirEntry', (
+    'name', 'is_dir', 'is_file', 'size', 'mtime', 'mime_type'))
+DirEntry.__doc__ = """Directory entry for directory index."""
+
+Asset = namedtuple('Asset', (
+    'path', 'data', 'size', 'mtime', 'mime_type', 'etag', 'last_modified'))
+Asset.__doc__ = """Content of file stored in memory with its metadata."""
+AssetInfo = namedtuple('AssetInfo', ('hits', 'misses', 'budget', 'used',
+                                     'count'))
+
+# content codings and suffixes of precompressed files in server preference
+PRECOMPRESSED = (('br', '.br'), ('zstd', '.zst'), ('gzip', '.gz'))
+
+
+def file_info(path: str) -> FileInfo:
+    """Return FileInfo of path with only two system calls.
+
+    >>> info = file_info(__file__)
+    >>> info.exists, info.is_file, info.is_dir, info.mime_type
+    (True, True, False, 'text/x-python')
+    >>> file_info(__file__+'.none').exists
+    False
+    """
+    try:
+        stat_ = stat(path)
+    except (OSError, ValueError):
+        return FileInfo(path, False, False, False, False, 0, 0, None, None,
+                        None)
+    is_file = S_ISREG(stat_.st_mode)
+    mime_type = mimetypes.guess_type(path)[0] if is_file else None
+    return FileInfo(path, True, is_file, S_ISDIR(stat_.st_mode),
+                    access(path, R_OK), stat_.st_size, stat_.st_mtime,
+                    mime_type, file_etag(stat_),
+                    time_to_http(stat_.st_mtime))
+
+
+class StatCache:
+    """Thread safe bounded cache of FileInfo for static files.
+
+    Each record is valid for ttl seconds, then file is checked again. If
+    maxsize is zero, cache is disabled, and file is checked every time.
+
+    >>> cache = StatCache(maxsize=1, ttl=60)
+    >>> cache.get(__file__) is cache.get(__file__)
+    True
+    >>> cache.info()
+    CacheInfo(hits=1, misses=1, maxsize=1, currsize=1)
+    """
+    def __init__(self, maxsize: int = 0, ttl: float = 1.0):
+        self.__maxsize = maxsize
+        self.ttl = ttl
+        # {path: (timestamp, FileInfo)}
+        self.__data: OrderedDict = OrderedDict()
+        self.__lock = Lock()
+        self.__hits = 0
+        self.__misses = 0
+
+    @property
+    def maxsize(self):
+        """Maximum count of cached files."""
+        return self.__maxsize
+
+    @maxsize.setter
+    def maxsize(self, value: int):
+        with self.__lock:
+            self.__maxsize = value
+            while len(self.__data) > value:
+                self.__data.popitem(last=False)
+
+    def get(self, path: str) -> FileInfo:
+        """Return FileInfo from cache, or check the file."""
+        now = monotonic()
+        with self.__lock:
+            record = self.__data.get(path)
+            if record is not None and now - record[0] < self.ttl:
+                self.__data.move_to_end(path)
+                self.__hits += 1
+                return record[1]
+            self.__misses += 1
+
+        info = file_info(path)
+        if self.__maxsize:
+            with self.__lock:
+                self.__data[path] = (now, info)
+                self.__data.move_to_end(path)
+                if len(self.__data) > self.__maxsize:
+                    self.__data.popitem(last=False)
+        return info
+
+    def pop(self, path: str):
+        """Drop cached FileInfo of path."""
+        with self.__lock:
+            self.__data.pop(path, None)
+
+    def clear(self):
+        """Drop all cached records, counters are kept."""
+        with self.__lock:
+            self.__data.clear()
+
+    def info(self):
+        """Return CacheInfo with hits, misses, maxsize and currsize."""
+        return CacheInfo(self.__hits, self.__misses, self.__maxsize,
+                         len(self.__data))
+
+
+def scan_directory(path: str) -> Tuple[DirEntry, ...]:
+    """Return readable directory entries sorted by name.
+
+    Directory is read by scandir, and only one stat and one access call
+    is done for each entry. Hidden files (starting with dot), backup files
+    (ending with tilde), unreadable files and broken symbolic links are
+    skipped.
+
+    >>> from os.path import dirname
+    >>> entries = scan_directory(dirname(__file__))
+    >>> [it for it in entries if it.name == 'static.py'][0].mime_type
+    'text/x-python'
+    """
+    entries = []
+    with scandir(path) as iterator:
+        for entry in iterator:
+            name = entry.name
+            if name[0] == '.' or name[-1] == '~':
+                continue
+            try:
+                stat_ = entry.stat()
+            except OSError:
+                continue
+            if not access(join(path, name), R_OK):
+                continue
+            is_file = S_ISREG(stat_.st_mode)
+            mime_type = None
+            if is_file:
+                mime_type = mimetypes.guess_type(name)[0] or \
+                    'application/octet-stream'
+            entries.append(DirEntry(name, S_ISDIR(stat_.st_mode), is_file,
+                                    stat_.st_size, stat_.st_mtime,
+                                    mime_type))
+    entries.sort(key=lambda it: it.name)
+    return tuple(entries)
+
+
+class DirectoryCache:
+    """Thread safe LRU cache of directory entries.
+
+    Cached entries are valid, while modification time of directory is not
+    changed. Modification time of directory is changed, when some file is
+    created, deleted or renamed, but not when file content is changed, so
+    sizes and times of files could be stale. Directories changed in the last
+    second are not cached, because file system could have coarse time
+    resolution. If maxsize is zero, cache is disabled, and directory is read
+    every time.
+
+    >>> cache = DirectoryCache(maxsize=1)
+    >>> from os.path import dirname
+    >>> path = dirname(__file__)
+    >>> cache.get(path) == cache.get(path)
+    True
+    """
+    def __init__(self, maxsize: int = 0):
+        self.__maxsize = maxsize
+        # {path: (mtime_ns, entries)}
+        self.__data: OrderedDict = OrderedDict()
+        self.__lock = Lock()
+        self.__hits = 0
+        self.__misses = 0
+
+    @property
+    def maxsize(self):
+        """Maximum count of cached directories."""
+        return self.__maxsize
+
+    @maxsize.setter
+    def maxsize(self, value: int):
+        with self.__lock:
+            self.__maxsize = value
+            while len(self.__data) > value:
+                self.__data.popitem(last=False)
+
+    def get(self, path: str) -> Tuple[float, Tuple[DirEntry, ...]]:
+        """Return modification time and entries of directory."""
+        stat_ = stat(path)
+        with self.__lock:
+            record = self.__data.get(path)
+            if record is not None and record[0] == stat_.st_mtime_ns:
+                self.__data.move_to_end(path)
+                self.__hits += 1
+                return stat_.st_mtime, record[1]
+            self.__misses += 1
+
+        entries = scan_directory(path)
+        if self.__maxsize and time() - stat_.st_mtime > 1:
+            with self.__lock:
+                self.__data[path] = (stat_.st_mtime_ns, entries)
+                self.__data.move_to_end(path)
+                if len(self.__data) > self.__maxsize:
+                    self.__data.popitem(last=False)
+        return stat_.st_mtime, entries
+
+    def clear(self):
+        """Drop all cached records, counters are kept."""
+        with self.__lock:
+            self.__data.clear()
+
+    def info(self):
+        """Return CacheInfo with hits, misses, maxsize and currsize."""
+        return CacheInfo(self.__hits, self.__misses, self.__maxsize,
+                         len(self.__data))
+
+
+class AssetStore:
+    """Thread safe in-memory LRU store of small static files.
+
+    Files up to max_size bytes are read on the first request, or by preload
+    method, and stored while total size of stored files is not over budget.
+    The least recently used files are dropped, when budget is exceeded.
+    Stored asset is valid while size and modification time from FileInfo
+    are the same, so it is changed together with StatCache record. If budget
+    is zero, store is disabled.
+
+    >>> store = AssetStore(budget=1 << 20)
+    >>> asset = store.get(file_info(__file__))
+    >>> store.get(file_info(__file__)) is asset
+    True
+    >>> store.info().count
+    1
+    """
+    def __init__(self, budget: int = 0, max_size: int = 65536):
+        self.__budget = budget
+        self.max_size = max_size
+        self.__data: OrderedDict = OrderedDict()    # {path: Asset}
+        self.__used = 0
+        self.__lock = Lock()
+        self.__hits = 0
+        self.__misses = 0
+
+    @property
+    def budget(self):
+        """Maximum size of all stored files in bytes."""
+        return self.__budget
+
+    @budget.setter
+    def budget(self, value: int):
+        with self.__lock:
+            self.__budget = value
+            self.__evict()
+
+    def __evict(self):
+        while self.__used > self.__budget:
+            asset = self.__data.popitem(last=False)[1]
+            self.__used -= asset.size
+
+    def get(self, info: FileInfo) -> Optional[Asset]:
+        """Return Asset for file, which could be read now.
+
+        None is returned, when store is disabled, or file could not be
+        stored.
+        """
+        if not self.__budget or not info.is_file or \
+                info.size > self.max_size or info.size > self.__budget:
+            return None
+        with self.__lock:
+            asset = self.__data.get(info.path)
+            if asset is not None and asset.mtime == info.mtime and \
+                    asset.size == info.size:
+                self.__data.move_to_end(info.path)
+                self.__hits += 1
+                return asset
+            self.__misses += 1
+
+        with open(info.path, 'rb') as file:
+            data = file.read(info.size + 1)
+        if len(data) != info.size:      # file was changed
+            return None
+        asset = Asset(info.path, data, info.size, info.mtime,
+                      info.mime_type, info.etag, info.last_modified)
+        with self.__lock:
+            old = self.__data.pop(info.path, None)
+            if old is not None:
+                self.__used -= old.size
+            self.__data[info.path] = asset
+            self.__used += asset.size
+            self.__evict()
+        return asset
+
+    def preload(self, paths: Iterable[str]) -> int:
+        """Read files to store, return count of stored files.
+
+        Files, which could not be read, are skipped with warning.
+        """
+        count = 0
+        for path in paths:
+            try:
+                asset = self.get(file_info(path))
+            except OSError as err:
+                log.warning("Could not preload %s: %s", path, err)
+                continue
+            if asset is not None:
+                count += 1
+        return count
+
+    def pop(self, path: str):
+        """Drop stored file."""
+        with self.__lock:
+            asset = self.__data.pop(path, None)
+            if asset is not None:
+                self.__used -= asset.size
+
+    def clear(self):
+        """Drop all stored files, counters are kept."""
+        with self.__lock:
+            self.__data.clear()
+            self.__used = 0
+
+    def info(self):
+        """Return AssetInfo with hits, misses, budget, used and count."""
+        return AssetInfo(self.__hits, self.__misses, self.__budget,
+                         self.__used, len(self.__data))
+
+
+class StaticFileResponse(FileResponse):
+    """FileResponse created from FileInfo.
+
+    Content type, Last-Modified and ETag headers are taken from FileInfo,
+    so only file is opened.
+    """
+    def __init__(self, info: FileInfo, content_type: Optional[str] = None,
+                 headers: Optional[Union[Headers, HeadersList]] = None,
+                 status_code: int = HTTP_OK):
+        # pylint: disable=super-init-not-called,non-parent-init-called
+        # pylint: disable=consider-using-with
+        FileObjResponse.__init__(self, open(info.path, 'rb', buffering=0),
+                                 content_type=content_type or info.mime_type,
+                                 headers=headers,
+                                 status_code=status_code)
+        if 'Last-Modified' not in self.headers:
+            self.add_header('Last-Modified', info.last_modified)
+        if 'ETag' not in self.headers:
+            self.add_header('ETag', info.etag)
+
+
+def select_precompressed(
+        info: FileInfo, accept_encoding: Iterable[Tuple[str, float]],
+        get_info: Callable[[str], FileInfo] = file_info,
+        suffixes: Iterable[Tuple[str, str]] = PRECOMPRESSED
+) -> Tuple[FileInfo, Optional[str], Optional[Headers]]:
+    """Return FileInfo, content type and headers of the best sibling.
+
+    Siblings with suffixes (``.br``, ``.zst`` and ``.gz`` by default) are
+    used only when they are not older than original file. Content type is
+    taken from original file, ``Content-Encoding`` is set to coding of
+    sibling. Header ``Vary: Accept-Encoding`` is set everytime when some
+    sibling exists, so even original file response could be right cached.
+    When no sibling exists, original info with None values is returned.
+    Function get_info could be StatCache.get method, and suffixes could be
+    taken from CodecRegistry.suffixes method.
+    """
+    available = {}
+    for coding, suffix in suffixes:
+        sibling = get_info(info.path + suffix)
+        if sibling.is_file and sibling.readable and \
+                sibling.mtime >= info.mtime:
+            available[coding] = sibling
+    if not available:
+        return info, None, None
+
+    headers = Headers((('Vary', 'Accept-Encoding'),))
+    encoding = negotiate_encoding(accept_encoding, available)
+    if encoding is None:
+        return info, None, headers
+    log.debug("Return %s precompressed file: %s", encoding, info.path)
+    headers.add('Content-Encoding', encoding)
+    return available[encoding], info.mime_type, headers
+
+
+def precompressed_response(
+        info: FileInfo, accept_encoding: Iterable[Tuple[str, float]],
+        get_info: Callable[[str], FileInfo] = file_info,
+        suffixes: Iterable[Tuple[str, str]] = PRECOMPRESSED
+) -> StaticFileResponse:
+    """Return StaticFileResponse for the best precompressed sibling.
+
+    See select_precompressed function.
+    """
+    info, content_type, headers = select_precompressed(
+        info, accept_encoding, get_info, suffixes)
+    return StaticFileResponse(info, content_type=content_type,
+                              headers=headers)
+
+
+class AssetResponse(FileObjResponse):
+    """Response with file content from AssetStore.
+
+    Data are shared between all responses, BytesIO over them is not copied.
+    Content type, Last-Modified and ETag headers are taken from Asset. Range
+    requests are supported by make_partial method, like in FileResponse.
+    """
+    def __init__(self, asset: Asset, content_type: Optional[str] = None,
+                 headers: Optional[Union[Headers, HeadersList]] = None,
+                 status_code: int = HTTP_OK):
+        super().__init__(BytesIO(asset.data),
+                         content_type or asset.mime_type or
+                         "application/octet-stream",
+                         headers=headers,
+                         status_code=status_code)
+        self.__asset = asset
+        if 'Last-Modified' not in self.headers:
+            self.add_header('Last-Modified', asset.last_modified)
+        if 'ETag' not in self.headers:
+            self.add_header('ETag', asset.etag)
+
+    @property
+    def data(self):
+        return self.__asset.data
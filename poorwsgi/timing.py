@@ -0,0 +1,174 @@
+"""Timing of request phases.
+
+:Classes:   Timing, TimedIterable, TimedAsyncIterable, TimedFile
+"""
+from io import BytesIO
+from time import perf_counter
+from typing import AsyncIterable, Callable, Dict, Iterable, List, \
+    Optional, Tuple
+
+# pylint: disable=unsubscriptable-object
+# pylint: disable=consider-using-f-string
+
+
+class Timing:
+    """Monotonic timestamps of request phases.
+
+    Each phase is marked at its end, so its duration is the time from the
+    previous mark, or from the start of request for the first one. Phases
+    are marked by Application: ``headers`` and ``body`` parsing (or
+    ``request`` when lazy_request is set), ``before`` response handlers,
+    ``handler``, ``after`` response handlers, ``response`` preparing and
+    ``emission`` of the body to the WSGI server.
+
+    >>> timing = Timing(0.0)
+    >>> timing.marks.extend((('handler', 0.002), ('response', 0.0025)))
+    >>> timing.header()
+    'handler;dur=2.000, response;dur=0.500, total;dur=2.500'
+    """
+    __slots__ = ('start', 'marks')
+
+    def __init__(self, start: Optional[float] = None):
+        self.start = perf_counter() if start is None else start
+        self.marks: List[Tuple[str, float]] = []
+
+    def mark(self, phase: str):
+        """Mark the end of phase."""
+        self.marks.append((phase, perf_counter()))
+
+    @property
+    def total(self) -> float:
+        """Time in seconds from the start to the last mark."""
+        return self.marks[-1][1] - self.start if self.marks else 0.0
+
+    def durations(self) -> Dict[str, float]:
+        """Return durations of phases in seconds.
+
+        Durations of phases, which are marked more times, are summed.
+        """
+        retval: Dict[str, float] = {}
+        last = self.start
+        for phase, stamp in self.marks:
+            retval[phase] = retval.get(phase, 0.0) + stamp - last
+            last = stamp
+        return retval
+
+    def header(self) -> str:
+        """Return value of Server-Timing header with durations in ms."""
+        items = ["%s;dur=%.3f" % (phase, duration * 1000)
+                 for phase, duration in self.durations().items()]
+        items.append("total;dur=%.3f" % (self.total * 1000))
+        return ', '.join(items)
+
+
+class TimedIterable:
+    """Iterable wrapper, which marks ``emission`` phase after the last chunk.
+
+    Size of sent chunks is counted in ``sent`` attribute. When the last
+    chunk is sent, or when iterable is closed by WSGI server, callback is
+    called with this wrapper. Wrapped iterable is closed too, and then
+    close_callback is called with this wrapper.
+    """
+    def __init__(self, iterable: Iterable[bytes], timing: Timing,
+                 callback: Optional[Callable] = None,
+                 close_callback: Optional[Callable] = None):
+        self.__iterable = iterable
+        self.__timing = timing
+        self.__callback = callback
+        self.__close_callback = close_callback
+        self.__finished = False
+        self.__closed = False
+        self.sent = 0
+
+    def __iter__(self):
+        for chunk in self.__iterable:
+            self.sent += len(chunk)
+            yield chunk
+        self.finish()
+
+    @property
+    def buffer(self) -> Optional[BytesIO]:
+        """Wrapped in memory buffer of Response, which could be sent at once.
+
+        None is returned for other iterables.
+        """
+        if isinstance(self.__iterable, BytesIO):
+            return self.__iterable
+        return None
+
+    def finish(self, closed: bool = False):
+        """Mark emission phase and call callback, only once.
+
+        When closed is True, close_callback is called too, only once.
+        """
+        if not self.__finished:
+            self.__finished = True
+            self.__timing.mark('emission')
+            if self.__callback is not None:
+                self.__callback(self)
+        if closed and not self.__closed:
+            self.__closed = True
+            if self.__close_callback is not None:
+                self.__close_callback(self)
+
+    def close(self):
+        """Close wrapped iterable and finish emission."""
+        try:
+            close = getattr(self.__iterable, 'close', None)
+            if close is not None:
+                close()
+        finally:
+            self.finish(closed=True)
+
+
+class TimedAsyncIterable(TimedIterable):
+    """Asynchronous iterable wrapper, which is used by ASGI.
+
+    Wrapped iterable is closed by ``aclose`` from event loop, or by
+    ``close`` when it has synchronous close method.
+    """
+    def __init__(self, iterable: AsyncIterable[bytes], timing: Timing,
+                 callback: Optional[Callable] = None,
+                 close_callback: Optional[Callable] = None):
+        super().__init__(iterable, timing, callback,  # type: ignore
+                         close_callback)
+        self.__aiterable = iterable
+
+    async def __aiter__(self):
+        async for chunk in self.__aiterable:
+            self.sent += len(chunk)
+            yield chunk
+        self.finish()
+
+    async def aclose(self):
+        """Close wrapped async iterable and finish emission."""
+        aclose = getattr(self.__aiterable, 'aclose', None)
+        if aclose is None:
+            self.close()
+            return
+        try:
+            await aclose()
+        finally:
+            self.finish(closed=True)
+
+
+class TimedFile(TimedIterable):
+    """File object wrapper for wsgi.file_wrapper.
+
+    Server could use ``fileno`` for sendfile system call, so ``sent`` counts
+    only data read by ``read`` method.
+    """
+    def __init__(self, file, timing: Timing,
+                 callback: Optional[Callable] = None,
+                 close_callback: Optional[Callable] = None):
+        super().__init__(file, timing, callback, close_callback)
+        self.__file = file
+
+    def read(self, size: int = -1) -> bytes:
+        """Read from wrapped file."""
+        data = self.__file.read(size)
+        self.sent += len(data)
+        return data
+
+    def __getattr__(self, name):
+        return getattr(self.__file, name)
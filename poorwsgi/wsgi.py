@@ -8,12 +8,19 @@
 # pylint: disable=unsubscriptable-object
 # pylint: disable=consider-using-f-string
 
-from os import path, access, R_OK, environ
+from os import path, environ
+from io import BytesIO
+from asyncio import CancelledError, get_running_loop, \
+    run_coroutine_threadsafe
+from concurrent.futures import ThreadPoolExecutor
+from inspect import isawaitable, iscoroutinefunction
 from collections import OrderedDict
+from functools import partial
 from logging import getLogger
 from hashlib import md5, sha256
-from typing import List, Union, Callable, Optional, Type
+from typing import List, Union, Callable, Optional, Type, Iterable
 from time import time
+from uuid import UUID
 
 import re
 
@@ -22,15 +29,37 @@ from poorwsgi.state import \
     HTTP_METHOD_NOT_ALLOWED, HTTP_NOT_FOUND, HTTP_FORBIDDEN, \
     deprecated
 from poorwsgi.request import Request, SimpleRequest
+from poorwsgi.asgi import AsgiInput, environ_from_scope, read_body, \
+    send_response
+from poorwsgi.eventloop import event_loop
+from poorwsgi.background import BackgroundTasks
+from poorwsgi.profiler import profile_awaitable
+from poorwsgi.jsoncodec import current_codec, set_codec
+from poorwsgi.timing import Timing, TimedIterable, TimedAsyncIterable, \
+    TimedFile
+from poorwsgi.compress import compress_response, default_codecs, \
+    COMPRESS_MIN_SIZE, COMPRESS_MIME_TYPES
+from poorwsgi.static import StatCache, DirectoryCache, AssetStore, \
+    StaticFileResponse, AssetResponse, select_precompressed
+from poorwsgi.routing import RegularRouter, RouteCache, anonymize, \
+    compare_segments
 from poorwsgi.results import default_states, not_implemented, \
-    internal_server_error, directory_index, debug_info
+    internal_server_error, directory_index, debug_info, profile_info
 from poorwsgi.response import BaseResponse, HTTPException, \
-    FileObjResponse, FileResponse, make_response, ResponseError
+    FileObjResponse, NoContentResponse, make_response, make_conditional, \
+    ResponseError
 
 log = getLogger("poorwsgi")
 
 # check, if there is define filter in uri
 re_filter = re.compile(r'<(\w+)(:[^>]+)?>')
+# regular expression special characters, which are not allowed in literal
+# parts of routes indexed by segments
+re_special = re.compile(r'[.^$*+?{}\[\]\\|()]')
+# converted path arguments of these types could be stored in route cache
+IMMUTABLE_TYPES = (str, bytes, int, float, bool, UUID, type(None))
+# regular route was not resolved before Request was created
+UNRESOLVED = object()
 
 # Supported authorization algorithms
 AUTH_DIGEST_ALGORITHMS = {
@@ -96,10 +125,35 @@ class Application():
             ':re:': (None, str),
             'none': (r'[^/]+', str)
         }
+        # filters, which never match '/' character, so routes which use only
+        # these filters could be indexed by segments
+        self.__segment_filters = {':int', ':float', ':word', ':hex', ':uuid',
+                                  'none'}
+        # segment patterns of default filters, which are compared exactly
+        # by check_routes
+        self.__known_segments = frozenset(
+            "(?:%s)" % self.__filters[key][0]
+            for key in self.__segment_filters)
 
         # handlers of regex paths: {r'/user/([a-z]?)': {METHOD_GET: handler}}
         self.__rhandlers = OrderedDict()
 
+        # segments of regex paths created from route with groups:
+        # {r'/user/(?P<id>-?\d+)$': ('', 'user', r'(?:-?\d+)')}
+        self.__rsegments = {}
+
+        # routers, lazy created from rhandlers table for each method:
+        # {METHOD_GET: RegularRouter}
+        self.__rrouters = {}
+
+        # resolved regular routes: {('/user/42', METHOD_GET): (handler, rule,
+        #                            path_args, args)}
+        self.__route_cache = RouteCache()
+        self.__stat_cache = StatCache()
+        self.__directory_cache = DirectoryCache()
+        self.__assets = AssetStore()
+        self.__codecs = default_codecs()
+
         # http state handlers: {HTTP_NOT_FOUND: {METHOD_GET: my_404_handler}}
         self.__shandlers = {}
 
@@ -109,6 +163,7 @@ class Application():
         # -- Application variable
         self.__config = {
             'auto_args': True,
+            'auto_check_routes': False,
             'auto_form': True,
             'auto_json': True,
             'auto_data': True,
@@ -127,9 +182,17 @@ class Application():
                 'multipart/form-data'
             ],
             'auto_cookies': True,
+            'lazy_request': False,
             'debug': 'Off',
             'document_root': '',
             'document_index': 'Off',
+            'document_index_size': 0,
+            'precompressed': 'Off',
+            'compress': False,
+            'compress_min_size': COMPRESS_MIN_SIZE,
+            'compress_mime_types': list(COMPRESS_MIME_TYPES),
+            'server_timing': False,
+            'thread_pool_size': 16,
             'secret_key': None,
             'auth_type': None,
             'auth_algorithm': 'MD5-sess',
@@ -145,6 +208,10 @@ class Application():
         self.__runctx = None
         self.__dump = None
         self.__original_request__ = None
+        self.__profiler = None
+        self.__metrics = None
+        self.__thread_pool = None
+        self.__background_tasks = BackgroundTasks()
 
     def __regex(self, match):
         groups = match.groups()
@@ -163,6 +230,42 @@ class Application():
 
         return "(?P<%s>%s)" % (groups[0], regex)
 
+    def __segments(self, uri: str):
+        """Return route segments for SegmentTree or None.
+
+        Literal segments are strings, parametric segments are regular
+        expressions without named groups. If some segment could match the
+        '/' character, route could not be indexed by segments.
+        """
+        if re_special.search(re_filter.sub('', uri)):
+            return None
+        for match in re_filter.finditer(uri):
+            if str(match.groups()[1]).lower() not in self.__segment_filters:
+                return None
+
+        segments: List[Union[str, re.Pattern]] = []
+        for segment in uri.split('/'):
+            if not re_filter.search(segment):
+                segments.append(segment)
+                continue
+            source = anonymize(re.compile(
+                re_filter.sub(self.__regex, segment), re.U))
+            if source is None:
+                return None     # could not be matched by SegmentTree
+            segments.append(re.compile(source, re.U))
+        return tuple(segments)
+
+    def __regular_router(self, method_number: int):
+        """Return RegularRouter for all regular routes with method."""
+        router = self.__rrouters.get(method_number)
+        if router is None:
+            router = RegularRouter(
+                (ruri, self.__rsegments.get(ruri))
+                for ruri, handlers in self.__rhandlers.items()
+                if method_number in handlers)
+            self.__rrouters[method_number] = router
+        return router
+
     def __converter(self, _filter):
         _filter = str(_filter).lower()
         _filter = ':re:' if _filter[:4] == ':re:' else _filter
@@ -272,6 +375,21 @@ class Application():
     def auto_args(self, value):
         self.__config['auto_args'] = bool(value)
 
+    @property
+    def auto_check_routes(self):
+        """Check each route with groups, when it is set.
+
+        If it is True, each new route, which is indexed by path segments,
+        is compared with routes set before, and conflicts or ambiguities
+        are logged as warning, like by check_routes method. It must be set
+        before routes. Default value is False.
+        """
+        return self.__config['auto_check_routes']
+
+    @auto_check_routes.setter
+    def auto_check_routes(self, value):
+        self.__config['auto_check_routes'] = bool(value)
+
     @property
     def auto_form(self):
         """Automatic parsing arguments from request body.
@@ -300,6 +418,26 @@ class Application():
     def auto_json(self, value):
         self.__config['auto_json'] = bool(value)
 
+    @property
+    def json_codec(self):
+        """JSON codec, which serializes and parses JSON straight to bytes.
+
+        It is used by JSONResponse, parse_json_request for Request.json and
+        PoorSession. It is process wide setting, because responses are
+        created without application. It could be codec instance or its name:
+        ``json`` (default), ``orjson``, ``ujson``, ``simplejson`` or ``auto``
+        for the fastest of installed codecs.
+
+        .. code:: python
+
+            app.json_codec = 'auto'
+        """
+        return current_codec()
+
+    @json_codec.setter
+    def json_codec(self, value):
+        set_codec(value)
+
     @property
     def auto_data(self):
         """Enabling Request.data property for smaller requests.
@@ -350,6 +488,20 @@ class Application():
     def auto_cookies(self, value: Union[int, bool]):
         self.__config['auto_cookies'] = bool(value)
 
+    @property
+    def lazy_request(self):
+        """Parse request headers, arguments, cookies and body on demand.
+
+        If it is True, Request object is created without any parsing, and
+        each part of request is parsed with the first access of the right
+        property. Default value is False.
+        """
+        return self.__config['lazy_request']
+
+    @lazy_request.setter
+    def lazy_request(self, value: Union[int, bool]):
+        self.__config['lazy_request'] = bool(value)
+
     @property
     def debug(self):
         """Application debug as another way how to set poor_Debug.
@@ -388,6 +540,136 @@ class Application():
     def document_index(self, value: Union[int, bool]):
         self.__config['document_index'] = 'On' if bool(value) else 'Off'
 
+    @property
+    def document_index_size(self):
+        """Count of entries on one page of directory index.
+
+        Big directories are split to pages, when it is set. Default value is
+        0, so all entries are returned on one page.
+        """
+        return self.__config['document_index_size']
+
+    @document_index_size.setter
+    def document_index_size(self, value: int):
+        self.__config['document_index_size'] = int(value)
+
+    @property
+    def precompressed(self):
+        """Application precompressed as another way how to set
+        poor_Precompressed.
+
+        When it is set, precompressed siblings of files from document_root
+        (``.br``, ``.zst`` and ``.gz``) are returned to clients, which accept
+        their content coding. This setting will be rewrite by
+        poor_Precompressed environ variable.
+        """
+        return self.__config['precompressed'] == 'On'
+
+    @precompressed.setter
+    def precompressed(self, value: Union[int, bool]):
+        self.__config['precompressed'] = 'On' if bool(value) else 'Off'
+
+    @property
+    def route_cache_size(self):
+        """Size of LRU cache for resolved regular routes.
+
+        When it is set, handler, uri rule and converted path arguments of
+        matched regular route are stored for path and method. Next request
+        with the same path and method does not need to match any regular
+        expression or to call converters. Cache is cleared when any route
+        or filter is changed. Routes with mutable converted values, like
+        lists, are not stored. Default value is 0, so cache is disabled.
+        """
+        return self.__route_cache.maxsize
+
+    @route_cache_size.setter
+    def route_cache_size(self, value: int):
+        self.__route_cache.maxsize = int(value)
+
+    @property
+    def route_cache_info(self):
+        """Statistics of route cache.
+
+        Returns named tuple with hits, misses, maxsize and currsize values,
+        just like functools.lru_cache.
+        """
+        return self.__route_cache.info()
+
+    @property
+    def static_cache_size(self):
+        """Size of cache for metadata of files from document_root.
+
+        When it is set, result of stat call, mime type, ETag and
+        Last-Modified values of served files are stored, so the file is
+        only opened for next request. Default value is 0, so cache is
+        disabled.
+        """
+        return self.__stat_cache.maxsize
+
+    @static_cache_size.setter
+    def static_cache_size(self, value: int):
+        self.__stat_cache.maxsize = int(value)
+
+    @property
+    def static_cache_ttl(self):
+        """Time in seconds, how long is file metadata valid in cache.
+
+        Changed files are detected after this time. Default value is 1.0.
+        """
+        return self.__stat_cache.ttl
+
+    @static_cache_ttl.setter
+    def static_cache_ttl(self, value: float):
+        self.__stat_cache.ttl = float(value)
+
+    @property
+    def static_cache_info(self):
+        """Statistics of static file metadata cache.
+
+        Returns named tuple with hits, misses, maxsize and currsize values.
+        """
+        return self.__stat_cache.info()
+
+    @property
+    def directory_cache_size(self):
+        """Count of directories, which entries are cached for directory index.
+
+        Cached entries are valid while directory modification time is not
+        changed, so sizes and times of changed files could be stale. Default
+        value is 0, so cache is disabled, and directory is read for each
+        request.
+        """
+        return self.__directory_cache.maxsize
+
+    @directory_cache_size.setter
+    def directory_cache_size(self, value: int):
+        self.__directory_cache.maxsize = int(value)
+
+    @property
+    def directory_cache_info(self):
+        """Statistics of directory index cache.
+
+        Returns named tuple with hits, misses, maxsize and currsize values.
+        """
+        return self.__directory_cache.info()
+
+    @property
+    def static_assets(self):
+        """In-memory store of small static files from document_root.
+
+        Store is disabled by default. When its budget is set, files up to
+        max_size bytes (64 KiB by default) are held in memory, and they are
+        returned without opening the file. Files could be read on the first
+        request, or preloaded by preload method. Stored file is read again,
+        when its size or modification time from metadata cache is changed.
+
+        .. code:: python
+
+            app.static_assets.budget = 8 << 20      # 8 MiB
+            app.static_assets.preload(glob(app.document_root+'/*.ico'))
+        """
+        return self.__assets
+
     @property
     def secret_key(self):
         """Application secret_key could be replace by poor_SecretKey in
@@ -451,6 +733,65 @@ class Application():
         """Sets a timeout (in seconds) used for file receiving"""
         self.__config["read_timeout"] = timeout
 
+    @property
+    def compress(self):
+        """Compression of dynamic responses.
+
+        When it is True, Response, GeneratorResponse and their subclasses
+        are compressed by codecs from compress_codecs, if client accepts
+        it. Each
+        response could override this setting by its compress attribute.
+        Default value is False.
+        """
+        return self.__config['compress']
+
+    @compress.setter
+    def compress(self, value: Union[int, bool]):
+        self.__config['compress'] = bool(value)
+
+    @property
+    def compress_min_size(self):
+        """Minimal body size of Response, which is compressed.
+
+        Generator responses have unknown size, so they are compressed every
+        time. Default value is 1024 bytes.
+        """
+        return self.__config['compress_min_size']
+
+    @compress_min_size.setter
+    def compress_min_size(self, value: int):
+        self.__config['compress_min_size'] = int(value)
+
+    @property
+    def compress_mime_types(self):
+        """List of compressible mime types, which could be changed in place.
+
+        Text mime types, and types with +json or +xml suffix are compressed
+        every time.
+
+        .. code:: python
+
+            app.compress_mime_types.append('application/wasm')
+        """
+        return self.__config['compress_mime_types']
+
+    @property
+    def compress_codecs(self):
+        """Registry of compression codecs.
+
+        Codecs br and zstd are used only when brotli or zstandard modules
+        are installed, gzip and deflate are available every time. Registry
+        is used for dynamic responses compression and for precompressed
+        files from document_root. Each codec has its own statistics.
+
+        .. code:: python
+
+            app.compress_codecs['gzip'].level = 5
+            app.compress_codecs.unregister('deflate')
+            app.compress_codecs.stats()['gzip'].ratio
+        """
+        return self.__codecs
+
     @property
     def json_mime_types(self):
         """Copy of json mime type list.
@@ -571,6 +912,9 @@ class Application():
         """
         name = ':'+name if name[0] != ':' else name
         self.__filters[name] = (regex, converter)
+        # own filter regex could match '/' character
+        self.__segment_filters.discard(name)
+        self.__route_cache.clear()
 
     @deprecated("use before_response instead")
     def before_request(self):
@@ -797,13 +1141,19 @@ class Application():
             converters = tuple((g[0], self.__converter(g[1]))
                                for g in (m.groups()
                                          for m in re_filter.finditer(uri)))
+            segments = self.__segments(uri)
+            if segments is not None:
+                self.__rsegments[re.compile(r_uri, re.U)] = segments
             self.set_regular_route(r_uri, fun, method, converters, uri)
+            if segments is not None and self.__config['auto_check_routes']:
+                self.__check_route(re.compile(r_uri, re.U), method)
         else:
             if uri not in self.__handlers:
                 self.__handlers[uri] = {}
             for val in methods.values():
                 if method & val:
                     self.__handlers[uri][val] = fun
+            self.__route_cache.clear()
 
     def pop_route(self, uri: str, method: int):
         """Pop handler for uri and method from handers table.
@@ -820,6 +1170,7 @@ class Application():
         rval = handlers.pop(method)
         if not handlers:    # is empty
             self.__handlers.pop(uri, None)
+        self.__route_cache.clear()
         return rval
 
     def is_route(self, uri: str):
@@ -851,6 +1202,13 @@ class Application():
         function. Regular expression routes are check with the same ordering,
         as you create internal table of them. First match stops any other
         searching.
+
+        Internally, regular expressions are joined to one alternation for each
+        http method, so the path is matched in one pass. This combined
+        expression is created again with first request after the table of
+        regular routes is changed. Routes with groups created by route or
+        set_route methods are indexed by path segments instead, when only
+        filters which never match '/' character are used.
         """
         def wrapper(fun):
             self.set_regular_route(ruri, fun, method)
@@ -880,6 +1238,8 @@ class Application():
         for val in methods.values():
             if method & val:
                 self.__rhandlers[r_uri][val] = (fun, converters, rule)
+        self.__rrouters = {}
+        self.__route_cache.clear()
 
     def pop_regular_route(self, uri: str, method: int):
         """Pop handler and converters for uri and method from handlers table.
@@ -891,6 +1251,9 @@ class Application():
         rval = handlers.pop(method)
         if not handlers:    # is empty
             self.__rhandlers.pop(r_uri, None)
+            self.__rsegments.pop(r_uri, None)
+        self.__rrouters = {}
+        self.__route_cache.clear()
         return rval
 
     def is_regular_route(self, r_uri):
@@ -898,6 +1261,72 @@ class Application():
         r_uri = re.compile(r_uri, re.U)
         return r_uri in self.__rhandlers
 
+    def __compare_routes(self, method_name: str, method_number: int,
+                         ruri: re.Pattern, others: Iterable[re.Pattern]):
+        """Compare route with others, log and return found problems."""
+        handlers = self.__rhandlers[ruri]
+        if method_number not in handlers or ruri not in self.__rsegments:
+            return []
+        rval = []
+        rule = handlers[method_number][2]
+        for other in others:
+            if method_number not in self.__rhandlers[other] or \
+                    other not in self.__rsegments:
+                continue
+            other_rule = self.__rhandlers[other][method_number][2]
+            kind = compare_segments(self.__rsegments[ruri],
+                                    self.__rsegments[other],
+                                    self.__known_segments)
+            if kind:
+                log.warning("Route %s %s is %s with %s",
+                            method_name, rule, kind, other_rule)
+                rval.append((kind, method_name, rule, other_rule))
+        return rval
+
+    def __check_route(self, ruri: re.Pattern, method: int):
+        """Compare new route with routes set before for each method."""
+        ruris = list(self.__rhandlers)
+        others = ruris[:ruris.index(ruri)]
+        for method_name, method_number in methods.items():
+            if method & method_number:
+                self.__compare_routes(method_name, method_number, ruri,
+                                      others)
+
+    def check_routes(self):
+        """Check regular routes created from routes with groups.
+
+        Returns tuple of (kind, method, rule, other_rule) tuples, where kind
+        is ``conflict`` when rule could never be called, because other_rule
+        with the same groups definition was set before. Kind is
+        ``ambiguous`` when the same path could match both of them, so route
+        ordering decides. Kind is ``possibly ambiguous``, when filters
+        defined by set_filter could match the same path, but that could not
+        be proved. Each record is logged as warning, so it is good idea to
+        call this method after all routes are set, or to set
+        auto_check_routes.
+
+        .. code:: python
+
+            @app.route('/user/<id:int>')
+            def user_detail(req, id):
+                ...
+
+            @app.route('/user/<uid:int>')
+            def user_edit(req, uid):
+                ...
+
+            app.check_routes()
+            # (('conflict', 'GET', '/user/<uid:int>', '/user/<id:int>'),
+            #  ('conflict', 'HEAD', '/user/<uid:int>', '/user/<id:int>'))
+        """
+        rval = []
+        ruris = list(self.__rhandlers)
+        for method_name, method_number in methods.items():
+            for i, ruri in enumerate(ruris):
+                rval.extend(self.__compare_routes(
+                    method_name, method_number, ruri, ruris[:i]))
+        return tuple(rval)
+
     def http_state(self, status_code: int,
                    method: int = METHOD_HEAD | METHOD_GET | METHOD_POST):
         """Wrap function to handle http status codes.
@@ -1038,7 +1467,49 @@ class Application():
         This method was call before end-point route handler.
         """
         for fun in self.__before:
-            fun(req)
+            retval = fun(req)
+            if isawaitable(retval):
+                self.__run_coroutine(req.environ, retval)
+        if self.__before:
+            req.timing.mark('before')
+
+    def __resolve_regular(self, req_path: str, method_number: int):
+        """Return (handler, rule, path_args, args) for regular route or None.
+
+        Resolved routes are stored in route cache if it is enabled. Only
+        immutable values are stored, and new path_args dictionary is
+        created for each call, so requests could not change each other.
+        """
+        key = (req_path, method_number)
+        if self.__route_cache.maxsize:
+            cached = self.__route_cache.get(key)
+            if cached is not None:
+                handler, rule, items, args, dict_type = cached
+                return handler, rule, dict_type(items), args
+
+        ruri, match = self.__regular_router(method_number).match(req_path)
+        if not match:
+            return None
+
+        handler, converters, rule = self.__rhandlers[ruri][method_number]
+        if converters:
+            # create OrderedDict from match inside of dict for
+            # converters applying
+            items = tuple((g, c(v))
+                          for ((g, c), v) in zip(converters, match.groups()))
+            args = tuple(val for _, val in items)
+            dict_type = OrderedDict
+        else:
+            items = tuple(match.groupdict().items())
+            args = match.groups()
+            dict_type = dict
+
+        rule = rule or ruri.pattern
+        if self.__route_cache.maxsize and \
+                all(isinstance(val, IMMUTABLE_TYPES) for val in args):
+            self.__route_cache.set(key, (handler, rule, items, args,
+                                         dict_type))
+        return handler, rule, dict_type(items), args
 
     def handler_from_table(self, req: Request):
         """Call right handler from handlers table (fill with route function).
@@ -1047,6 +1518,15 @@ class Application():
         resp. Document Index is set. Then try to call default handler for right
         method or call handler for status code 404 - not found.
         """
+        return self.__handler_from_table(req, UNRESOLVED)
+
+    def __handler_from_table(self, req: Request, resolved):
+        """Call handler from handlers table with pre-resolved regular route.
+
+        Regular route is resolved here, when resolved is UNRESOLVED.
+        Exception from resolving is raised here, so it is handled as any
+        other handler error.
+        """
         # pylint: disable=too-many-return-statements
         # static routes
 
@@ -1062,25 +1542,17 @@ class Application():
             raise HTTPException(HTTP_METHOD_NOT_ALLOWED)
 
         # regular expression
-        for ruri in self.__rhandlers:
-            match = ruri.match(req.path)
-            if match and req.method_number in self.__rhandlers[ruri]:
-                handler, converters, rule = \
-                    self.__rhandlers[ruri][req.method_number]
-                req.uri_rule = rule or ruri.pattern
-                req.uri_handler = handler
-                if converters:
-                    # create OrderedDict from match inside of dict for
-                    # converters applying
-                    req.path_args = OrderedDict(
-                        (g, c(v))for ((g, c), v) in zip(converters,
-                                                        match.groups()))
-                    self.handler_from_before(req)   # call before handlers now
-                    return handler(req, *req.path_args.values())
-
-                req.path_args = match.groupdict()
-                self.handler_from_before(req)   # call before handlers now
-                return handler(req, *match.groups())
+        if resolved is UNRESOLVED:
+            resolved = self.__resolve_regular(req.path, req.method_number)
+        elif isinstance(resolved, Exception):
+            raise resolved
+        if resolved:
+            handler, rule, path_args, args = resolved
+            req.uri_rule = rule
+            req.uri_handler = handler
+            req.path_args = path_args
+            self.handler_from_before(req)   # call before handlers now
+            return handler(req, *args)
 
         # try file or index
         if req.document_root and \
@@ -1088,29 +1560,48 @@ class Application():
             rfile = "%s%s" % (req.document_root,
                               path.normpath("%s" % req.path))
 
-            if not path.exists(rfile):
+            info = self.__stat_cache.get(rfile)
+            if not info.exists:
                 if req.debug and req.path == '/debug-info':  # work if debug
                     req.uri_rule = '/debug-info'
                     req.uri_handler = debug_info
                     self.handler_from_before(req)  # call before handlers now
                     return debug_info(req, self)
+                if req.debug and req.path == '/debug-info/profile':
+                    req.uri_rule = '/debug-info/profile'
+                    req.uri_handler = profile_info
+                    self.handler_from_before(req)  # call before handlers now
+                    return profile_info(req, self)
                 return self.handler_from_default(req)         # try default
 
             # return file
-            if path.isfile(rfile) and access(rfile, R_OK):
+            if info.is_file and info.readable:
                 req.uri_rule = '/*'
                 self.handler_from_before(req)      # call before handlers now
                 log.info("Return file: %s", req.path)
-                return FileResponse(rfile)
+                content_type, headers = None, None
+                try:
+                    if req.precompressed:
+                        info, content_type, headers = select_precompressed(
+                            info, req.accept_encoding, self.__stat_cache.get,
+                            self.__codecs.suffixes())
+                    asset = self.__assets.get(info)
+                    if asset is not None:
+                        return AssetResponse(asset, content_type, headers)
+                    return StaticFileResponse(info, content_type, headers)
+                except OSError as err:             # file was changed
+                    self.__stat_cache.pop(info.path)
+                    self.__assets.pop(info.path)
+                    log.error("Could not open file %s: %s", info.path, err)
+                    raise HTTPException(HTTP_NOT_FOUND) from err
 
             # return directory index
-            if req.document_index and path.isdir(rfile) \
-                    and access(rfile, R_OK):
+            if req.document_index and info.is_dir and info.readable:
                 log.info("Return directory: %s", req.path)
                 req.uri_rule = '/*'
                 req.uri_handler = directory_index
                 self.handler_from_before(req)      # call before handlers now
-                return directory_index(req, rfile)
+                return directory_index(req, rfile, self.__directory_cache)
             self.handler_from_before(req)      # call before handlers now
             raise HTTPException(HTTP_FORBIDDEN)
         # req.document_root
@@ -1120,76 +1611,198 @@ class Application():
             req.uri_handler = debug_info
             self.handler_from_before(req)          # call before handlers now
             return debug_info(req, self)
+        if req.debug and req.path == '/debug-info/profile':
+            req.uri_rule = '/debug-info/profile'
+            req.uri_handler = profile_info
+            self.handler_from_before(req)          # call before handlers now
+            return profile_info(req, self)
 
         return self.handler_from_default(req)
 
-    def __request__(self, env, start_response):
-        """Create Request instance and return wsgi response.
+    def __error_response(self, env, request, err):
+        """Return request and response for exception from handler.
 
-        This method create Request object, call handlers from
-        Application.before, uri handler (handler_from_table), default handler
-        (Application.defaults) or error handler (Application.state_from_table),
-        and handlers from Application.after.
+        Response is None, when connection was broken.
         """
-        # pylint: disable=method-hidden,too-many-branches
-        env['REQUEST_STARTTIME'] = time()
-        request = None
-
-        try:
-            request = Request(env, self)
-            args = self.handler_from_table(request)
-            response = to_response(args)
-        except HTTPException as http_err:
+        # pylint: disable=too-many-return-statements
+        if isinstance(err, HTTPException):
             if request is None:
                 request = SimpleRequest(env, self)
 
-            response = http_err.make_response()
+            response = err.make_response()
             if not response:
-                status_code = http_err.args[0]
-                kwargs = http_err.args[1]
+                status_code = err.args[0]
+                kwargs = err.args[1]
                 response = to_response(
                         self.state_from_table(request, status_code, **kwargs))
-        except (ConnectionError, SystemExit) as err:
+            return request, response
+
+        if isinstance(err, (ConnectionError, SystemExit)):
             log.warning(str(err))
             log.warning('   ***   You should ignore next error   ***')
-            return ()
-        except ResponseError:
+            return request, None
+
+        if isinstance(err, ResponseError):
             log.error("Bad returned value from %s", request.uri_handler)
             try:
-                response = to_response(self.state_from_table(request, 500))
+                return request, to_response(
+                    self.state_from_table(request, 500))
             except Exception:  # pylint: disable=broad-except
                 log.error("Bad returned value from %s", request.error_handler)
-                response = internal_server_error(request)
+                return request, internal_server_error(request)
 
-        except BaseException as err:  # pylint: disable=broad-except
-            if request is None:
-                log.critical(str(err))
-                request = SimpleRequest(env, self)
+        if request is None:
+            log.critical(str(err))
+            request = SimpleRequest(env, self)
 
-            try:
-                response = self.error_from_table(request, err)
-                if not response:
-                    response = to_response(self.state_from_table(request, 500))
-            except Exception:  # pylint: disable=broad-except
-                log.error("Bad returned value from %s", request.error_handler)
-                response = internal_server_error(request)
+        try:
+            response = self.error_from_table(request, err)
+            if not response:
+                response = to_response(self.state_from_table(request, 500))
+        except Exception:  # pylint: disable=broad-except
+            log.error("Bad returned value from %s", request.error_handler)
+            response = internal_server_error(request)
+        return request, response
+
+    def __background_error(self, request, err):
+        """Pass exception from background task to error handlers.
+
+        It is called from except block, so default handler of internal
+        server error logs the traceback. Returned response is not used.
+        """
+        try:
+            if not self.error_from_table(request, err):
+                self.state_from_table(request, 500)
+        except Exception:  # pylint: disable=broad-except
+            log.exception("Error handler of background task %r failed", err)
 
+    @staticmethod
+    def __run_coroutine(env, coroutine):
+        """Run coroutine returned by handler and return its result.
+
+        Coroutine is run in ASGI event loop, or in background event loop
+        of the worker under WSGI.
+        """
+        loop = env.get('poorwsgi.loop')
+        if loop is None:
+            return event_loop.run(coroutine)
+        try:
+            running = get_running_loop()
+        except RuntimeError:    # called from thread pool
+            running = None
+        if loop is running:
+            coroutine.close()
+            raise RuntimeError("Coroutine can't be awaited from sync code "
+                               "in the event loop.")
+        return run_coroutine_threadsafe(coroutine, loop).result()
+
+    def __finish_request(self, env, request, response, start_response):
+        """Call after response handlers, and return wsgi response."""
+        # pylint: disable=too-many-branches
+        timing = request.timing
         __fn = None
         try:    # call post_process handler
             for fun in self.__after:
                 __fn = fun
-                response = to_response(fun(request, response))
+                result = fun(request, response)
+                if isawaitable(result):
+                    result = self.__run_coroutine(env, result)
+                response = to_response(result)
         except BaseException as err:  # pylint: disable=broad-except
             log.error("Handler %s from %s returns invalid data or crashed",
                       __fn, __fn.__module__)
             response = self.error_from_table(request, err)
             if not response:
                 response = to_response(self.state_from_table(request, 500))
+        if self.__after:
+            timing.mark('after')
 
         if isinstance(response, FileObjResponse) and \
-                "wsgi.file_wrapper" in env:     # need working fileno method
-            return env['wsgi.file_wrapper'](response(start_response))
-        return response(start_response)         # return bytes generator
+                isinstance(request, Request):
+            response = make_conditional(request, response)
+        if isinstance(response, FileObjResponse):
+            if isinstance(request, Request) and request.range and \
+                    request.method_number == METHOD_GET:
+                response.make_partial(request.range,
+                                      request.headers.get('If-Range', ''))
+        elif isinstance(request, Request):
+            response = compress_response(
+                request, response, self.__config['compress'],
+                self.__config['compress_min_size'],
+                self.__config['compress_mime_types'], self.__codecs)
+        timing.mark('response')
+        if self.__config['server_timing'] and \
+                not isinstance(response, NoContentResponse):
+            response.add_header('Server-Timing', timing.header())
+
+        retval = response(start_response)       # return bytes generator
+        metrics = self.__metrics
+        tasks = request.background_tasks
+        if metrics is not None or tasks:
+            def finish(timed):
+                metrics.record(
+                    request.uri_rule, request.method,
+                    response.status_code, timing.total,
+                    max(getattr(request, 'content_length', 0), 0),
+                    timed.sent or response.content_length,
+                    timing.durations())
+
+            def submit(timed):
+                # pylint: disable=unused-argument
+                on_error = partial(self.__background_error, request)
+                for task in tasks:
+                    self.__background_tasks.submit(*task, on_error=on_error)
+
+            # tasks are submitted when response is closed by server
+            callbacks = (finish if metrics is not None else None,
+                         submit if tasks else None)
+            if isinstance(response, FileObjResponse) and \
+                    hasattr(retval, 'read'):
+                retval = TimedFile(retval, timing, *callbacks)
+            elif hasattr(retval, '__aiter__'):
+                retval = TimedAsyncIterable(retval, timing, *callbacks)
+            else:
+                retval = TimedIterable(retval, timing, *callbacks)
+        if isinstance(response, FileObjResponse) and \
+                "wsgi.file_wrapper" in env and hasattr(retval, 'read'):
+            # need working fileno method
+            retval = env['wsgi.file_wrapper'](retval)
+        return retval
+
+    def __request__(self, env, start_response):
+        """Create Request instance and return wsgi response.
+
+        This method create Request object, call handlers from
+        Application.before, uri handler (handler_from_table), default handler
+        (Application.defaults) or error handler (Application.state_from_table),
+        and handlers from Application.after.
+        """
+        # pylint: disable=method-hidden
+        env['REQUEST_STARTTIME'] = time()
+        env['poorwsgi.timing'] = timing = Timing()
+        request = None
+        profiler = self.__profiler
+        profile = profiler.start() if profiler else None
+
+        try:
+            if 'poorwsgi.handler' not in env:
+                self.__resolve(env)
+            request = Request(env, self)
+            args = self.__handler_from_table(
+                request, env.pop('poorwsgi.route', UNRESOLVED))
+            if isawaitable(args):
+                args = self.__run_coroutine(env, args)
+            response = to_response(args)
+        except BaseException as err:  # pylint: disable=broad-except
+            request, response = self.__error_response(env, request, err)
+            if response is None:
+                return ()
+        finally:
+            if profile is not None:
+                profiler.stop(profile, getattr(request, 'uri_rule', None))
+        timing.mark('handler')
+
+        return self.__finish_request(env, request, response, start_response)
     # enddef
 
     def __call__(self, env, start_response):
@@ -1199,6 +1812,138 @@ class Application():
         """
         return self.__request__(env, start_response)
 
+    def __resolve(self, env):
+        """Store handler of static or regular route to environ.
+
+        Regular route is resolved only once, its result or exception is
+        stored to environ for handler_from_table. Handler is used by Request
+        to skip parsing body of json_stream route.
+        """
+        try:
+            path_ = env['PATH_INFO'].encode('iso-8859-1').decode()
+        except (KeyError, AttributeError, UnicodeDecodeError):
+            return None     # errors are handled by Request
+        method_number = methods.get(env.get('REQUEST_METHOD'),
+                                    methods['GET'])
+        if path_ in self.__handlers:
+            handler = self.__handlers[path_].get(method_number)
+        else:
+            try:
+                resolved = self.__resolve_regular(path_, method_number)
+            except Exception as err:  # pylint: disable=broad-except
+                resolved = err
+            env['poorwsgi.route'] = resolved
+            handler = resolved[0] if isinstance(resolved, tuple) else None
+        env['poorwsgi.handler'] = handler
+        return handler
+
+    def __is_async(self, env) -> bool:
+        """Return True, if request is routed to coroutine function.
+
+        Coroutine hooks are awaited from thread pool, so requests are not
+        processed in event loop, when there are some.
+        """
+        if any(iscoroutinefunction(fun)
+               for fun in self.__before + self.__after):
+            return False
+        return iscoroutinefunction(self.__resolve(env))
+
+    async def __async_request(self, env, start_response):
+        """Asynchronous version of __request__ for coroutine handlers."""
+        env['REQUEST_STARTTIME'] = time()
+        env['poorwsgi.timing'] = timing = Timing()
+        request = None
+        profiler = self.__profiler
+        profile = profiler.start() if profiler else None
+
+        try:
+            request = Request(env, self)
+            args = self.__handler_from_table(
+                request, env.pop('poorwsgi.route', UNRESOLVED))
+            if isawaitable(args):
+                if profile is not None:
+                    args = await profile_awaitable(profile, args)
+                else:
+                    args = await args
+            response = to_response(args)
+        except CancelledError:
+            raise
+        except BaseException as err:  # pylint: disable=broad-except
+            request, response = self.__error_response(env, request, err)
+            if response is None:
+                return ()
+        finally:
+            if profile is not None:
+                profiler.stop(profile, getattr(request, 'uri_rule', None))
+        timing.mark('handler')
+
+        return self.__finish_request(env, request, response, start_response)
+
+    async def __lifespan(self, receive, send):
+        """Handle ASGI lifespan protocol."""
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                if self.__thread_pool is not None:
+                    self.__thread_pool.shutdown(wait=False)
+                    self.__thread_pool = None
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def asgi(self, scope, receive, send):
+        """ASGI application callable.
+
+        The same routing tables are used as in WSGI. Coroutine handlers
+        (``async def``) are called in event loop, and request body is read
+        before Request is created. Other handlers are called in thread pool
+        with thread_pool_size workers, and request body is streamed to them
+        from ASGI receive.
+
+        .. code:: sh
+
+            $~ uvicorn simple:app.asgi
+        """
+        if scope['type'] == 'lifespan':
+            await self.__lifespan(receive, send)
+            return
+        if scope['type'] != 'http':
+            raise NotImplementedError(
+                "ASGI scope type %s is not supported" % scope['type'])
+
+        loop = get_running_loop()
+        if self.__thread_pool is None:
+            self.__thread_pool = ThreadPoolExecutor(
+                self.__config['thread_pool_size'], 'poorwsgi')
+        pool = self.__thread_pool
+
+        async def run(func, *args):
+            return await loop.run_in_executor(pool, func, *args)
+
+        started = []
+
+        def start_response(status, headers, exc_info=None):
+            # pylint: disable=unused-argument
+            started[:] = (status, headers)
+
+        env = environ_from_scope(scope)
+        env['poorwsgi.loop'] = loop
+        if self.__is_async(env):
+            try:
+                env['wsgi.input'] = BytesIO(await read_body(receive))
+            except ConnectionError as err:
+                log.warning(str(err))
+                return
+            retval = await self.__async_request(env, start_response)
+        else:
+            env['wsgi.input'] = AsgiInput(receive, loop)
+            retval = await run(self.__request__, env, start_response)
+
+        if not started:     # connection was broken
+            return
+        await send_response(send, started[0], started[1], retval, run)
+
     def __profile_request__(self, env, start_response):
         """Profiler version of __request__.
 
@@ -1247,6 +1992,95 @@ class Application():
         """Remove profiler from application."""
         self.__request__ = self.__original_request__
 
+    @property
+    def sampling_profiler(self):
+        """Sampling profiler, which aggregates profiles of requests.
+
+        Only a sample of requests is profiled, and profiles are aggregated
+        for each uri_rule, so it is much cheaper than set_profile. When
+        debug is enabled, aggregated profile is available on
+        ``/debug-info/profile`` page. Default value is None.
+
+        .. code:: python
+
+            from poorwsgi.profiler import SamplingProfiler
+
+            app.sampling_profiler = SamplingProfiler(every=100)
+        """
+        return self.__profiler
+
+    @sampling_profiler.setter
+    def sampling_profiler(self, value):
+        self.__profiler = value
+
+    @property
+    def metrics(self):
+        """Request metrics for each uri_rule and method.
+
+        Count of requests, status classes, latency histogram, count of
+        transferred bytes and time of request phases are recorded for each
+        request, when it is set. Request is recorded, when its body is sent
+        to WSGI server. Default value is None.
+
+        .. code:: python
+
+            from poorwsgi.metrics import Metrics
+
+            app.metrics = Metrics()
+            app.set_route('/metrics', app.metrics.handler)
+        """
+        return self.__metrics
+
+    @metrics.setter
+    def metrics(self, value):
+        self.__metrics = value
+
+    @property
+    def background_tasks(self):
+        """Pool of worker threads for background tasks of requests.
+
+        Tasks added by Request.add_background_task are called in it, when
+        the response is sent. Default pool has 4 workers and queue for 1024
+        tasks. Queue depth and count of tasks are part of metrics.
+
+        .. code:: python
+
+            from poorwsgi.background import BackgroundTasks
+
+            app.background_tasks = BackgroundTasks(workers=8, queue_size=100)
+        """
+        return self.__background_tasks
+
+    @background_tasks.setter
+    def background_tasks(self, value):
+        self.__background_tasks = value
+
+    @property
+    def thread_pool_size(self):
+        """Count of worker threads for not coroutine handlers under ASGI.
+
+        It must be set before the first ASGI request. Default value is 16.
+        """
+        return self.__config['thread_pool_size']
+
+    @thread_pool_size.setter
+    def thread_pool_size(self, value: int):
+        self.__config['thread_pool_size'] = int(value)
+
+    @property
+    def server_timing(self):
+        """Send durations of request phases in Server-Timing header.
+
+        Phases are recorded in request's timing object every time. Emission
+        of the response body comes after headers are sent, so it is not in
+        the header. Default value is False.
+        """
+        return self.__config['server_timing']
+
+    @server_timing.setter
+    def server_timing(self, value: Union[int, bool]):
+        self.__config['server_timing'] = bool(value)
+
     @staticmethod
     def get_options():
         """Returns dictionary with application variables from system
@@ -223,5 +223,6 @@ setup(
               'test': PyTest},
     tests_require=['pytest', 'requests', 'openapi-core', 'simplejson'],
     extras_require={
-            'JSONGeneratorResponse': ['simplejson']}
+            'JSONGeneratorResponse': ['simplejson'],
+            'compression': ['brotli', 'zstandard']}
 )
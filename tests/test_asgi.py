@@ -0,0 +1,303 @@
+"""Tests for ASGI support."""
+from asyncio import Event, gather, get_running_loop, run, sleep
+from functools import wraps
+from json import loads
+from threading import get_ident
+
+from pytest import fixture, raises
+
+from poorwsgi import Application
+from poorwsgi.asgi import AsgiInput, environ_from_scope
+from poorwsgi.response import FileResponse, GeneratorResponse, \
+    JSONResponse, HTTPException
+from poorwsgi.state import METHOD_POST
+
+# pylint: disable=missing-function-docstring
+# pylint: disable=redefined-outer-name
+
+
+@fixture(scope='session')
+def app():
+    app = Application('test_asgi')
+    app.threads = {}
+
+    @app.route('/sync')
+    def sync_handler(req):
+        app.threads['sync'] = get_ident()
+        return 'sync'
+
+    @app.route('/async/<value:int>')
+    async def async_handler(req, value):
+        app.threads['async'] = get_ident()
+        await sleep(0)
+        return JSONResponse(value=value, args=dict(req.args))
+
+    @app.route('/json', method=METHOD_POST)
+    def json_handler(req):
+        return JSONResponse(data=req.json)
+
+    @app.route('/async-json', method=METHOD_POST)
+    async def async_json_handler(req):
+        return JSONResponse(data=req.json)
+
+    @app.route('/generator')
+    def generator(req):
+        return GeneratorResponse(iter((b'first', b'second')))
+
+    @app.route('/async-generator')
+    async def async_generator(req):
+        async def chunks():
+            for chunk in (b'first', b'second'):
+                await sleep(0)
+                yield chunk
+        return GeneratorResponse(chunks())
+
+    @app.route('/file')
+    def file(req):
+        return FileResponse(__file__)
+
+    def decorator(fun):
+        @wraps(fun)
+        def wrapper(req):
+            return fun(req)     # returns coroutine from sync function
+        return wrapper
+
+    @app.route('/decorated')
+    @decorator
+    async def decorated(req):
+        await sleep(0)
+        return 'decorated'
+
+    @app.route('/poll')
+    async def poll(req):
+        await app.event.wait()
+        return 'done'
+
+    @app.route('/forbidden')
+    async def forbidden(req):
+        raise HTTPException(403)
+
+    @app.route('/error')
+    async def error(req):
+        raise RuntimeError("error")
+
+    return app
+
+
+def scope(path, method='GET', query=b'', headers=()):
+    return {'type': 'http', 'method': method, 'path': path,
+            'query_string': query, 'headers': list(headers),
+            'server': ('localhost', 8080), 'client': ('127.0.0.1', 1234)}
+
+
+def call(app, scope_, chunks=(b'',)):
+    """Call ASGI application and return status, headers and body."""
+    messages = [{'type': 'http.request', 'body': chunk,
+                 'more_body': i < len(chunks) - 1}
+                for i, chunk in enumerate(chunks)]
+    sent = []
+
+    async def receive():
+        if messages:
+            return messages.pop(0)
+        await sleep(10)
+        return {'type': 'http.disconnect'}
+
+    async def send(message):
+        sent.append(message)
+
+    run(app.asgi(scope_, receive, send))
+    assert sent[0]['type'] == 'http.response.start'
+    assert not sent[-1]['more_body']
+    body = b''.join(message['body'] for message in sent[1:])
+    return sent[0]['status'], dict(sent[0]['headers']), body
+
+
+class TestAsgiInput:
+    """Tests for AsgiInput class."""
+    @staticmethod
+    def read(chunks, callback):
+        messages = [{'type': 'http.request', 'body': chunk,
+                     'more_body': i < len(chunks) - 1}
+                    for i, chunk in enumerate(chunks)]
+
+        async def receive():
+            return messages.pop(0)
+
+        async def main():
+            loop = get_running_loop()
+            return await loop.run_in_executor(
+                None, callback, AsgiInput(receive, loop))
+        return run(main())
+
+    def test_read(self):
+        assert self.read((b'abc', b'def', b'g'), lambda inp: (
+            inp.read(2), inp.read(3), inp.read())) == (b'ab', b'cde', b'fg')
+
+    def test_readline(self):
+        assert self.read((b'a\nb', b'c\n', b'd'), lambda inp: (
+            inp.readline(), inp.readline(), inp.readline(),
+            inp.readline())) == (b'a\n', b'bc\n', b'd', b'')
+        assert self.read((b'abcd\n',), lambda inp: (
+            inp.readline(2), list(inp))) == (b'ab', [b'cd\n'])
+
+    def test_disconnect(self):
+        async def receive():
+            return {'type': 'http.disconnect'}
+
+        async def main():
+            loop = get_running_loop()
+            inp = AsgiInput(receive, loop)
+            await loop.run_in_executor(None, inp.read)
+
+        with raises(ConnectionError):
+            run(main())
+
+
+class TestApplication:
+    """Tests for Application.asgi."""
+    def test_sync(self, app):
+        status, headers, body = call(app, scope('/sync'))
+        assert status == 200
+        assert headers[b'content-type'] == b'text/html; charset=utf-8'
+        assert body == b'sync'
+        assert app.threads['sync'] != get_ident()   # thread pool
+
+    def test_async(self, app):
+        status, _, body = call(app, scope('/async/42', query=b'a=b'))
+        assert status == 200
+        assert loads(body) == {'value': 42, 'args': {'a': 'b'}}
+        assert app.threads['async'] == get_ident()  # event loop
+
+    def test_body(self, app):
+        headers = ((b'content-type', b'application/json'),
+                   (b'content-length', b'16'))
+        for path in ('/json', '/async-json'):
+            status, _, body = call(app, scope(path, 'POST', headers=headers),
+                                   (b'{"key": ', b'"value"}'))
+            assert status == 200
+            assert loads(body) == {'data': {'key': 'value'}}
+
+    def test_generator(self, app):
+        for path in ('/generator', '/async-generator'):
+            status, headers, body = call(app, scope(path))
+            assert status == 200
+            assert b'content-length' not in headers
+            assert body == b'firstsecond'
+
+    def test_file(self, app):
+        status, headers, body = call(app, scope('/file'))
+        assert status == 200
+        with open(__file__, 'rb') as file:
+            assert body == file.read()
+        assert int(headers[b'content-length']) == len(body)
+
+    def test_decorated(self, app):
+        assert call(app, scope('/decorated'))[2] == b'decorated'
+
+    def test_long_poll(self, app):
+        async def main():
+            app.event = Event()
+            sent = []
+
+            async def receive():
+                return {'type': 'http.request', 'body': b''}
+
+            async def send(message):
+                sent.append(message)
+
+            tasks = gather(*(app.asgi(scope('/poll'), receive, send)
+                             for _ in range(200)))
+            await sleep(0.01)
+            assert not sent     # all requests are waiting in event loop
+            app.event.set()
+            await tasks
+            return sent
+
+        sent = run(main())
+        assert sum(1 for msg in sent if msg.get('body') == b'done') == 200
+
+    def test_errors(self, app):
+        assert call(app, scope('/forbidden'))[0] == 403
+        assert call(app, scope('/error'))[0] == 500
+        assert call(app, scope('/not-found'))[0] == 404
+
+    def test_lifespan(self, app):
+        messages = [{'type': 'lifespan.startup'},
+                    {'type': 'lifespan.shutdown'}]
+        sent = []
+
+        async def receive():
+            return messages.pop(0)
+
+        async def send(message):
+            sent.append(message['type'])
+
+        run(app.asgi({'type': 'lifespan'}, receive, send))
+        assert sent == ['lifespan.startup.complete',
+                        'lifespan.shutdown.complete']
+
+    def test_unsupported(self, app):
+        async def receive():
+            return {}
+
+        with raises(NotImplementedError):
+            run(app.asgi({'type': 'websocket'}, receive, receive))
+
+
+def test_route_resolved_once():
+    app = Application('test_asgi_resolved_once')
+    app.route_cache_size = 0
+    calls = []
+
+    def convert(value):
+        calls.append(value)
+        return int(value)
+
+    app.set_filter('num', r'\d+', convert)
+
+    @app.route('/async/<num:num>')
+    async def async_handler(req, num):
+        return str(num)
+
+    @app.route('/sync/<num:num>')
+    def sync_handler(req, num):
+        return str(num)
+
+    assert call(app, scope('/async/1'))[2] == b'1'
+    assert call(app, scope('/sync/2'))[2] == b'2'
+    assert calls == ['1', '2']
+
+
+def test_buffered_background():
+    """Buffered response wrapped for background tasks is sent at once."""
+    app = Application('test_asgi_buffered')
+    done = []
+
+    @app.route('/buffered')
+    def buffered(req):
+        req.add_background_task(done.append, 'task')
+        return 'x' * 10000
+
+    sent = []
+
+    async def receive():
+        return {'type': 'http.request', 'body': b''}
+
+    async def send(message):
+        sent.append(message)
+
+    run(app.asgi(scope('/buffered'), receive, send))
+    app.background_tasks.join()
+    assert len(sent) == 2
+    assert sent[1]['body'] == b'x' * 10000
+    assert not sent[1]['more_body']
+    assert done == ['task']
+
+
+def test_environ():
+    env = environ_from_scope(scope('/páth', headers=(
+        (b'cookie', b'a=1'), (b'cookie', b'b=2'))))
+    assert env['PATH_INFO'].encode('iso-8859-1').decode() == '/páth'
+    assert env['HTTP_COOKIE'] == 'a=1; b=2'
+    assert env['SERVER_PORT'] == '8080'
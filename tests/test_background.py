@@ -0,0 +1,157 @@
+"""Tests for background tasks."""
+from asyncio import sleep
+from threading import Event, get_ident
+
+from pytest import fixture
+
+from poorwsgi import Application
+from poorwsgi.background import BackgroundTasks
+from poorwsgi.metrics import Metrics
+from poorwsgi.response import FileResponse, GeneratorResponse
+
+# pylint: disable=missing-function-docstring
+# pylint: disable=redefined-outer-name
+
+
+@fixture(scope='session')
+def app():
+    app = Application('test_background')
+    app.metrics = Metrics()
+    app.set_route('/metrics', app.metrics.handler)
+    app.done = []
+    app.failures = []
+
+    @app.route('/task')
+    def task(req):
+        req.add_background_task(app.done.append, 'task')
+        return 'task'
+
+    @app.route('/stream')
+    def stream(req):
+        req.add_background_task(app.done.append, 'stream')
+        return GeneratorResponse(iter((b'first', b'second')))
+
+    @app.route('/file')
+    def file(req):
+        req.add_background_task(app.done.append, 'file')
+        return FileResponse(__file__)
+
+    async def coroutine(value):
+        await sleep(0)
+        app.done.append(value)
+
+    @app.route('/coroutine')
+    def async_task(req):
+        req.add_background_task(coroutine, value='coroutine')
+        return 'coroutine'
+
+    def failing():
+        raise RuntimeError("error")
+
+    @app.route('/error')
+    def error(req):
+        req.add_background_task(failing)
+        return 'error'
+
+    @app.error_handler(RuntimeError)
+    def runtime_error(req, error):
+        app.failures.append((req.path, str(error)))
+        return 'runtime error', 500
+
+    return app
+
+
+class TestBackgroundTasks:
+    """Tests for BackgroundTasks class."""
+    def test_submit(self):
+        tasks = BackgroundTasks(workers=2)
+        threads = []
+        tasks.submit(lambda: threads.append(get_ident()))
+        tasks.join()
+        assert threads[0] != get_ident()
+        assert tasks.completed == 1
+        tasks.stop()
+
+    def test_failed(self):
+        tasks = BackgroundTasks(workers=1)
+        tasks.submit(int, ('x',))
+        tasks.join()
+        assert (tasks.completed, tasks.failed) == (0, 1)
+        errors = []
+        tasks.submit(int, ('x',), on_error=errors.append)
+        tasks.join()
+        assert isinstance(errors[0], ValueError)
+        tasks.stop()
+
+    def test_overflow(self):
+        tasks = BackgroundTasks(workers=1, queue_size=1)
+        started, event = Event(), Event()
+        done = []
+
+        def block():
+            started.set()
+            event.wait()
+
+        tasks.submit(block)                     # blocks the worker
+        started.wait()
+        tasks.submit(done.append, ('queued',))
+        tasks.submit(done.append, ('dropped',))     # queue is full
+        assert not done
+        assert tasks.dropped == 1
+        assert tasks.max_depth >= 1
+        event.set()
+        tasks.join()
+        assert done == ['queued']
+        assert tasks.depth == 0
+        tasks.stop()
+
+    def test_stop(self):
+        tasks = BackgroundTasks(workers=1)
+        tasks.stop()    # not started
+        done = []
+        tasks.submit(done.append, (1,))
+        tasks.stop()
+        assert done == [1]
+
+
+class TestApplication:
+    """Tests for background tasks of requests."""
+    @staticmethod
+    def start_response(status, headers):
+        TestApplication.status = status
+
+    @staticmethod
+    def env(path):
+        return {'PATH_INFO': path, 'REQUEST_METHOD': 'GET',
+                'SERVER_NAME': 'localhost', 'wsgi.errors': None}
+
+    def test_after_close(self, app):
+        for path in ('/task', '/stream', '/file'):
+            retval = app(self.env(path), self.start_response)
+            app.background_tasks.join()
+            assert path[1:] not in app.done  # it waits for the body
+            b''.join(retval)
+            retval.close()
+            app.background_tasks.join()
+            assert app.done[-1] == path[1:]
+
+    def test_coroutine(self, app):
+        app(self.env('/coroutine'), self.start_response).close()
+        app.background_tasks.join()
+        assert app.done[-1] == 'coroutine'
+
+    def test_error(self, app):
+        retval = app(self.env('/error'), self.start_response)
+        assert b''.join(retval) == b'error'
+        retval.close()
+        app.background_tasks.join()
+        assert self.status == '200 OK'
+        assert app.background_tasks.failed == 1
+        assert app.failures == [('/error', 'error')]
+
+    def test_metrics(self, app):
+        retval = app(self.env('/metrics'), self.start_response)
+        lines = b''.join(retval).decode().splitlines()
+        retval.close()
+        assert 'poorwsgi_background_queue_depth 0' in lines
+        assert 'poorwsgi_background_tasks_total{status="failed"} 1' in lines
@@ -0,0 +1,27 @@
+"""Smoke tests for benchmark suite."""
+from argparse import Namespace
+
+from benchmarks import bench_auth, bench_json, bench_metrics, \
+    bench_request, bench_response, bench_routing
+from benchmarks.__main__ import check
+from benchmarks.support import BENCHMARKS, measure_memory
+
+# pylint: disable=missing-function-docstring
+# pylint: disable=unused-import
+
+ARGS = Namespace(threshold=0.3, memory_threshold=0.1)
+
+
+def test_operations():
+    for name, setup in BENCHMARKS.items():
+        operation = setup()
+        peak, blocks = measure_memory(operation, number=1)
+        assert peak > 0, name
+        assert blocks >= 0, name
+
+
+def test_check():
+    base = {'ops': 1000.0, 'peak': 10000}
+    assert check({'ops': 800.0, 'peak': 11000}, base, ARGS) == []
+    errors = check({'ops': 600.0, 'peak': 20000}, base, ARGS)
+    assert errors == ['ops/sec 600 < 1000', 'peak memory 20000 > 10000 B']
@@ -0,0 +1,229 @@
+"""Tests for response compression."""
+from gzip import decompress
+from zlib import decompressobj
+from os import urandom
+
+from pytest import fixture, raises
+
+from poorwsgi import Application
+from poorwsgi.compress import compress_response, Codec, CodecRegistry, \
+    ZlibCompressor, default_codecs, zstd_dictionary_codec, ZSTD
+from poorwsgi.headers import Headers
+from poorwsgi.response import Response, JSONResponse, GeneratorResponse, \
+    FileObjResponse, NoContentResponse
+from poorwsgi.state import METHOD_GET
+
+# pylint: disable=missing-function-docstring
+# pylint: disable=redefined-outer-name
+# pylint: disable=too-few-public-methods
+
+DATA = b'Poor WSGI for Python. ' * 100
+
+
+class Req:
+    """Request mock"""
+    def __init__(self, accept_encoding='gzip'):
+        self.headers = Headers({'Accept-Encoding': accept_encoding})
+        self.method_number = METHOD_GET
+        self.accept_encoding = tuple(
+            (it.strip(), 1.0) for it in accept_encoding.split(',') if it)
+
+
+@fixture(scope='session')
+def app():
+    app = Application('test_compress')
+    app.compress = True
+
+    @app.route('/text')
+    def text(req):
+        return DATA
+
+    @app.route('/generator')
+    def generator(req):
+        def chunks():
+            yield b'first'
+            yield b'second'
+        return chunks()
+
+    @app.route('/disabled')
+    def disabled(req):
+        res = Response(DATA)
+        res.compress = False
+        return res
+
+    return app
+
+
+class TestCompressResponse:
+    """Tests for compress_response function."""
+    def test_disabled(self):
+        res = Response(DATA)
+        assert compress_response(Req(), res) is res
+        res.compress = True
+        assert compress_response(Req(), res) is not res
+
+    def test_response(self):
+        res = JSONResponse(data=['value'] * 500, headers={'ETag': '"v1"'})
+        compressed = compress_response(Req(), res, True)
+        assert compressed.headers['Content-Encoding'] == 'gzip'
+        assert compressed.headers['Vary'] == 'Accept-Encoding'
+        assert compressed.headers['ETag'] == 'W/"v1"'
+        assert compressed.content_length < res.content_length
+        assert decompress(compressed.data) == res.data
+
+    def test_deflate(self):
+        compressed = compress_response(Req('deflate'), Response(DATA), True)
+        assert compressed.headers['Content-Encoding'] == 'deflate'
+        assert decompressobj().decompress(compressed.data) == DATA
+
+    def test_not_accepted(self):
+        res = Response(DATA)
+        assert compress_response(Req(''), res, True) is res
+        assert res.headers['Vary'] == 'Accept-Encoding'
+
+    def test_skipped(self):
+        small = Response(b'small')
+        assert compress_response(Req(), small, True) is small
+        png = Response(DATA, content_type='image/png')
+        assert compress_response(Req(), png, True) is png
+        no_transform = Response(DATA,
+                                headers={'Cache-Control': 'no-transform'})
+        assert compress_response(Req(), no_transform, True) is no_transform
+        no_content = NoContentResponse()
+        assert compress_response(Req(), no_content, True) is no_content
+        file_obj = FileObjResponse(open(__file__, 'rb'))
+        assert compress_response(Req(), file_obj, True) is file_obj
+        file_obj.close()
+
+    def test_vary(self):
+        res = Response(DATA, headers={'Vary': 'Cookie'})
+        compress_response(Req(), res, True)
+        assert res.headers['Vary'] == 'Cookie, Accept-Encoding'
+
+    def test_generator(self):
+        res = GeneratorResponse(iter((b'a' * 10, b'b' * 10)))
+        compressed = compress_response(Req(), res, True)
+        assert isinstance(compressed, GeneratorResponse)
+        chunks = list(compressed.__end_of_response__())
+        assert len(chunks) == 3
+        assert decompress(b''.join(chunks)) == b'a' * 10 + b'b' * 10
+        # the first chunk is decompressible without rest of stream
+        assert decompressobj(31).decompress(chunks[0]) == b'a' * 10
+
+
+class TestCodecRegistry:
+    """Tests for Codec and CodecRegistry classes."""
+    def test_order(self):
+        registry = default_codecs()
+        assert [codec.name for codec in registry] == \
+            ['br', 'zstd', 'gzip', 'deflate']
+        registry.register(Codec('x-test', suffix='.x'), first=True)
+        registry.unregister('br')
+        assert [codec.name for codec in registry][:2] == ['x-test', 'zstd']
+        assert registry.suffixes()[0] == ('x-test', '.x')
+
+    def test_preference(self):
+        registry = CodecRegistry((
+            Codec('deflate', lambda level: ZlibCompressor(level, 15)),
+            Codec('gzip', lambda level: ZlibCompressor(level, 31))))
+        res = compress_response(Req('gzip, deflate'), Response(DATA), True,
+                                codecs=registry)
+        assert res.headers['Content-Encoding'] == 'deflate'
+
+    def test_not_available(self):
+        registry = CodecRegistry((Codec('br', suffix='.br'),))
+        res = Response(DATA)
+        assert compress_response(Req('br'), res, True,
+                                 codecs=registry) is res
+        assert 'Vary' not in res.headers
+
+    def test_mime_types(self):
+        codec = Codec('x-json', lambda level: ZlibCompressor(level, 31),
+                      mime_types=('application/json',), min_size=0)
+        assert codec.accept('application/json; charset=utf-8', 10, (), 1024)
+        assert not codec.accept('text/html', 10, (), 1024)
+        registry = CodecRegistry((codec,))
+        res = compress_response(Req('x-json'), JSONResponse(data=[1] * 20),
+                                True, codecs=registry)
+        assert res.headers['Content-Encoding'] == 'x-json'
+
+    def test_stats(self):
+        registry = default_codecs()
+        res = compress_response(Req(), Response(DATA), True, codecs=registry)
+        stats = registry.stats()['gzip']
+        assert stats.responses == 1
+        assert stats.bytes_in == len(DATA)
+        assert stats.bytes_out == res.content_length
+        assert stats.ratio > 10
+        assert stats.cpu_time >= 0
+        assert registry.stats()['deflate'].responses == 0
+        registry['gzip'].reset()
+        assert registry['gzip'].stats() == (0, 0, 0, 0.0)
+
+    def test_stats_not_used(self):
+        registry = default_codecs()
+        res = Response(urandom(4096))
+        assert compress_response(Req(), res, True, codecs=registry) is res
+        assert registry.stats()['gzip'].responses == 0
+
+    def test_generator_stats(self):
+        registry = default_codecs()
+        res = compress_response(
+            Req(), GeneratorResponse(iter((b'a' * 10, b'b' * 10))), True,
+            codecs=registry)
+        assert registry.stats()['gzip'].responses == 0
+        b''.join(res.__end_of_response__())
+        assert registry.stats()['gzip'].bytes_in == 20
+
+    def test_zstd_dictionary(self):
+        if ZSTD:
+            codec = zstd_dictionary_codec('x-zstd', b'{"key": "value"}' * 10)
+            assert codec.min_size == 0
+            assert codec.mime_types == ('application/json',)
+        else:
+            with raises(NotImplementedError):
+                zstd_dictionary_codec('x-zstd', b'dictionary')
+
+
+class TestApplication:
+    """Tests for compression in Application."""
+    @staticmethod
+    def start_response(status, headers):
+        TestApplication.status = status
+        TestApplication.headers = dict(headers)
+
+    @staticmethod
+    def env(path, accept_encoding='gzip, deflate'):
+        return {
+            'PATH_INFO': path,
+            'REQUEST_METHOD': 'GET',
+            'HTTP_ACCEPT_ENCODING': accept_encoding
+        }
+
+    def test_response(self, app):
+        body = b''.join(app(self.env('/text'), self.start_response))
+        assert self.headers['Content-Encoding'] == 'gzip'
+        assert self.headers['Content-Length'] == str(len(body))
+        assert decompress(body) == DATA
+
+    def test_generator(self, app):
+        body = b''.join(app(self.env('/generator'), self.start_response))
+        assert self.headers['Content-Encoding'] == 'gzip'
+        assert 'Content-Length' not in self.headers
+        assert decompress(body) == b'firstsecond'
+
+    def test_disabled(self, app):
+        body = b''.join(app(self.env('/disabled'), self.start_response))
+        assert 'Content-Encoding' not in self.headers
+        assert body == DATA
+
+    def test_identity(self, app):
+        body = b''.join(app(self.env('/text', ''), self.start_response))
+        assert 'Content-Encoding' not in self.headers
+        assert self.headers['Vary'] == 'Accept-Encoding'
+        assert body == DATA
+
+    def test_stats(self, app):
+        before = app.compress_codecs.stats()['gzip'].responses
+        app(self.env('/text'), self.start_response)
+        assert app.compress_codecs.stats()['gzip'].responses == before + 1
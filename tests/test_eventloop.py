@@ -0,0 +1,152 @@
+"""Tests for coroutine handlers under WSGI."""
+from asyncio import get_running_loop, run, sleep
+from threading import current_thread
+
+from pytest import fixture, raises
+
+from poorwsgi import Application
+from poorwsgi.eventloop import EventLoopThread, event_loop
+from poorwsgi.response import JSONResponse
+
+# pylint: disable=missing-function-docstring
+# pylint: disable=redefined-outer-name
+
+
+@fixture(scope='session')
+def app():
+    app = Application('test_eventloop')
+    app.loops = []
+
+    @app.route('/async/<value:int>')
+    async def async_handler(req, value):
+        app.loops.append(get_running_loop())
+        await sleep(0)
+        return JSONResponse(value=value)
+
+    @app.route('/sync')
+    def sync_handler(req):
+        return 'sync'
+
+    @app.route('/error')
+    async def error(req):
+        await sleep(0)
+        raise RuntimeError("error")
+
+    return app
+
+
+@fixture(scope='session')
+def hooks():
+    app = Application('test_eventloop_hooks')
+
+    @app.before_response()
+    async def before(req):
+        await sleep(0)
+        req.loop = get_running_loop()
+
+    @app.after_response()
+    async def after(req, res):
+        await sleep(0)
+        res.add_header('X-Loop', str(id(req.loop)))
+        return res
+
+    @app.route('/sync')
+    def sync_handler(req):
+        return 'sync'
+
+    @app.route('/async')
+    async def async_handler(req):
+        await sleep(0)
+        return 'async'
+
+    return app
+
+
+class TestEventLoopThread:
+    """Tests for EventLoopThread class."""
+    def test_run(self):
+        async def thread():
+            await sleep(0)
+            return current_thread()
+
+        loop = EventLoopThread()
+        thread_ = loop.run(thread())
+        assert thread_ is not current_thread()
+        assert loop.run(thread()) is thread_   # the same thread
+        loop.stop()
+        assert loop.run(thread()) is not thread_   # started again
+        loop.stop()
+
+    def test_exception(self):
+        async def error():
+            raise ValueError("error")
+
+        with raises(ValueError):
+            event_loop.run(error())
+
+    def test_same_thread(self):
+        loop = EventLoopThread()
+
+        async def inner():
+            return 1
+
+        async def outer():
+            return loop.run(inner())
+
+        with raises(RuntimeError):
+            loop.run(outer())
+        loop.stop()
+
+    def test_stop_unused(self):
+        EventLoopThread().stop()
+
+
+class TestApplication:
+    """Tests for coroutine handlers in WSGI Application."""
+    @staticmethod
+    def start_response(status, headers):
+        TestApplication.status = status
+        TestApplication.headers = dict(headers)
+
+    @staticmethod
+    def env(path):
+        return {'PATH_INFO': path, 'REQUEST_METHOD': 'GET',
+                'SERVER_NAME': 'localhost', 'wsgi.errors': None}
+
+    def test_handler(self, app):
+        assert b''.join(app(self.env('/async/1'), self.start_response)) \
+            == b'{"value": 1}'
+        assert self.status == '200 OK'
+        app(self.env('/async/2'), self.start_response)
+        assert app.loops[-1] is app.loops[-2]   # loop lives across requests
+        assert app.loops[-1] is event_loop.loop
+
+    def test_sync(self, app):
+        assert b''.join(app(self.env('/sync'), self.start_response)) \
+            == b'sync'
+
+    def test_error(self, app):
+        app(self.env('/error'), self.start_response)
+        assert self.status.startswith('500')
+
+    def test_hooks(self, hooks):
+        for path in ('/sync', '/async'):
+            assert b''.join(hooks(self.env(path), self.start_response)) \
+                == path[1:].encode()
+            assert self.headers['X-Loop'] == str(id(event_loop.loop))
+
+    def test_asgi_hooks(self, hooks):
+        """Requests with coroutine hooks are processed in thread pool."""
+        sent = []
+
+        async def receive():
+            return {'type': 'http.request', 'body': b''}
+
+        async def send(message):
+            sent.append(message)
+
+        scope = {'type': 'http', 'method': 'GET', 'path': '/async',
+                 'query_string': b'', 'headers': []}
+        run(hooks.asgi(scope, receive, send))
+        assert sent[0]['status'] == 200
+        assert sent[1]['body'] == b'async'
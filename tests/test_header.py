@@ -1,5 +1,6 @@
 """Tests for request.Header class."""
 
+from timeit import timeit
 from unittest import TestCase
 
 from poorwsgi.request import Headers
@@ -63,3 +64,50 @@ class TestSetValues(TestCase):
         headers = Headers()
         with self.assertRaises(ValueError):
             headers.add_header('X-None')
+
+
+class TestLookup(TestCase):
+    """Header lookup by case-insensitive names."""
+    def test_multi_values(self):
+        headers = Headers([('Set-Cookie', 'one'), ('X-Test', 'Ok')])
+        headers.add('Set-Cookie', 'two')
+        assert headers['set-cookie'] == 'one'
+        assert headers.get_all('SET-COOKIE') == ('one', 'two')
+        assert 'x-test' in headers
+        assert headers.get('X-None', 'default') == 'default'
+        assert headers.get(key='x-test') == 'Ok'    # Mapping.get signature
+        with self.assertRaises(KeyError):
+            headers.add('x-test', 'Value')
+
+    def test_delete(self):
+        headers = Headers([('Set-Cookie', 'one'), ('X-Test', 'Ok'),
+                           ('Set-Cookie', 'two')])
+        del headers['set-cookie']
+        assert 'Set-Cookie' not in headers
+        assert headers.get_all('Set-Cookie') == ()
+        assert headers.items() == (('X-Test', 'Ok'),)
+        headers['x-test'] = 'Value'
+        assert headers['X-Test'] == 'Value'
+        assert len(headers) == 1
+        del headers['X-None']
+
+    def test_utf8_name(self):
+        headers = Headers([('X-Čeština', 'Ok')])
+        assert headers['X-Čeština'] == 'Ok'
+
+    def test_benchmark(self):
+        """Index lookup must be faster than linear scan of all headers."""
+        pairs = [('X-Header-%d' % i, str(i)) for i in range(50)]
+        headers = Headers(pairs)
+
+        def linear(name):
+            name = Headers.iso88591(name.lower())
+            for key, val in pairs:
+                if key.lower() == name:
+                    return val
+            raise KeyError(name)
+
+        assert linear('x-header-49') == headers['x-header-49']
+        scan = timeit(lambda: linear('X-Header-49'), number=2000)
+        index = timeit(lambda: headers['X-Header-49'], number=2000)
+        assert index < scan
@@ -0,0 +1,85 @@
+"""Tests for pluggable JSON codecs."""
+from pytest import fixture, mark, raises
+
+from poorwsgi import Application
+from poorwsgi.jsoncodec import available_codecs, current_codec, get_codec, \
+    set_codec, dumps, loads, StdlibCodec
+from poorwsgi.request import JsonDict, JsonList, parse_json_request
+from poorwsgi.response import JSONResponse
+from poorwsgi.session import PoorSession
+
+# pylint: disable=missing-function-docstring
+# pylint: disable=redefined-outer-name
+
+CODECS = available_codecs()
+DATA = {'key': 'hodnota ěščř', 'list': [1, 2.5, True, None], 'dict': {}}
+
+
+@fixture(params=CODECS)
+def codec(request):
+    original = current_codec()
+    set_codec(request.param)
+    yield current_codec()
+    set_codec(original)
+
+
+class TestCodecs:
+    """Tests for codec functions."""
+    def test_default(self):
+        assert isinstance(current_codec(), StdlibCodec)
+
+    def test_get_codec(self):
+        assert get_codec('auto').name == CODECS[0]
+        with raises(ValueError):
+            get_codec('unknown')
+
+    def test_round_trip(self, codec):
+        data = dumps(DATA)
+        assert isinstance(data, bytes)
+        assert loads(data) == DATA
+        assert loads(data.decode('utf-8')) == DATA
+        assert codec.loads(codec.dumps({1: 'a'})) == {'1': 'a'}
+
+
+class TestUsage:
+    """Tests for JSON codec in responses, requests and session."""
+    def test_response(self, codec):
+        res = JSONResponse(DATA)
+        assert res.content_type == 'application/json; charset=utf-8'
+        assert codec.loads(res.data) == DATA
+
+    def test_response_charset(self, codec):
+        # pylint: disable=unused-argument
+        res = JSONResponse(charset='iso-8859-2', key='ěščř', other='日本€')
+        assert loads(res.data.decode('iso-8859-2')) == {'key': 'ěščř',
+                                                        'other': '日本€'}
+
+    def test_request(self, codec):
+        # pylint: disable=unused-argument
+        data = parse_json_request(dumps(DATA))
+        assert isinstance(data, JsonDict)
+        assert data == DATA
+        assert isinstance(parse_json_request(b'[1, 2]'), JsonList)
+        assert parse_json_request('{"a": "ř"}'.encode('iso-8859-2'),
+                                  'iso-8859-2') == {'a': 'ř'}
+
+    def test_session(self, codec):
+        # pylint: disable=unused-argument
+        session = PoorSession(b'secret')
+        session.data = DATA
+        session.write()
+        cookie = session.cookie
+        other = PoorSession(b'secret')
+        other.load(cookie)
+        assert other.data == DATA
+
+
+@mark.parametrize('name', CODECS)
+def test_application(name):
+    app = Application('test_jsoncodec_%s' % name)
+    original = app.json_codec
+    try:
+        app.json_codec = name
+        assert current_codec().name == name
+    finally:
+        app.json_codec = original
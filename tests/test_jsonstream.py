@@ -0,0 +1,202 @@
+"""Tests for streaming JSON request parser."""
+from io import BytesIO
+from json import dumps
+from tracemalloc import get_traced_memory, start, stop
+
+from pytest import fixture, raises
+
+from poorwsgi import Application
+from poorwsgi.jsonstream import iter_array, iter_ndjson, json_stream
+from poorwsgi.request import Request
+from poorwsgi.state import METHOD_POST
+
+# pylint: disable=missing-function-docstring
+# pylint: disable=redefined-outer-name
+
+ITEMS = [{'id': 1, 'name': 'žluťoučký kůň'}, 123, -4.5e3, "\\\"x]", None,
+         True, [], {}, [1, [2, {"a": "]"}]]]
+
+
+class Body:
+    """wsgi.input with generated JSON array of count items."""
+    def __init__(self, count):
+        self.chunks = self.generate(count)
+        self.buffer = b''
+
+    @staticmethod
+    def generate(count):
+        yield b'['
+        for i in range(count):
+            yield (b',' if i else b'') + dumps(
+                {'id': i, 'name': 'item %d' % i}).encode()
+        yield b']'
+
+    def read(self, size=-1):
+        while len(self.buffer) < size:
+            chunk = next(self.chunks, None)
+            if chunk is None:
+                break
+            self.buffer += chunk
+        data, self.buffer = self.buffer[:size], self.buffer[size:]
+        return data
+
+
+@fixture(scope='session')
+def app():
+    app = Application('test_jsonstream')
+    app.cached_size = 0
+
+    @app.route('/stream', method=METHOD_POST)
+    @json_stream
+    def stream(req):
+        assert not req.json     # not parsed by auto_json
+        return dumps([item for item in req.iter_json_items(block_size=7)])
+
+    @app.route('/count', method=METHOD_POST)
+    @json_stream
+    def count(req):
+        return str(sum(1 for _ in req.iter_json_items(block_size=4096)))
+
+    @app.route('/eager', method=METHOD_POST)
+    def eager(req):
+        return dumps(list(req.iter_json_items()))
+
+    @app.route('/read', method=METHOD_POST)
+    def read(req):
+        req.read()
+        return dumps(req.json)
+
+    return app
+
+
+def env(path, body, content_type='application/json'):
+    if isinstance(body, bytes):
+        length, body = len(body), BytesIO(body)
+    else:
+        length = 1 << 30
+    return {'PATH_INFO': path, 'REQUEST_METHOD': 'POST',
+            'SERVER_NAME': 'localhost', 'SERVER_PROTOCOL': 'HTTP/1.1',
+            'CONTENT_TYPE': content_type, 'CONTENT_LENGTH': str(length),
+            'wsgi.input': body, 'wsgi.errors': None}
+
+
+def call(app, path, body, content_type='application/json'):
+    status = []
+    body = b''.join(app(env(path, body, content_type),
+                        lambda code, headers: status.append(code)))
+    return status[0], body
+
+
+class TestIterArray:
+    """Tests for iter_array function."""
+    def test_split(self):
+        data = dumps(ITEMS, ensure_ascii=False).encode()
+        for size in (1, 2, 3, 7, len(data)):
+            blocks = (data[i:i+size] for i in range(0, len(data), size))
+            assert list(iter_array(blocks)) == ITEMS
+
+    def test_whitespace(self):
+        assert list(iter_array((b' \n[ 1 ,\t2 ]\r\n ',))) == [1, 2]
+        assert not list(iter_array((b'[', b' ]')))
+
+    def test_charset(self):
+        data = dumps(['ěščř'], ensure_ascii=False).encode('iso-8859-2')
+        assert list(iter_array((data,), 'iso-8859-2')) == ['ěščř']
+
+    def test_invalid(self):
+        for data in (b'', b'{}', b'[1 2]', b'[1,]', b'[1', b'[1] 2',
+                     b'["a]'):
+            with raises(ValueError):
+                list(iter_array((data,)))
+
+    def test_items_before_error(self):
+        items = iter_array((b'[1, 2, x]',))
+        assert next(items) == 1
+        assert next(items) == 2
+        with raises(ValueError):
+            next(items)
+
+    def test_max_item_size(self):
+        with raises(ValueError):
+            list(iter_array((b'["', b'x' * 10, b'x' * 10, b'"]'),
+                            max_item_size=16))
+
+
+class TestIterNdjson:
+    """Tests for iter_ndjson function."""
+    def test_split(self):
+        data = b'\n'.join(dumps(item).encode() for item in ITEMS)
+        for size in (1, 5, len(data)):
+            blocks = (data[i:i+size] for i in range(0, len(data), size))
+            assert list(iter_ndjson(blocks)) == ITEMS
+
+    def test_empty_lines(self):
+        assert list(iter_ndjson((b'\r\n1\r\n\n2\n',))) == [1, 2]
+
+    def test_max_item_size(self):
+        with raises(ValueError):
+            list(iter_ndjson((b'1\n"', b'x' * 20), max_item_size=16))
+
+
+class TestRequest:
+    """Tests for Request.iter_json_items method."""
+    def test_stream(self, app):
+        status, body = call(app, '/stream', dumps(ITEMS).encode())
+        assert status == '200 OK'
+        assert body == dumps(ITEMS).encode()
+
+    def test_ndjson(self, app):
+        data = b'\n'.join(dumps(item).encode() for item in ITEMS)
+        status, body = call(app, '/stream', data, 'application/x-ndjson')
+        assert status == '200 OK'
+        assert body == dumps(ITEMS).encode()
+
+    def test_eager(self, app):
+        """Items of already parsed body are returned."""
+        status, body = call(app, '/eager', b'[1, 2]')
+        assert (status, body) == ('200 OK', b'[1, 2]')
+        assert call(app, '/eager', b'{"a": 1}')[0].startswith('400')
+
+    def test_read_before_json(self, app):
+        """Body of auto_json route is parsed before handler is called."""
+        assert call(app, '/read', b'{"a": 1}') == ('200 OK', b'{"a": 1}')
+
+    def test_invalid(self, app):
+        assert call(app, '/count', b'[1, x]')[0].startswith('400')
+        assert call(app, '/count', b'{"a": 1}')[0].startswith('400')
+
+    def test_bounded_memory(self, app):
+        start()
+        try:
+            status, body = call(app, '/count', Body(10000))
+            peak = get_traced_memory()[1]
+        finally:
+            stop()
+        assert (status, body) == ('200 OK', b'10000')
+        assert peak < 1 << 16   # body has about 340 KiB
+
+    def test_route_resolved_once(self):
+        app = Application('test_jsonstream_once')
+        app.route_cache_size = 0
+        calls = []
+
+        def convert(value):
+            calls.append(value)
+            return int(value)
+
+        app.set_filter('num', r'\d+', convert)
+
+        @app.route('/stream/<num:num>', method=METHOD_POST)
+        @json_stream
+        def stream(req, num):
+            return str(sum(1 for _ in req.iter_json_items()) + num)
+
+        assert call(app, '/stream/1', b'[1, 2]') == ('200 OK', b'3')
+        assert calls == ['1']
+
+    def test_request_json(self, app):
+        """Request without json_stream route parses body to json."""
+        environ = env('/eager', b'[1, 2]')
+        environ['REQUEST_STARTTIME'] = 0
+        req = Request(environ, app)
+        assert req.json == [1, 2]
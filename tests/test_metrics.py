@@ -0,0 +1,146 @@
+"""Tests for request metrics."""
+from threading import Thread
+from timeit import timeit
+
+from pytest import fixture
+
+from poorwsgi import Application
+from poorwsgi.metrics import Metrics, escape_label
+
+# pylint: disable=missing-function-docstring
+# pylint: disable=redefined-outer-name
+
+
+@fixture(scope='session')
+def app():
+    app = Application('test_metrics')
+    app.metrics = Metrics()
+    app.set_route('/metrics', app.metrics.handler)
+
+    @app.route('/item/<id:int>')
+    def item(req, id):
+        # pylint: disable=redefined-builtin
+        return 'item %d' % id
+
+    @app.route('/error')
+    def error(req):
+        raise RuntimeError('error')
+
+    return app
+
+
+class TestMetrics:
+    """Tests for Metrics class."""
+    def test_record(self):
+        metrics = Metrics(buckets=(0.1, 1.0))
+        metrics.record('/', 'GET', 200, 0.1, 5, 10)
+        metrics.record('/', 'GET', 302, 2.0)
+        metrics.record('/', 'POST', 500, 0.01)
+        metrics.record(None, 'GET', 99, 0.01)
+        values = metrics.values()
+        assert values[('/', 'GET')] == [2, 2.1, 5, 10, 0, 1, 1, 0, 0,
+                                        1, 0, 1]
+        assert values[('/', 'POST')][4:9] == [0, 0, 0, 0, 1]
+        assert values[('', 'GET')][4] == 1
+
+    def test_threads(self):
+        metrics = Metrics()
+
+        def worker():
+            for _ in range(100):
+                metrics.record('/', 'GET', 200, 0.001)
+
+        threads = [Thread(target=worker) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert metrics.values()[('/', 'GET')][0] == 400
+
+    def test_exposition(self):
+        metrics = Metrics(buckets=(0.1, 1.0))
+        metrics.record('/a"b', 'GET', 200, 0.05, 0, 10)
+        metrics.record('/a"b', 'GET', 404, 0.5, 0, 20)
+        lines = metrics.exposition().splitlines()
+        labels = 'rule="/a\\"b",method="GET"'
+        assert 'poorwsgi_requests_total{%s,status="2xx"} 1' % labels in lines
+        assert 'poorwsgi_requests_total{%s,status="4xx"} 1' % labels in lines
+        assert 'poorwsgi_request_duration_seconds_bucket{%s,le="0.1"} 1' \
+            % labels in lines
+        assert 'poorwsgi_request_duration_seconds_bucket{%s,le="1.0"} 2' \
+            % labels in lines
+        assert 'poorwsgi_request_duration_seconds_bucket{%s,le="+Inf"} 2' \
+            % labels in lines
+        assert 'poorwsgi_request_duration_seconds_count{%s} 2' \
+            % labels in lines
+        assert 'poorwsgi_response_bytes_total{%s} 30' % labels in lines
+        assert '# TYPE poorwsgi_request_duration_seconds histogram' in lines
+
+    def test_phases(self):
+        metrics = Metrics()
+        metrics.record('/', 'GET', 200, 0.3, phases={'handler': 0.2,
+                                                     'emission': 0.1})
+        metrics.record('/', 'GET', 200, 0.3, phases={'handler': 0.2})
+        assert metrics.phases() == {('/', 'GET', 'handler'): 0.4,
+                                    ('/', 'GET', 'emission'): 0.1}
+        assert 'poorwsgi_request_phase_seconds_total{rule="/",method="GET",'\
+            'phase="handler"} 0.4' in metrics.exposition().splitlines()
+
+    def test_escape(self):
+        assert escape_label('a\\b\n') == 'a\\\\b\\n'
+
+    def test_overhead(self):
+        metrics = Metrics()
+        count = 10000
+        seconds = timeit(
+            lambda: metrics.record('/item/<id:int>', 'GET', 200, 0.003,
+                                   0, 100),
+            number=count)
+        # few microseconds per request, with a big reserve for slow CI
+        assert seconds / count < 0.00002
+
+
+class TestApplication:
+    """Tests for metrics in Application."""
+    @staticmethod
+    def start_response(status, headers):
+        TestApplication.status = status
+        TestApplication.headers = dict(headers)
+
+    @staticmethod
+    def env(path, method='GET'):
+        return {'PATH_INFO': path, 'REQUEST_METHOD': method,
+                'SERVER_NAME': 'localhost', 'wsgi.errors': None}
+
+    def call(self, app, path):
+        retval = app(self.env(path), self.start_response)
+        body = b''.join(retval)
+        retval.close()
+        return body
+
+    def test_request(self, app):
+        for _ in range(3):
+            self.call(app, '/item/1')
+        self.call(app, '/error')
+        values = app.metrics.values()
+        assert values[('/item/<id:int>', 'GET')][0] == 3
+        assert values[('/item/<id:int>', 'GET')][3] == 3 * len(b'item 1')
+        assert values[('/error', 'GET')][4:9] == [0, 0, 0, 0, 1]
+        phases = app.metrics.phases()
+        assert ('/item/<id:int>', 'GET', 'handler') in phases
+        assert ('/item/<id:int>', 'GET', 'emission') in phases
+
+    def test_not_sent(self, app):
+        before = app.metrics.values()[('/item/<id:int>', 'GET')][0]
+        retval = app(self.env('/item/2'), self.start_response)
+        assert app.metrics.values()[('/item/<id:int>', 'GET')][0] == before
+        retval.close()      # server closes iterable, when client is gone
+        assert app.metrics.values()[('/item/<id:int>', 'GET')][0] == \
+            before + 1
+
+    def test_endpoint(self, app):
+        body = self.call(app, '/metrics')
+        assert self.status == '200 OK'
+        assert self.headers['Content-Type'].startswith(
+            'text/plain; version=0.0.4')
+        assert b'rule="/item/<id:int>",method="GET"' in body
@@ -0,0 +1,151 @@
+"""Tests for sampling profiler."""
+from asyncio import gather, run, sleep
+from os import listdir
+from threading import enumerate as threads
+
+import marshal
+
+from pytest import fixture, raises
+
+from poorwsgi import Application
+from poorwsgi.profiler import SamplingProfiler
+
+# pylint: disable=missing-function-docstring
+# pylint: disable=redefined-outer-name
+
+
+def work(count):
+    return sum(range(count))
+
+
+def other_work(count):
+    return sum(range(count))
+
+
+@fixture(scope='session')
+def app():
+    app = Application('test_profiler')
+    app.debug = True
+    app.sampling_profiler = SamplingProfiler(every=2)
+
+    @app.route('/work/<count:int>')
+    def work_handler(req, count):
+        return str(work(count))
+
+    return app
+
+
+class TestSamplingProfiler:
+    """Tests for SamplingProfiler class."""
+    def test_every(self):
+        profiler = SamplingProfiler(every=3)
+        assert [profiler.sample() for _ in range(6)] == \
+            [False, False, True, False, False, True]
+        with raises(ValueError):
+            SamplingProfiler(every=0)
+
+    def test_fraction(self):
+        assert not SamplingProfiler(fraction=0).sample()
+        assert SamplingProfiler(fraction=1).sample()
+
+    def test_aggregate(self):
+        profiler = SamplingProfiler(every=1)
+        for _ in range(3):
+            profile = profiler.start()
+            work(100)
+            profiler.stop(profile, '/work')
+        profiler.stop(profiler.start(), None)
+        assert profiler.info() == {
+            'requests': 4, 'samples': {'/work': 3, '(unknown)': 1}}
+        stats = profiler.stats('/work')
+        calls = [value[1] for key, value in stats.stats.items()
+                 if key[2] == 'work']
+        assert calls == [3]
+        assert profiler.stats('/none') is None
+        assert marshal.loads(profiler.dumps()) == profiler.stats().stats
+
+    def test_collapsed(self):
+        profiler = SamplingProfiler(every=1)
+        profile = profiler.start()
+        work(100000)
+        profiler.stop(profile, '/work')
+        lines = profiler.collapsed().splitlines()
+        assert any(line.startswith('/work;') and ':work;' in line
+                   for line in lines)
+        assert all(int(line.rsplit(' ', 1)[1]) > 0 for line in lines)
+
+    def test_flush(self, tmp_path):
+        profiler = SamplingProfiler(every=1, interval=0, dump=str(tmp_path))
+        profile = profiler.start()
+        work(10)
+        profiler.stop(profile, '/work/<count:int>')
+        assert profiler.keys() == []
+        for thread in threads():
+            if thread.name == 'poorwsgi-profiler':
+                thread.join()   # files are written by background thread
+        files = listdir(tmp_path)
+        assert len(files) == 1
+        assert files[0].endswith('_work_count_int_.profile')
+
+
+class TestApplication:
+    """Tests for sampling profiler in Application."""
+    @staticmethod
+    def start_response(status, headers):
+        TestApplication.status = status
+        TestApplication.headers = dict(headers)
+
+    def test_request(self, app):
+        env = {'PATH_INFO': '/work/10', 'REQUEST_METHOD': 'GET'}
+        for _ in range(4):
+            assert b''.join(app(env.copy(), self.start_response)) == b'45'
+        info = app.sampling_profiler.info()
+        assert info['samples']['/work/<count:int>'] == 2
+
+        env['PATH_INFO'] = '/debug-info/profile'
+        body = b''.join(app(env.copy(), self.start_response)).decode()
+        assert self.status == '200 OK'
+        assert 'Samples of /work/<count:int>: 2' in body
+
+        env['QUERY_STRING'] = 'format=collapsed&rule=/work/<count:int>'
+        body = b''.join(app(env.copy(), self.start_response)).decode()
+        assert all(line.startswith('/work/<count:int>;')
+                   for line in body.splitlines())
+
+        env['QUERY_STRING'] = 'format=pstats'
+        body = b''.join(app(env.copy(), self.start_response))
+        assert isinstance(marshal.loads(body), dict)
+        assert 'attachment' in self.headers['Content-Disposition']
+
+    def test_asgi(self):
+        app = Application('test_profiler_asgi')
+        app.sampling_profiler = SamplingProfiler(every=1)
+
+        @app.route('/async')
+        async def async_handler(req):
+            for _ in range(3):
+                await sleep(0)
+                work(10)
+            return 'async'
+
+        async def other():
+            for _ in range(3):
+                await sleep(0)
+                other_work(10)
+
+        async def receive():
+            return {'type': 'http.request', 'body': b''}
+
+        async def send(message):
+            pass
+
+        async def main():
+            scope = {'type': 'http', 'method': 'GET', 'path': '/async',
+                     'query_string': b'', 'headers': []}
+            await gather(app.asgi(scope, receive, send), other())
+
+        run(main())
+        stats = app.sampling_profiler.stats('/async').stats
+        calls = {key[2]: value[1] for key, value in stats.items()}
+        assert calls['work'] == 3
+        assert 'other_work' not in calls    # other task is not counted
@@ -7,7 +7,7 @@ from pytest import fixture, raises
 
 from poorwsgi import Application
 from poorwsgi.request import JsonDict, JsonList, parse_json_request, \
-    EmptyForm, Args, FieldStorage, Request
+    EmptyForm, Args, FieldStorage, Request, CachedInput
 from poorwsgi.response import HTTPException
 
 # pylint: disable=missing-function-docstring
@@ -21,6 +21,13 @@ def app():
     return Application(__name__)
 
 
+@fixture(scope='session')
+def lazy_app():
+    app = Application('test_lazy_request')
+    app.lazy_request = True
+    return app
+
+
 class TestEmpty:
     """Test for Empty class"""
     def test_emptry_form(self):
@@ -98,6 +105,80 @@ class TestForm:
         assert tuple(form.getlist("values", ("3", "4"), int)) == (3, 4)
         assert not tuple(form.getlist("values"))
 
+    @staticmethod
+    def environ(body, ctype):
+        return {
+            'PATH_INFO': '/path',
+            'SERVER_PROTOCOL': 'HTTP/1.0',
+            'REQUEST_METHOD': 'POST',
+            'REQUEST_STARTTIME': time(),
+            'CONTENT_TYPE': ctype,
+            'CONTENT_LENGTH': str(len(body)),
+            'wsgi.input': BytesIO(body)
+            }
+
+    def test_urlencoded(self, app):
+        env = self.environ(b'name=Poor&age=23&items=1&items=2',
+                           'application/x-www-form-urlencoded')
+        form = Request(env, app).form
+        assert form.getfirst('name') == 'Poor'
+        assert form.getfirst('age', fce=int) == 23
+        assert form.getvalue('items') == ['1', '2']
+        assert tuple(form.getlist('items', fce=int)) == (1, 2)
+        assert sorted(form.keys()) == ['age', 'items', 'name']
+        assert form.bytes_read == 32
+
+    def test_multipart(self, app):
+        body = (b'preamble\r\n--xyz\r\n'
+                b'Content-Disposition: form-data; name="name"\r\n\r\n'
+                b'Poor\r\n--xyz\r\n'
+                b'Content-Disposition: form-data; name="items"\r\n\r\n'
+                b'1\r\n--xyz\r\n'
+                b'Content-Disposition: form-data; name="items"\r\n\r\n'
+                b'2\r\n--xyz\r\n'
+                b'Content-Disposition: form-data; name="file"; '
+                b'filename="file.bin"\r\n'
+                b'Content-Type: application/octet-stream\r\n\r\n' +
+                b'\r\n--xy' * 1000 +
+                b'\r\n--xyz--\r\nepilogue')
+        env = self.environ(body, 'multipart/form-data; boundary=xyz')
+        form = Request(env, app).form
+        assert form.getfirst('name') == 'Poor'
+        assert tuple(form.getlist('items', fce=int)) == (1, 2)
+        assert form['file'].filename == 'file.bin'
+        assert form['file'].type == 'application/octet-stream'
+        assert form.getvalue('file') == b'\r\n--xy' * 1000
+        assert not isinstance(form['file'].file, BytesIO)
+
+    def test_file_callback(self):
+        files = {}
+
+        def callback(filename):
+            files[filename] = BytesIO()
+            return files[filename]
+
+        body = (b'--xyz\r\n'
+                b'Content-Disposition: form-data; name="file"; '
+                b'filename="a.txt"\r\n\r\n'
+                b'data\r\n--xyz--\r\n')
+        env = self.environ(body, 'multipart/form-data; boundary=xyz')
+        form = FieldStorage(env['wsgi.input'], environ=env,
+                            file_callback=callback)
+        assert form['file'].file is files['a.txt']
+        assert files['a.txt'].getvalue() == b'data'
+
+    def test_multipart_errors(self):
+        body = b'--xyz\r\nContent-Disposition: form-data; name="a"\r\n\r\n'
+        env = self.environ(body, 'multipart/form-data; boundary=xyz')
+        form = FieldStorage(env['wsgi.input'], environ=env)
+        assert form.getvalue('a') == ''
+        env = self.environ(body, 'multipart/form-data; boundary=xyz')
+        with raises(ValueError):
+            FieldStorage(env['wsgi.input'], environ=env, strict_parsing=1)
+        env = self.environ(body, 'multipart/form-data; boundary=xyz')
+        with raises(ValueError):
+            FieldStorage(env['wsgi.input'], environ=env, max_num_fields=0)
+
 
 class TestParseJson:
     """Tests for parsing JSON requests."""
@@ -193,6 +274,25 @@ class TestRequest:
         assert req.host_port == 8080
         assert req.construct_url('/x') == 'https://example.com/x'
 
+    def test_environ_not_copied(self, app):
+        class Environ(dict):
+            """Environ, which counts its copies."""
+            copies = 0
+
+            def copy(self):
+                Environ.copies += 1
+                return super().copy()
+
+        env = Environ({
+            'PATH_INFO': '/path',
+            'REQUEST_METHOD': 'GET',
+            'REQUEST_STARTTIME': time(),
+            'HTTP_X_TEST': 'value'
+        })
+        req = Request(env, app)
+        assert req.headers['X-Test'] == 'value'
+        assert Environ.copies == 0
+
     def test_empty_form(self, app):
         env = {
             'PATH_INFO': '/path',
@@ -207,3 +307,148 @@ class TestRequest:
         assert req.is_body_request is False
         assert req.mime_type in app.form_mime_types
         assert isinstance(req.form, EmptyForm)
+
+
+class TestLazyRequest:
+    """Test Request with lazy_request option."""
+    @staticmethod
+    def environ(body=b''):
+        return {
+            'PATH_INFO': '/path',
+            'QUERY_STRING': 'a=1&b=2',
+            'SERVER_PROTOCOL': 'HTTP/1.0',
+            'REQUEST_METHOD': 'POST',
+            'REQUEST_STARTTIME': time(),
+            'CONTENT_TYPE': 'application/json',
+            'CONTENT_LENGTH': str(len(body)),
+            'HTTP_COOKIE': 'key=value',
+            'wsgi.input': BytesIO(body)
+            }
+
+    def test_nothing_parsed(self, lazy_app):
+        env = self.environ(b'[1, 2]')
+        req = Request(env, lazy_app)
+        assert env['wsgi.input'].tell() == 0
+        # pylint: disable=protected-access
+        assert req._Request__headers is None
+        assert req._Request__args is None
+        assert req._Request__cookies is None
+
+    def test_parse_on_access(self, lazy_app):
+        req = Request(self.environ(b'{"x": 1}'), lazy_app)
+        assert req.mime_type == 'application/json'
+        assert req.content_length == 8
+        assert req.args.getfirst('b') == '2'
+        assert req.cookies['key'].value == 'value'
+        assert req.json == {"x": 1}
+        assert req.json is req.json
+        assert isinstance(req.form, EmptyForm)
+
+    def test_null_json(self, lazy_app):
+        req = Request(self.environ(b'null'), lazy_app)
+        assert req.json is None
+        assert req.json is None     # body is not read twice
+
+    def test_data(self, lazy_app):
+        req = Request(self.environ(b'[1, 2]'), lazy_app)
+        assert req.data == b'[1, 2]'
+        assert req.json == [1, 2]
+
+    def test_bad_json(self, lazy_app):
+        req = Request(self.environ(b'{"x"'), lazy_app)
+        with raises(HTTPException):
+            req.json    # pylint: disable=pointless-statement
+
+
+class TestStreamMultipart:
+    """Test Request.stream_multipart method."""
+    body = (b'--xyz\r\n'
+            b'Content-Disposition: form-data; name="name"\r\n\r\n'
+            b'Poor\r\n--xyz\r\n'
+            b'Content-Disposition: form-data; name="file"; '
+            b'filename="file.bin"\r\n\r\n' +
+            b'\r\n--xy' * 1000 +
+            b'\r\n--xyz--\r\n')
+
+    @staticmethod
+    def environ(body, ctype='multipart/form-data; boundary=xyz'):
+        return {
+            'PATH_INFO': '/path',
+            'SERVER_PROTOCOL': 'HTTP/1.0',
+            'REQUEST_METHOD': 'POST',
+            'REQUEST_STARTTIME': time(),
+            'CONTENT_TYPE': ctype,
+            'CONTENT_LENGTH': str(len(body)),
+            'wsgi.input': BytesIO(body)
+            }
+
+    def test_stream(self, lazy_app):
+        parts = []
+
+        def on_part_begin(headers):
+            parts.append([headers['Content-Disposition'], b'', False])
+
+        def on_part_data(data):
+            parts[-1][1] += data
+
+        def on_part_end():
+            parts[-1][2] = True
+
+        req = Request(self.environ(self.body), lazy_app)
+        size = req.stream_multipart(on_part_begin, on_part_data, on_part_end,
+                                    block_size=100)
+        assert size == len(self.body)
+        assert parts == [
+            ['form-data; name="name"', b'Poor', True],
+            ['form-data; name="file"; filename="file.bin"',
+             b'\r\n--xy' * 1000, True]]
+
+    def test_not_complete(self, lazy_app):
+        ends = []
+        req = Request(self.environ(self.body[:-20]), lazy_app)
+        with raises(HTTPException):
+            req.stream_multipart(lambda headers: None, lambda data: None,
+                                 lambda: ends.append(True))
+        assert ends == [True]   # only the first part was complete
+
+    def test_not_multipart(self, lazy_app):
+        req = Request(self.environ(b'{}', 'application/json'), lazy_app)
+        with raises(HTTPException):
+            req.stream_multipart(lambda headers: None, lambda data: None,
+                                 lambda: None)
+
+
+class TestCachedInput:
+    """Test CachedInput class."""
+    class Input:
+        """wsgi.input mock without readinto, which returns small blocks."""
+        def __init__(self, data):
+            self.file = BytesIO(data)
+
+        def read(self, size):
+            return self.file.read(min(size, 3))
+
+    data = b'first line\r\n' + b'x' * 40 + b'\r\nlast'
+
+    def test_readline(self):
+        for file in (BytesIO(self.data), self.Input(self.data)):
+            cached = CachedInput(file, len(self.data), 16, None)
+            assert cached.readline() == b'first line\r\n'
+            assert cached.readline(100) == b'x' * 40 + b'\r\n'
+            assert cached.readline() == b'last'
+            assert cached.readline() == b''
+
+    def test_readline_size(self):
+        cached = CachedInput(BytesIO(self.data), len(self.data), 8)
+        assert cached.readline(5) == b'first'
+        assert cached.read(7) == b' line\r\n'
+        assert cached.readline() == b'x' * 8
+
+    def test_readinto(self):
+        cached = CachedInput(BytesIO(self.data), len(self.data) - 2, 16)
+        assert cached.readline() == b'first line\r\n'
+        buffer = bytearray(100)
+        assert cached.readinto(buffer) == len(self.data) - 14
+        assert buffer[:len(self.data) - 14] == self.data[12:-2]
+        assert cached.readinto(buffer) == 0
+        assert cached.read() == b''
@@ -1,6 +1,8 @@
 """Test for Response objects and it's functionality."""
 from io import BufferedWriter, BytesIO
+from os import path
 from datetime import datetime, timezone
+from wsgiref.util import FileWrapper
 
 from simplejson import load, loads
 
@@ -9,9 +11,11 @@ import pytest
 from poorwsgi.response import Response, JSONResponse, TextResponse, \
     GeneratorResponse, StrGeneratorResponse, JSONGeneratorResponse, \
     RedirectResponse, FileObjResponse, FileResponse, NotModifiedResponse, \
-    HTTPException, redirect, abort
+    HTTPException, redirect, abort, make_conditional
+from poorwsgi import Application
+from poorwsgi.headers import time_to_http
 from poorwsgi.request import Headers
-from poorwsgi.state import HTTP_NOT_FOUND
+from poorwsgi.state import HTTP_NOT_FOUND, METHOD_GET, METHOD_POST
 
 # pylint: disable=missing-function-docstring
 # pylint: disable=redefined-outer-name
@@ -301,3 +305,181 @@ class TestNotModifiedResponse():
     def test_date_empty_string(self):
         res = NotModifiedResponse(date = "")
         assert res.headers.get('Date') is None
+
+
+class TestPartialResponse():
+    """Tests for Range requests on file responses."""
+    data = bytes(range(100))
+
+    @staticmethod
+    def start_response(status, headers):
+        TestPartialResponse.status = status
+        TestPartialResponse.headers = dict(headers)
+
+    def test_accept_ranges(self):
+        res = FileObjResponse(BytesIO(self.data))
+        assert res.headers.get('Accept-Ranges') == 'bytes'
+
+    def test_single(self):
+        res = FileObjResponse(BytesIO(self.data))
+        res.make_partial(((10, 19),))
+        body = res(self.start_response)
+        assert self.status == '206 Partial Content'
+        assert self.headers['Content-Range'] == 'bytes 10-19/100'
+        assert self.headers['Content-Length'] == '10'
+        assert body.read() == self.data[10:20]
+        assert body.read() == b''
+
+    def test_suffix_and_open(self):
+        res = FileObjResponse(BytesIO(self.data))
+        res.make_partial(((None, 5),))
+        assert b''.join(res(self.start_response)) == self.data[-5:]
+        res = FileObjResponse(BytesIO(self.data))
+        res.make_partial(((95, None),))
+        assert b''.join(res(self.start_response)) == self.data[95:]
+        assert self.headers['Content-Range'] == 'bytes 95-99/100'
+
+    def test_position(self):
+        file = BytesIO(self.data)
+        file.seek(50)
+        res = FileObjResponse(file)
+        res.make_partial(((0, 9),))
+        assert b''.join(res(self.start_response)) == self.data[50:60]
+        assert self.headers['Content-Range'] == 'bytes 0-9/50'
+
+    def test_multi(self):
+        res = FileObjResponse(BytesIO(self.data), 'text/plain')
+        res.make_partial(((0, 1), (98, 200)))
+        body = b''.join(res(self.start_response))
+        assert self.status == '206 Partial Content'
+        ctype = self.headers['Content-Type']
+        assert ctype.startswith('multipart/byteranges; boundary=')
+        boundary = ctype[31:].encode()
+        assert len(body) == int(self.headers['Content-Length'])
+        assert body == (
+            b'--' + boundary + b'\r\nContent-Type: text/plain\r\n'
+            b'Content-Range: bytes 0-1/100\r\n\r\n' + self.data[:2] +
+            b'\r\n--' + boundary + b'\r\nContent-Type: text/plain\r\n'
+            b'Content-Range: bytes 98-99/100\r\n\r\n' + self.data[98:] +
+            b'\r\n--' + boundary + b'--\r\n')
+
+    def test_not_satisfiable(self):
+        file = BytesIO(self.data)
+        res = FileObjResponse(file)
+        res.make_partial(((100, None), (None, 0)))
+        assert not b''.join(res(self.start_response))
+        assert self.status == '416 Requested Range Not Satisfiable'
+        assert self.headers['Content-Range'] == 'bytes */100'
+        assert file.closed
+
+    def test_if_range(self):
+        res = FileResponse(__file__)
+        res.make_partial(((0, 9),), 'Thu, 01 Jan 1970 00:00:00 GMT')
+        assert res.status_code == 200
+        res(self.start_response).close()
+        res = FileResponse(__file__)
+        res.make_partial(((0, 9),), res.headers['Last-Modified'])
+        assert res.status_code == 206
+        res(self.start_response).close()
+
+    def test_if_range_etag(self):
+        res = FileResponse(__file__)
+        res.make_partial(((0, 9),), res.headers['ETag'])
+        assert res.status_code == 206
+        assert b''.join(res(self.start_response)) == self.read_start()
+        res = FileResponse(__file__)
+        res.make_partial(((0, 9),), 'W/' + res.headers['ETag'])
+        assert res.status_code == 200     # weak tag is never matched
+        res(self.start_response).close()
+        res = FileResponse(__file__)
+        res.make_partial(((0, 9),), '"other"')
+        assert res.status_code == 200
+        res(self.start_response).close()
+
+    @staticmethod
+    def read_start():
+        with open(__file__, 'rb') as file:
+            return file.read(10)
+
+    def test_application(self):
+        app = Application('test_partial')
+
+        @app.route('/file')
+        def file(req):
+            return FileObjResponse(BytesIO(self.data))
+
+        env = {
+            'PATH_INFO': '/file',
+            'REQUEST_METHOD': 'GET',
+            'HTTP_RANGE': 'bytes=-3',
+            'wsgi.file_wrapper': FileWrapper
+        }
+        body = app(env, self.start_response)
+        assert isinstance(body, FileWrapper)
+        assert b''.join(body) == self.data[-3:]
+        env['HTTP_RANGE'] = 'bytes=0-0,-1'
+        body = app(env.copy(), self.start_response)
+        assert not isinstance(body, FileWrapper)
+        assert self.status == '206 Partial Content'
+        env['HTTP_RANGE'] = 'bytes=1-0'     # invalid range is ignored
+        app(env.copy(), self.start_response)
+        assert self.status == '200 OK'
+
+
+class TestConditional():
+    """Tests for conditional requests."""
+    class Req:
+        """Request mock"""
+        def __init__(self, headers, method_number=METHOD_GET):
+            self.headers = Headers(headers)
+            self.method_number = method_number
+
+    @staticmethod
+    def start_response(status, headers):
+        TestConditional.status = status
+        TestConditional.headers = dict(headers)
+
+    def test_etag(self):
+        res = FileResponse(__file__)
+        etag = res.headers['ETag']
+        assert etag.startswith('"')
+        assert make_conditional(self.Req({}), res) is res
+        req = self.Req({'If-None-Match': '"other", W/' + etag})
+        not_modified = make_conditional(req, res)
+        assert isinstance(not_modified, NotModifiedResponse)
+        assert not_modified.headers['ETag'] == etag
+        not_modified(self.start_response)
+        assert self.status == '304 Not Modified'
+        assert self.headers['ETag'] == etag
+        assert 'Date' in self.headers
+
+    def test_etag_not_match(self):
+        res = FileResponse(__file__)
+        req = self.Req({'If-None-Match': '"other"',
+                        'If-Modified-Since': res.headers['Last-Modified']})
+        assert make_conditional(req, res) is res
+
+    def test_modified_since(self):
+        res = Response(headers={'Last-Modified': time_to_http(1000)})
+        req = self.Req({'If-Modified-Since': time_to_http(1000)})
+        assert isinstance(make_conditional(req, res), NotModifiedResponse)
+        req = self.Req({'If-Modified-Since': time_to_http(999)})
+        assert make_conditional(req, res) is res
+        req = self.Req({'If-Modified-Since': 'invalid'})
+        assert make_conditional(req, res) is res
+        req = self.Req({'If-Modified-Since': time_to_http(1000)},
+                       METHOD_POST)
+        assert make_conditional(req, res) is res
+
+    def test_document_root(self):
+        app = Application('test_conditional')
+        app.document_root = path.dirname(__file__)
+        env = {
+            'PATH_INFO': '/' + path.basename(__file__),
+            'REQUEST_METHOD': 'GET',
+        }
+        app(env.copy(), self.start_response)
+        assert self.status == '200 OK'
+        env['HTTP_IF_NONE_MATCH'] = self.headers['ETag']
+        assert not b''.join(app(env, self.start_response))
+        assert self.status == '304 Not Modified'
@@ -0,0 +1,305 @@
+"""Tests for routing functionality."""
+from time import time
+
+import re
+
+from pytest import fixture, raises
+
+from poorwsgi import Application
+from poorwsgi.request import Request
+from poorwsgi.routing import RegexMatcher, SegmentTree, RegularRouter, \
+    anonymize, compare_segments
+from poorwsgi.response import HTTPException
+from poorwsgi.state import METHOD_GET, METHOD_POST, HTTP_NOT_FOUND
+
+# pylint: disable=missing-function-docstring
+# pylint: disable=redefined-outer-name
+# pylint: disable=no-self-use
+
+
+def make_request(app, path, method='GET'):
+    env = {
+        'PATH_INFO': path,
+        'REQUEST_METHOD': method,
+        'wsgi.url_scheme': 'http',
+        'SERVER_NAME': 'example.org',
+        'SERVER_PORT': '80',
+        'REQUEST_STARTTIME': time()
+    }
+    return Request(env, app)
+
+
+@fixture(scope='session')
+def app():
+    app = Application('test_routing')
+
+    @app.route('/user/<id:int>')
+    def user_by_id(req, uid):
+        return 'id', uid
+
+    @app.route('/user/<name>')
+    def user_by_name(req, name):
+        return 'name', name
+
+    @app.regular_route(r'/repeat/(\w+)/\1$')
+    def repeat(req, word):
+        return 'repeat', word
+
+    @app.regular_route(r'/post/(?P<post>\w+)$', method=METHOD_POST)
+    def post(req, post):
+        return 'post', post
+
+    @app.route('/<section>/<name>')
+    def section(req, section, name):
+        return 'section', section, name
+
+    return app
+
+
+class TestAnonymize:
+    """Tests for anonymize function."""
+    def test_named(self):
+        assert anonymize(re.compile(r'/(?P<a>\d+)/(?P<b>\w)')) == \
+            r'/(?:\d+)/(?:\w)'
+
+    def test_escaped(self):
+        assert anonymize(re.compile(r'/\(?P<a>x')) == r'/\(?P<a>x'
+
+    def test_reference(self):
+        assert anonymize(re.compile(r'/(?P<a>\w+)/(?P=a)')) is None
+        assert anonymize(re.compile(r'/(\w+)/\1')) is None
+
+    def test_flags(self):
+        assert anonymize(re.compile(r'(?i)/user')) is None
+
+
+class TestRegexMatcher:
+    """Tests for RegexMatcher class."""
+    def test_ordering(self):
+        patterns = (re.compile(r'/(?P<a>\d+)$'),
+                    re.compile(r'/(?P<a>\w+)$'),
+                    re.compile(r'/(?P<a>.*)$'))
+        matcher = RegexMatcher(patterns)
+        assert len(matcher) == 1
+        assert matcher.match('/12')[0] is patterns[0]
+        assert matcher.match('/ab')[0] is patterns[1]
+        assert matcher.match('/a/b')[0] is patterns[2]
+        assert matcher.match('/a/b')[1].groupdict() == {'a': 'a/b'}
+
+    def test_not_combined(self):
+        patterns = (re.compile(r'/x/(?P<a>\d+)$'),
+                    re.compile(r'/(\w+)/\1$'),
+                    re.compile(r'/y/(?P<a>\d+)$'),
+                    re.compile(r'/(?P<a>\w+)/(?P<b>\w+)$'))
+        matcher = RegexMatcher(patterns)
+        assert len(matcher) == 3
+        assert matcher.match('/x/1')[0] is patterns[0]
+        assert matcher.match('/x/x')[0] is patterns[1]
+        assert matcher.match('/y/1')[0] is patterns[2]
+        assert matcher.match('/y/y')[0] is patterns[1]
+        assert matcher.match('/a/b')[1].groups() == ('a', 'b')
+
+    def test_empty(self):
+        assert RegexMatcher(()).match('/') == (None, None)
+
+
+class TestSegmentTree:
+    """Tests for SegmentTree and RegularRouter classes."""
+    digits = re.compile(r'(?:\d+)')
+    any_ = re.compile(r'(?:[^/]+)')
+
+    def test_lowest_sequence(self):
+        tree = SegmentTree()
+        first = re.compile(r'/(?P<a>[^/]+)/edit$')
+        second = re.compile(r'/user/(?P<a>\d+)$')
+        tree.insert(('', self.any_, 'edit'), 1, first)
+        tree.insert(('', 'user', self.digits), 2, second)
+        assert tree.find('/user/edit') == (1, first)
+        assert tree.find('/user/12') == (2, second)
+        assert tree.find('/user/12/edit') == (None, None)
+        assert tree.find('/user') == (None, None)
+
+    def test_router_ordering(self):
+        tree_route = re.compile(r'/user/(?P<id>\d+)$')
+        regex_route = re.compile(r'/user/.*$')
+        router = RegularRouter(((regex_route, None),
+                                (tree_route, ('', 'user', self.digits))))
+        assert router.match('/user/12')[0] is regex_route
+        router = RegularRouter(((tree_route, ('', 'user', self.digits)),
+                                (regex_route, None)))
+        pattern, match = router.match('/user/12')
+        assert pattern is tree_route
+        assert match.groupdict() == {'id': '12'}
+        assert router.match('/user/x')[0] is regex_route
+
+    def test_compare(self):
+        assert compare_segments(('', self.digits), ('', self.digits)) == \
+            'conflict'
+        assert compare_segments(('', self.digits), ('', self.any_)) == \
+            'ambiguous'
+        assert compare_segments(('', self.digits), ('', 'x')) is None
+        assert compare_segments(('', self.digits), ('', 'x', '')) is None
+        letters = re.compile(r'(?:[a-z]+)')
+        assert compare_segments(('', self.digits), ('', letters)) == \
+            'possibly ambiguous'
+        assert compare_segments(('', self.digits), ('', letters),
+                                (self.digits.pattern, letters.pattern)) \
+            is None
+
+
+class TestApplication:
+    """Tests of routing in Application."""
+    def test_converters(self, app):
+        req = make_request(app, '/user/42')
+        assert app.handler_from_table(req) == ('id', 42)
+        assert req.uri_rule == '/user/<id:int>'
+        assert req.path_args == {'id': 42}
+
+    def test_first_wins(self, app):
+        req = make_request(app, '/user/ondra')
+        assert app.handler_from_table(req) == ('name', 'ondra')
+        req = make_request(app, '/group/ondra')
+        assert app.handler_from_table(req) == ('section', 'group', 'ondra')
+
+    def test_reference(self, app):
+        req = make_request(app, '/repeat/x/x')
+        assert app.handler_from_table(req) == ('repeat', 'x')
+        assert req.uri_rule == r'/repeat/(\w+)/\1$'
+
+    def test_method(self, app):
+        req = make_request(app, '/post/first', 'POST')
+        assert app.handler_from_table(req) == ('post', 'first')
+        assert req.path_args == {'post': 'first'}
+        req = make_request(app, '/post/first')
+        assert app.handler_from_table(req) == ('section', 'post', 'first')
+
+    def test_rebuild(self, app):
+        def handler(req):
+            return 'new'
+        app.set_regular_route(r'/new$', handler, METHOD_GET)
+        try:
+            assert app.handler_from_table(make_request(app, '/new')) == 'new'
+        finally:
+            app.pop_regular_route(r'/new$', METHOD_GET)
+        with raises(HTTPException) as err:
+            app.handler_from_table(make_request(app, '/new'))
+        assert err.value.args[0] == HTTP_NOT_FOUND
+
+    def test_segment_filters(self, app):
+        req = make_request(app, '/user/-42')
+        assert app.handler_from_table(req) == ('id', -42)
+        req = make_request(app, '/user/a.b')
+        assert app.handler_from_table(req) == ('name', 'a.b')
+
+    def test_check_routes(self):
+        app = Application('test_check_routes')
+
+        @app.route('/item/<id:int>')
+        @app.route('/item/<name>')
+        @app.route('/item/<uid:int>', method=METHOD_POST)
+        def item(req, value):
+            return value
+
+        conflicts = app.check_routes()
+        assert ('conflict', 'POST', '/item/<uid:int>', '/item/<id:int>') \
+            not in conflicts
+        assert ('ambiguous', 'GET', '/item/<id:int>', '/item/<name>') \
+            in conflicts
+
+        app.set_route('/item/<num:int>', item)
+        conflicts = app.check_routes()
+        assert ('conflict', 'GET', '/item/<num:int>', '/item/<uid:int>') \
+            not in conflicts
+        assert ('conflict', 'GET', '/item/<num:int>', '/item/<id:int>') \
+            in conflicts
+
+    def test_check_routes_filters(self):
+        app = Application('test_check_routes_filters')
+
+        @app.route('/item/<id:int>', method=METHOD_GET)
+        @app.route('/item/<uid:uuid>', method=METHOD_GET)
+        @app.route('/item/<key:hex>', method=METHOD_GET)
+        @app.route('/version/v<name>', method=METHOD_GET)
+        @app.route('/version/v<ver:int>', method=METHOD_GET)
+        def item(req, value):
+            return value
+
+        assert set(app.check_routes()) == {
+            ('ambiguous', 'GET', '/item/<id:int>', '/item/<key:hex>'),
+            ('possibly ambiguous', 'GET', '/version/v<name>',
+             '/version/v<ver:int>')}
+
+    def test_auto_check_routes(self, caplog):
+        app = Application('test_auto_check_routes')
+        app.auto_check_routes = True
+
+        @app.route('/user/<id:int>')
+        def user(req, id):
+            # pylint: disable=redefined-builtin
+            return id
+
+        app.set_route('/user/<uid:uuid>', user)
+        assert not caplog.records
+        app.set_route('/user/<name>', user, METHOD_GET)
+        assert [it.getMessage() for it in caplog.records] == [
+            "Route GET /user/<name> is ambiguous with /user/<id:int>",
+            "Route GET /user/<name> is ambiguous with /user/<uid:uuid>"]
+
+    def test_route_cache(self):
+        app = Application('test_route_cache')
+        app.route_cache_size = 2
+        calls = []
+
+        def to_int(val):
+            calls.append(val)
+            return int(val)
+
+        app.set_filter('num', r'\d+', to_int)
+
+        @app.route('/num/<value:num>')
+        def num(req, value):
+            return value
+
+        assert app.handler_from_table(make_request(app, '/num/1')) == 1
+        req = make_request(app, '/num/1')
+        assert app.handler_from_table(req) == 1
+        assert req.uri_rule == '/num/<value:num>'
+        assert req.path_args == {'value': 1}
+        assert calls == ['1']
+        assert app.route_cache_info == (1, 1, 2, 1)
+
+        app.set_filter('other', r'\w+')      # clear the cache
+        assert app.route_cache_info.currsize == 0
+        assert app.handler_from_table(make_request(app, '/num/1')) == 1
+        assert calls == ['1', '1']
+
+        app.route_cache_size = 0
+        assert app.route_cache_info.currsize == 0
+
+    def test_route_cache_isolation(self):
+        app = Application('test_route_cache_isolation')
+        app.route_cache_size = 4
+        app.set_filter('list', r'[\w,]+', lambda val: val.split(','))
+
+        @app.route('/item/<id:int>')
+        def item(req, id):
+            # pylint: disable=redefined-builtin
+            req.path_args['id'] = 'changed'
+            req.path_args['other'] = 1
+            return id
+
+        @app.route('/items/<ids:list>')
+        def items(req, ids):
+            ids.append('changed')
+            return ids
+
+        for _ in range(3):
+            req = make_request(app, '/item/1')
+            assert app.handler_from_table(req) == 1
+            assert req.path_args == {'id': 1}
+        assert app.route_cache_info.hits == 2
+
+        assert app.handler_from_table(make_request(app, '/items/a,b')) == \
+            ['a', 'b', 'changed']
+        assert app.handler_from_table(make_request(app, '/items/a,b')) == \
+            ['a', 'b', 'changed']   # mutable values are not cached
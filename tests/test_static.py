@@ -0,0 +1,387 @@
+"""Tests for static files serving."""
+from os import access, path, mkdir, remove, utime, R_OK
+from wsgiref.util import FileWrapper
+
+from pytest import fixture
+
+from poorwsgi import Application
+from poorwsgi.headers import negotiate_encoding
+from poorwsgi.static import StatCache, StaticFileResponse, file_info, \
+    precompressed_response, scan_directory, DirectoryCache, AssetStore, \
+    AssetResponse
+
+# pylint: disable=missing-function-docstring
+# pylint: disable=redefined-outer-name
+
+
+class TestFileInfo:
+    """Tests for file_info function."""
+    def test_file(self):
+        info = file_info(__file__)
+        assert info.exists and info.is_file and info.readable
+        assert not info.is_dir
+        assert info.size == path.getsize(__file__)
+        assert info.etag.startswith('"')
+
+    def test_directory(self):
+        info = file_info(path.dirname(__file__))
+        assert info.exists and info.is_dir
+        assert not info.is_file
+        assert info.mime_type is None
+
+    def test_not_exists(self):
+        info = file_info(__file__+'.none')
+        assert not info.exists
+        assert not info.is_file and not info.is_dir
+
+    def test_response(self):
+        info = file_info(__file__)
+        res = StaticFileResponse(info)
+        assert res.headers['ETag'] == info.etag
+        assert res.headers['Last-Modified'] == info.last_modified
+        assert res.content_type == 'text/x-python'
+        res.close()
+
+
+class TestStatCache:
+    """Tests for StatCache class."""
+    def test_disabled(self):
+        cache = StatCache()
+        assert cache.get(__file__) is not cache.get(__file__)
+        assert cache.info() == (0, 2, 0, 0)
+
+    def test_lru(self):
+        cache = StatCache(maxsize=1, ttl=60)
+        first = cache.get(__file__)
+        cache.get(path.dirname(__file__))
+        assert cache.get(__file__) is not first
+        assert cache.info().currsize == 1
+
+    def test_ttl(self):
+        cache = StatCache(maxsize=2, ttl=0)
+        assert cache.get(__file__) is not cache.get(__file__)
+        assert cache.info().hits == 0
+
+    def test_pop(self, tmp_path):
+        filename = str(tmp_path / 'file.txt')
+        cache = StatCache(maxsize=2, ttl=60)
+        assert not cache.get(filename).exists
+        with open(filename, 'w', encoding='utf-8') as file:
+            file.write('data')
+        assert not cache.get(filename).exists   # cached
+        cache.pop(filename)
+        assert cache.get(filename).size == 4
+
+
+class TestDirectory:
+    """Tests for scan_directory function and DirectoryCache class."""
+    @fixture
+    def directory(self, tmp_path):
+        for name in ('b.txt', 'a.html', '.hidden', 'backup~'):
+            with open(tmp_path / name, 'w', encoding='utf-8') as file:
+                file.write(name)
+        mkdir(tmp_path / 'dir')
+        return tmp_path
+
+    def test_scan(self, directory):
+        entries = scan_directory(str(directory))
+        assert [it.name for it in entries] == ['a.html', 'b.txt', 'dir']
+        assert entries[0].mime_type == 'text/html'
+        assert entries[0].size == 6
+        assert entries[2].is_dir and not entries[2].is_file
+
+    def test_cache(self, directory):
+        cache = DirectoryCache(maxsize=64)
+        utime(directory, (1000, 1000))
+        mtime, entries = cache.get(str(directory))
+        assert mtime == 1000
+        assert cache.get(str(directory))[1] is entries
+        assert cache.info() == (1, 1, 64, 1)
+
+        with open(directory / 'c.txt', 'w', encoding='utf-8') as file:
+            file.write('c')
+        utime(directory, (2000, 2000))
+        assert len(cache.get(str(directory))[1]) == 4
+
+    def test_disabled(self, directory):
+        cache = DirectoryCache()
+        utime(directory, (1000, 1000))
+        assert cache.get(str(directory))[1] is not cache.get(
+            str(directory))[1]
+        assert cache.info() == (0, 2, 0, 0)
+
+    def test_unreadable(self, directory):
+        (directory / 'b.txt').chmod(0)
+        try:
+            names = [it.name for it in scan_directory(str(directory))]
+            readable = access(str(directory / 'b.txt'), R_OK)  # root
+        finally:
+            (directory / 'b.txt').chmod(0o644)
+        assert ('b.txt' in names) == readable
+
+    def test_recently_changed(self, directory):
+        cache = DirectoryCache(maxsize=64)
+        cache.get(str(directory))
+        assert cache.info().currsize == 0
+
+
+class TestAssetStore:
+    """Tests for AssetStore and AssetResponse classes."""
+    @staticmethod
+    def write(filename, data):
+        with open(filename, 'wb') as file:
+            file.write(data)
+        return file_info(str(filename))
+
+    def test_disabled(self):
+        assert AssetStore().get(file_info(__file__)) is None
+
+    def test_budget(self, tmp_path):
+        store = AssetStore(budget=10, max_size=8)
+        first = self.write(tmp_path / 'first.txt', b'x' * 6)
+        second = self.write(tmp_path / 'second.txt', b'y' * 4)
+        big = self.write(tmp_path / 'big.txt', b'z' * 9)
+        assert store.get(big) is None
+        assert store.get(first).data == b'x' * 6
+        assert store.get(second).data == b'y' * 4
+        assert store.info() == (0, 2, 10, 10, 2)
+        assert store.get(first) is not None     # first is recent now
+        third = self.write(tmp_path / 'third.txt', b'w' * 2)
+        store.get(third)
+        assert store.info().used == 8
+        assert store.get(second) is not None    # second was dropped
+        assert store.info().hits == 1
+
+        store.budget = 4
+        assert store.info().count == 1
+
+    def test_changed(self, tmp_path):
+        store = AssetStore(budget=100)
+        asset = store.get(self.write(tmp_path / 'file.txt', b'old'))
+        utime(tmp_path / 'file.txt', (1000, 1000))
+        info = self.write(tmp_path / 'file.txt', b'new data')
+        assert store.get(info) is not asset
+        assert store.get(info).data == b'new data'
+        assert store.info().used == 8
+
+    def test_preload(self, tmp_path):
+        store = AssetStore(budget=100)
+        self.write(tmp_path / 'favicon.ico', b'icon')
+        assert store.preload((str(tmp_path / 'favicon.ico'),
+                              str(tmp_path / 'none.ico'))) == 1
+        assert store.info().misses == 1
+
+    def test_preload_error(self, tmp_path, monkeypatch):
+        def denied(path, *args, **kwargs):
+            raise PermissionError(13, "Permission denied", path)
+
+        store = AssetStore(budget=100)
+        self.write(tmp_path / 'secret.txt', b'secret')
+        monkeypatch.setattr('poorwsgi.static.open', denied, raising=False)
+        assert store.preload((str(tmp_path / 'secret.txt'),)) == 0
+        assert store.info().count == 0
+
+    def test_response(self, tmp_path):
+        info = self.write(tmp_path / 'manifest.json', b'{}')
+        res = AssetResponse(AssetStore(budget=100).get(info))
+        assert res.content_type == 'application/json'
+        assert res.content_length == 2
+        assert res.headers['ETag'] == info.etag
+        assert res.headers['Last-Modified'] == info.last_modified
+        assert res.data == b'{}'
+        assert res.headers['Accept-Ranges'] == 'bytes'
+
+    def test_partial(self, tmp_path):
+        info = self.write(tmp_path / 'data.txt', b'0123456789')
+        res = AssetResponse(AssetStore(budget=100).get(info))
+        res.make_partial(((2, 4),), info.etag)
+        assert res.status_code == 206
+        assert res.headers['Content-Range'] == 'bytes 2-4/10'
+        assert b''.join(FileWrapper(res.__end_of_response__())) == b'234'
+
+
+class TestPrecompressed:
+    """Tests for precompressed files negotiation."""
+    def test_negotiate(self):
+        assert negotiate_encoding((), ('br', 'gzip')) is None
+        assert negotiate_encoding((('x-gzip', 1.0),), ('gzip',)) == 'gzip'
+        assert negotiate_encoding((('gzip', 1.0), ('br', 0.5)),
+                                  ('br', 'gzip')) == 'gzip'
+        assert negotiate_encoding((('br', 0.0), ('*', 0.5)),
+                                  ('br', 'gzip')) == 'gzip'
+
+    def test_response(self, tmp_path):
+        filename = str(tmp_path / 'app.js')
+        with open(filename, 'w', encoding='utf-8') as file:
+            file.write('data')
+        res = precompressed_response(file_info(filename), (('gzip', 1.0),))
+        assert 'Vary' not in res.headers
+        res.close()
+
+        with open(filename + '.gz', 'wb') as file:
+            file.write(b'gz')
+        info = file_info(filename)
+        res = precompressed_response(info, (('gzip', 1.0),))
+        assert res.headers['Content-Encoding'] == 'gzip'
+        assert res.headers['Vary'] == 'Accept-Encoding'
+        assert res.content_type == info.mime_type
+        assert res.headers['ETag'] != info.etag
+        assert res.data == b'gz'
+        res = precompressed_response(info, (('br', 1.0),))
+        assert 'Content-Encoding' not in res.headers
+        assert res.headers['Vary'] == 'Accept-Encoding'
+        assert res.data == b'data'
+
+    def test_stale(self, tmp_path):
+        filename = str(tmp_path / 'app.js')
+        with open(filename + '.br', 'wb') as file:
+            file.write(b'br')
+        with open(filename, 'w', encoding='utf-8') as file:
+            file.write('data')
+        utime(filename + '.br', (0, 0))
+        res = precompressed_response(file_info(filename), (('br', 1.0),))
+        assert res.data == b'data'
+
+
+class TestApplication:
+    """Tests for document_root serving with cache."""
+    @staticmethod
+    def start_response(status, headers):
+        TestApplication.status = status
+        TestApplication.headers = dict(headers)
+
+    def test_cache(self, tmp_path):
+        app = Application('test_static_cache')
+        app.document_root = str(tmp_path)
+        app.static_cache_size = 10
+        app.static_cache_ttl = 60
+        with open(tmp_path / 'file.txt', 'w', encoding='utf-8') as file:
+            file.write('data')
+        env = {
+            'PATH_INFO': '/file.txt',
+            'REQUEST_METHOD': 'GET',
+            'SERVER_NAME': 'example.org'
+        }
+
+        assert b''.join(app(env.copy(), self.start_response)) == b'data'
+        assert b''.join(app(env.copy(), self.start_response)) == b'data'
+        assert self.headers['Content-Type'].startswith('text/plain')
+        assert app.static_cache_info == (1, 1, 10, 1)
+
+        remove(tmp_path / 'file.txt')      # stale record in cache
+        app(env.copy(), self.start_response)
+        assert self.status == '404 Not Found'
+        assert app.static_cache_info.currsize == 0
+
+        app.static_cache_size = 0
+        assert app.static_cache_info.maxsize == 0
+
+    def test_precompressed(self, tmp_path):
+        app = Application('test_static_precompressed')
+        app.document_root = str(tmp_path)
+        app.precompressed = True
+        with open(tmp_path / 'style.css', 'w', encoding='utf-8') as file:
+            file.write('data')
+        with open(tmp_path / 'style.css.br', 'wb') as file:
+            file.write(b'br')
+        env = {
+            'PATH_INFO': '/style.css',
+            'REQUEST_METHOD': 'GET',
+            'HTTP_ACCEPT_ENCODING': 'gzip, deflate, br',
+            'wsgi.file_wrapper': FileWrapper
+        }
+        body = app(env.copy(), self.start_response)
+        assert isinstance(body, FileWrapper)
+        assert b''.join(body) == b'br'
+        assert self.headers['Content-Encoding'] == 'br'
+        assert self.headers['Content-Type'].startswith('text/css')
+        assert self.headers['Vary'] == 'Accept-Encoding'
+
+        env['poor_Precompressed'] = 'Off'
+        assert b''.join(app(env, self.start_response)) == b'data'
+        assert 'Content-Encoding' not in self.headers
+
+    def test_directory_index(self, tmp_path):
+        app = Application('test_static_index')
+        app.document_root = str(tmp_path)
+        app.document_index = True
+        app.document_index_size = 2
+        mkdir(tmp_path / 'dir')
+        for name in ('<b>.txt', 'a b.txt', 'c.txt'):
+            with open(tmp_path / 'dir' / name, 'w', encoding='utf-8') as file:
+                file.write(name)
+        env = {
+            'PATH_INFO': '/dir',
+            'REQUEST_METHOD': 'GET',
+            'SERVER_NAME': 'example.org'
+        }
+        body = b''.join(app(env.copy(), self.start_response)).decode()
+        assert self.status == '200 OK'
+        assert 'Last-Modified' in self.headers
+        assert 'href="/dir/../"' in body
+        assert '&lt;b&gt;.txt' in body and '<b>' not in body
+        assert 'href="/dir/a%20b.txt"' in body
+        assert 'c.txt' not in body
+        assert 'Page 1 of 2' in body
+
+        env['QUERY_STRING'] = 'page=2'
+        body = b''.join(app(env.copy(), self.start_response)).decode()
+        assert 'c.txt' in body and 'a b.txt' not in body
+        assert '../' not in body
+
+        env['QUERY_STRING'] = 'sort=name&order=desc'
+        body = b''.join(app(env.copy(), self.start_response)).decode()
+        assert 'c.txt' in body and 'a b.txt' in body
+        assert '&lt;b&gt;.txt' not in body
+        assert app.directory_cache_info.maxsize == 0
+
+    def test_directory_cache(self, tmp_path):
+        app = Application('test_static_directory_cache')
+        app.document_root = str(tmp_path)
+        app.document_index = True
+        app.directory_cache_size = 8
+        mkdir(tmp_path / 'dir')
+        utime(tmp_path / 'dir', (1000, 1000))
+        env = {
+            'PATH_INFO': '/dir',
+            'REQUEST_METHOD': 'GET',
+            'SERVER_NAME': 'example.org'
+        }
+        for _ in range(2):
+            b''.join(app(env.copy(), self.start_response))
+        assert app.directory_cache_info == (1, 1, 8, 1)
+
+    def test_assets(self, tmp_path):
+        app = Application('test_static_assets')
+        app.document_root = str(tmp_path)
+        app.static_assets.budget = 1024
+        app.precompressed = True
+        with open(tmp_path / 'app.js', 'w', encoding='utf-8') as file:
+            file.write('data')
+        with open(tmp_path / 'app.js.gz', 'wb') as file:
+            file.write(b'gz')
+        env = {
+            'PATH_INFO': '/app.js',
+            'REQUEST_METHOD': 'GET',
+            'HTTP_ACCEPT_ENCODING': 'gzip'
+        }
+        assert b''.join(app(env.copy(), self.start_response)) == b'gz'
+        assert self.headers['Content-Encoding'] == 'gzip'
+        assert self.headers['Content-Length'] == '2'
+        etag = self.headers['ETag']
+        assert b''.join(app(env.copy(), self.start_response)) == b'gz'
+        assert app.static_assets.info().hits == 1
+
+        env['HTTP_IF_NONE_MATCH'] = etag
+        app(env.copy(), self.start_response)
+        assert self.status == '304 Not Modified'
+        del env['HTTP_ACCEPT_ENCODING']
+        del env['HTTP_IF_NONE_MATCH']
+        assert b''.join(app(env.copy(), self.start_response)) == b'data'
+        assert self.headers['Content-Type'].startswith('text/javascript')
+        assert app.static_assets.info().count == 2
+
+        env['HTTP_RANGE'] = 'bytes=1-2'
+        assert b''.join(app(env.copy(), self.start_response)) == b'at'
+        assert self.status == '206 Partial Content'
+        assert app.static_assets.info().hits == 3
@@ -0,0 +1,169 @@
+"""Tests for timing of request phases."""
+from asyncio import run
+from io import BytesIO
+from wsgiref.util import FileWrapper
+
+from pytest import fixture
+
+from poorwsgi import Application
+from poorwsgi.metrics import Metrics
+from poorwsgi.response import FileResponse, GeneratorResponse
+from poorwsgi.timing import Timing, TimedIterable, TimedAsyncIterable, \
+    TimedFile
+
+# pylint: disable=missing-function-docstring
+# pylint: disable=redefined-outer-name
+
+
+@fixture(scope='session')
+def app():
+    app = Application('test_timing')
+    app.server_timing = True
+    app.metrics = Metrics()
+    app.timings = []
+
+    @app.before_response()
+    def before(req):
+        app.timings.append(req.timing)
+
+    @app.after_response()
+    def after(req, res):
+        return res
+
+    @app.route('/text')
+    def text(req):
+        return 'text'
+
+    @app.route('/generator')
+    def generator(req):
+        return GeneratorResponse(iter((b'first', b'second')))
+
+    @app.route('/file')
+    def file(req):
+        return FileResponse(__file__)
+
+    return app
+
+
+class TestTiming:
+    """Tests for Timing class and wrappers."""
+    def test_durations(self):
+        timing = Timing(1.0)
+        assert timing.total == 0.0
+        timing.marks.extend((('handler', 1.5), ('response', 1.75),
+                             ('handler', 2.0)))
+        assert timing.durations() == {'handler': 0.75, 'response': 0.25}
+        assert timing.total == 1.0
+
+    def test_mark(self):
+        timing = Timing()
+        timing.mark('handler')
+        assert timing.marks[0][0] == 'handler'
+        assert timing.marks[0][1] >= timing.start
+
+    def test_iterable(self):
+        finished, closed = [], []
+        timed = TimedIterable(iter((b'ab', b'cde')), Timing(),
+                              finished.append, closed.append)
+        assert list(timed) == [b'ab', b'cde']
+        assert finished == [timed]
+        assert not closed               # close_callback waits for close
+        assert timed.sent == 5
+        timed.close()
+        timed.close()
+        assert finished == [timed]      # callback is called only once
+        assert closed == [timed]
+
+    def test_close(self):
+        finished = []
+        buffer = BytesIO(b'data')
+        timing = Timing()
+        timed = TimedIterable(buffer, timing, finished.append)
+        timed.close()
+        assert buffer.closed
+        assert finished == [timed]
+        assert timed.sent == 0
+        assert timing.marks[0][0] == 'emission'
+
+    def test_async_close(self):
+        finished, closed = [], []
+
+        async def chunks():
+            try:
+                yield b'ab'
+                yield b'cde'
+            finally:
+                closed.append(True)
+
+        async def main():
+            timed = TimedAsyncIterable(chunks(), Timing(), finished.append)
+            async for chunk in timed:
+                assert chunk == b'ab'
+                break
+            await timed.aclose()
+            return timed
+
+        timed = run(main())
+        assert closed == [True]
+        assert finished == [timed]
+        assert timed.sent == 2
+
+    def test_file(self):
+        finished = []
+        timed = TimedFile(open(__file__, 'rb'), Timing(), finished.append)
+        data = b''.join(FileWrapper(timed))
+        assert timed.sent == len(data)
+        assert timed.fileno() > 0
+        timed.close()
+        assert finished == [timed]
+
+
+class TestApplication:
+    """Tests for timing in Application."""
+    @staticmethod
+    def start_response(status, headers):
+        TestApplication.status = status
+        TestApplication.headers = dict(headers)
+
+    @staticmethod
+    def env(path):
+        return {'PATH_INFO': path, 'REQUEST_METHOD': 'GET',
+                'SERVER_NAME': 'localhost', 'wsgi.errors': None}
+
+    def test_phases(self, app):
+        retval = app(self.env('/text'), self.start_response)
+        timing = app.timings[-1]
+        assert [it[0] for it in timing.marks] == \
+            ['headers', 'body', 'before', 'handler', 'after', 'response']
+        header = self.headers['Server-Timing']
+        assert header.startswith('headers;dur=')
+        assert 'total;dur=' in header
+        assert b''.join(retval) == b'text'
+        retval.close()
+        assert timing.marks[-1][0] == 'emission'
+
+    def test_generator(self, app):
+        retval = app(self.env('/generator'), self.start_response)
+        assert b''.join(retval) == b'firstsecond'
+        assert app.timings[-1].marks[-1][0] == 'emission'
+        values = app.metrics.values()[('/generator', 'GET')]
+        assert values[3] == len(b'firstsecond')
+
+    def test_file_wrapper(self, app):
+        env = self.env('/file')
+        env['wsgi.file_wrapper'] = FileWrapper
+        retval = app(env, self.start_response)
+        assert isinstance(retval, FileWrapper)
+        body = b''.join(retval)
+        retval.close()
+        values = app.metrics.values()[('/file', 'GET')]
+        assert values[3] == len(body)
+        assert app.timings[-1].marks[-1][0] == 'emission'
+
+    def test_disabled(self, app):
+        app.server_timing = False
+        try:
+            app(self.env('/text'), self.start_response).close()
+            assert 'Server-Timing' not in self.headers
+        finally:
+            app.server_timing = True